@@ -0,0 +1,50 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .buffering import BufferedWriter, increment_counters
+
+
+class ActivityWriter(BufferedWriter):
+    """
+    Buffers UserActivity rows and inserts them with bulk_create, bumping the
+    per-user and per-day activity counters in the same transaction.
+
+    Logins arrive in bursts at the start of a school day, so the buffer is
+    bounded and, by default, drops new events rather than stalling requests.
+    Likewise a batch that keeps failing to write is dropped.
+    """
+
+    max_retries = 3
+
+    def write(self, batch):
+        from .models import UserActivity, UserActivityCounter, UserActivityDaily
+
+        totals = Counter((a.user_id, a.activity_type) for a in batch)
+        daily = Counter((a.user_id, a.activity_type, timezone.localdate(a.timestamp)) for a in batch)
+
+        with transaction.atomic():
+            UserActivity.objects.bulk_create(batch, batch_size=500)
+            increment_counters(UserActivityCounter, ('user', 'activity_type'), totals)
+            increment_counters(UserActivityDaily, ('user', 'activity_type', 'day'), daily)
+
+
+activity_writer = ActivityWriter(
+    flush_size=getattr(settings, "ACTIVITY_FLUSH_SIZE", 200),
+    flush_interval=getattr(settings, "ACTIVITY_FLUSH_INTERVAL", 2.0),
+    max_pending=getattr(settings, "ACTIVITY_MAX_PENDING", 10000),
+    overflow=getattr(settings, "ACTIVITY_OVERFLOW", "drop"),
+)
+
+
+def log_activity(user, activity_type, description=""):
+    from .models import UserActivity
+
+    return activity_writer.enqueue(UserActivity(
+        user_id=getattr(user, "pk", user),
+        activity_type=activity_type,
+        description=description,
+        timestamp=timezone.now(),
+    ))
@@ -1,5 +1,9 @@
-from django.contrib import admin
-from .models import UserProfile, GamificationStats, NotificationPreference, UserActivity
+from django.contrib import admin, messages
+from django.shortcuts import redirect, render
+from django.urls import path
+
+from .importer import ADMIN_MAX_ROWS, import_students, read_rows
+from .models import UserProfile, GamificationStats, NotificationPreference, UserActivity, PointsLedger
 
 
 @admin.register(UserProfile)
@@ -23,6 +27,58 @@ class UserProfileAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    change_list_template = 'admin/accounts/userprofile/change_list.html'
+
+    def get_urls(self):
+        return [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_students_view),
+                name='accounts_userprofile_import',
+            ),
+        ] + super().get_urls()
+
+    def import_students_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:accounts_userprofile_changelist')
+
+        report = None
+        if request.method == 'POST' and request.FILES.get('file'):
+            upload = request.FILES['file']
+            dry_run = bool(request.POST.get('dry_run'))
+            try:
+                rows = read_rows(upload, name=upload.name)
+            except ValueError as e:
+                messages.error(request, f"Could not read {upload.name}: {e}")
+            else:
+                if not dry_run and len(rows) > ADMIN_MAX_ROWS:
+                    messages.error(
+                        request,
+                        f"{upload.name} has {len(rows)} rows; the admin imports at most {ADMIN_MAX_ROWS}. "
+                        f"Use the import_students management command for larger files.",
+                    )
+                else:
+                    report = import_students(
+                        rows,
+                        default_password=request.POST.get('default_password') or None,
+                        dry_run=dry_run,
+                    )
+                    if dry_run:
+                        summary = f"Validated {len(rows) - len(report.errors)} rows"
+                    else:
+                        summary = (
+                            f"Created {report.created} accounts in {report.elapsed:.1f}s "
+                            f"({report.rate:.0f}/s)"
+                        )
+                    messages.success(request, f"{summary}; {len(report.errors)} rows rejected.")
+
+        return render(request, 'admin/accounts/userprofile/import_students.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import students',
+            'report': report,
+            'max_rows': ADMIN_MAX_ROWS,
+        })
 
 
 @admin.register(GamificationStats)
@@ -30,7 +86,7 @@ class GamificationStatsAdmin(admin.ModelAdmin):
     list_display = ('user', 'points', 'level', 'attendance_rate', 'total_quizzes_passed')
     list_filter = ('level', 'created_at')
     search_fields = ('user__username', 'user__email')
-    readonly_fields = ('created_at', 'updated_at', 'points')
+    readonly_fields = ('created_at', 'updated_at', 'points', 'level')
     fieldsets = (
         ('User Information', {
             'fields': ('user',)
@@ -65,3 +121,12 @@ class UserActivityAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'description')
     readonly_fields = ('timestamp',)
     date_hierarchy = 'timestamp'
+
+
+@admin.register(PointsLedger)
+class PointsLedgerAdmin(admin.ModelAdmin):
+    list_display = ('user', 'amount', 'reason', 'source', 'created_at')
+    list_filter = ('source', 'created_at')
+    search_fields = ('user__username', 'reason')
+    readonly_fields = ('user', 'amount', 'reason', 'source', 'created_at')
+    date_hierarchy = 'created_at'
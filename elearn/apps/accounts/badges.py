@@ -0,0 +1,211 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import userinfo
+
+
+CHUNK_SIZE = 500
+
+
+class BadgeRule:
+    """
+    A badge and the set-based query that decides who has earned it.
+
+    `qualifying(scope)` returns a values queryset of user ids; `scope` is
+    either None (whole site) or a queryset/list of user ids to restrict to.
+    `events` lists the incremental triggers that can change the outcome.
+    """
+
+    badge = None
+    events = ()
+
+    def qualifying(self, scope):
+        raise NotImplementedError
+
+    @staticmethod
+    def restrict(qs, field, scope):
+        if scope is None:
+            return qs
+        return qs.filter(**{f"{field}__in": scope})
+
+
+class FirstQuizRule(BadgeRule):
+    badge = 'first_quiz'
+    events = ('quiz',)
+
+    def qualifying(self, scope):
+        from apps.quizes.models import QuizScore
+
+        return self.restrict(QuizScore.objects, 'student_id', scope).values_list('student_id', flat=True)
+
+
+class PerfectScoreRule(BadgeRule):
+    badge = 'perfect_score'
+    events = ('quiz',)
+
+    def qualifying(self, scope):
+        from apps.quizes.models import QuizScore
+
+        return (
+            self.restrict(QuizScore.objects, 'student_id', scope)
+            .annotate(question_count=Count('quiz__question'))
+            .filter(question_count__gt=0, score__gte=F('question_count'))
+            .values_list('student_id', flat=True)
+        )
+
+
+class QuizCountRule(BadgeRule):
+    badge = 'learner'
+    events = ('quiz',)
+    min_quizzes = 5
+
+    def qualifying(self, scope):
+        from apps.quizes.models import QuizScore
+
+        return (
+            self.restrict(QuizScore.objects, 'student_id', scope)
+            .values('student_id')
+            .annotate(quizzes=Count('quiz', distinct=True))
+            .filter(quizzes__gte=self.min_quizzes)
+            .values_list('student_id', flat=True)
+        )
+
+
+class PerfectAttendanceRule(BadgeRule):
+    badge = 'attendance'
+    events = ('attendance',)
+    min_days = 20
+
+    def qualifying(self, scope):
+        # The running counters also cover archived terms.
+        from .models import GamificationStats
+
+        return (
+            self.restrict(GamificationStats.objects, 'user_id', scope)
+            .filter(attendance_total__gte=self.min_days, attendance_present=F('attendance_total'))
+            .values_list('user_id', flat=True)
+        )
+
+
+class ParticipationRule(BadgeRule):
+    badge = 'participation'
+    events = ('discussion',)
+    min_replies = 10
+
+    def qualifying(self, scope):
+        from apps.classroom.models import DiscussionReply
+
+        return (
+            self.restrict(DiscussionReply.objects, 'author_id', scope)
+            .values('author_id')
+            .annotate(replies=Count('id'))
+            .filter(replies__gte=self.min_replies)
+            .values_list('author_id', flat=True)
+        )
+
+
+class DiscussionExpertRule(BadgeRule):
+    badge = 'discussion'
+    events = ('discussion',)
+    min_answers = 3
+
+    def qualifying(self, scope):
+        from apps.classroom.models import DiscussionReply
+
+        return (
+            self.restrict(DiscussionReply.objects.filter(is_answer=True), 'author_id', scope)
+            .values('author_id')
+            .annotate(answers=Count('id'))
+            .filter(answers__gte=self.min_answers)
+            .values_list('author_id', flat=True)
+        )
+
+
+class TopPerformerRule(BadgeRule):
+    badge = 'top_performer'
+    events = ('points',)
+    top_n = 10
+
+    def qualifying(self, scope):
+        from .models import GamificationStats
+
+        top = list(
+            GamificationStats.objects.filter(points__gt=0)
+            .order_by('-points')
+            .values_list('user_id', flat=True)[:self.top_n]
+        )
+        if scope is None:
+            return top
+        qs = self.restrict(GamificationStats.objects.filter(user_id__in=top), 'user_id', scope)
+        return qs.values_list('user_id', flat=True)
+
+
+RULES = [
+    FirstQuizRule(),
+    PerfectScoreRule(),
+    QuizCountRule(),
+    PerfectAttendanceRule(),
+    ParticipationRule(),
+    DiscussionExpertRule(),
+    TopPerformerRule(),
+]
+
+
+def badge_scope(users=None, classroom=None):
+    if users is not None:
+        return [getattr(u, 'pk', u) for u in users]
+    if classroom is not None:
+        from apps.classroom.models import ClassMember
+
+        return ClassMember.objects.filter(classroom=classroom, status='active').values('student_id')
+    return None
+
+
+def evaluate_badges(users=None, classroom=None, events=None):
+    """
+    Evaluate badge rules for a set of users, a classroom or the whole site
+    and persist new awards. `events` limits the run to the rules those
+    events can affect (incremental mode); None runs every rule (full sweep).
+
+    Returns {badge: number_of_new_awards}.
+    """
+    from .models import GamificationStats
+
+    scope = badge_scope(users, classroom)
+    rules = [r for r in RULES if events is None or set(r.events) & set(events)]
+
+    earned = defaultdict(set)
+    for rule in rules:
+        for user_id in set(rule.qualifying(scope)):
+            earned[user_id].add(rule.badge)
+
+    awarded = defaultdict(int)
+    if not earned:
+        return awarded
+
+    now = timezone.now()
+    user_ids = list(earned)
+    for i in range(0, len(user_ids), CHUNK_SIZE):
+        with transaction.atomic():
+            rows = (
+                GamificationStats.objects.select_for_update()
+                .filter(user_id__in=user_ids[i:i + CHUNK_SIZE])
+                .only('id', 'user_id', 'badges')
+            )
+            changed = []
+            for stats in rows:
+                new = [b for b in sorted(earned[stats.user_id]) if b not in stats.badges]
+                if new:
+                    stats.badges = stats.badges + new
+                    stats.updated_at = now
+                    changed.append(stats)
+                    for badge in new:
+                        awarded[badge] += 1
+
+            GamificationStats.objects.bulk_update(changed, ['badges', 'updated_at'])
+        userinfo.invalidate([stats.user_id for stats in changed])
+
+    return awarded
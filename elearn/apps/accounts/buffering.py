@@ -0,0 +1,231 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models import F
+
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """
+    In-process write-behind buffer.
+
+    Items are appended with `enqueue()` and handed to `write()` in batches
+    once `flush_size` items are pending or `flush_interval` seconds have
+    passed since the last flush. Pending items are also flushed at the end
+    of every request that crossed a threshold and at interpreter shutdown.
+
+    `max_pending` bounds the buffer. When it is full, the "drop" policy
+    discards the new item and the "block" policy makes the caller wait for
+    a synchronous flush.
+
+    Flushing never raises, so a failing write cannot break the request that
+    happened to trigger the flush. A batch whose `write()` fails is logged
+    and kept for the next flush. By default it is kept until a write
+    succeeds; writers whose items may be lost set `max_retries` to discard
+    the batch once it has failed that many more times.
+    """
+
+    flush_size = 100
+    flush_interval = 5.0
+    max_pending = None
+    overflow = "block"
+    max_retries = None
+
+    def __init__(self, flush_size=None, flush_interval=None, max_pending=None, overflow=None, max_retries=None):
+        if flush_size is not None:
+            self.flush_size = flush_size
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if max_pending is not None:
+            self.max_pending = max_pending
+        if overflow is not None:
+            self.overflow = overflow
+        if max_retries is not None:
+            self.max_retries = max_retries
+        if self.overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown overflow policy: {self.overflow!r}")
+
+        self._lock = threading.RLock()
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self._failures = 0
+
+        request_finished.connect(self._on_request_finished, weak=False)
+        atexit.register(self.flush)
+
+    def write(self, batch):
+        raise NotImplementedError
+
+    def enqueue(self, item):
+        with self._lock:
+            if self.max_pending is not None and len(self._pending) >= self.max_pending:
+                if self.overflow == "drop":
+                    self.dropped += 1
+                    return False
+                self.flush()
+            self._pending.append(item)
+            self.enqueued += 1
+        if self.should_flush():
+            self.flush()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": len(self._pending),
+            }
+
+    def should_flush(self):
+        with self._lock:
+            if not self._pending:
+                return False
+            return (
+                len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+            try:
+                self.write(batch)
+            except Exception:
+                self._failures += 1
+                if self.max_retries is not None and self._failures > self.max_retries:
+                    self._failures = 0
+                    self.failed += len(batch)
+                    logger.exception(
+                        "%s dropped %d items after %d failed flushes",
+                        type(self).__name__, len(batch), self.max_retries + 1,
+                    )
+                else:
+                    # Keep the batch so the next flush retries it.
+                    self._pending[:0] = batch
+                    logger.exception("%s failed to flush %d items", type(self).__name__, len(batch))
+                return 0
+            self._failures = 0
+            self.flushed += len(batch)
+            return len(batch)
+
+    def _on_request_finished(self, **kwargs):
+        if self.should_flush():
+            self.flush()
+
+
+def increment_counters(model, key_fields, counts, count_field="count", chunk_size=300, create=True):
+    """
+    Add `counts` ({key_tuple: delta}) to `model.count_field`, creating rows
+    that do not exist yet. Uses a single INSERT ... ON CONFLICT DO UPDATE per
+    chunk where the backend supports it, so concurrent writers never race.
+
+    `count_field` may also be a tuple of fields, in which case each delta is
+    a tuple of the same length and every field is written in one statement.
+
+    With create=False only existing rows are updated. Decrements use this so
+    they never resurrect a row whose parent is being deleted.
+    """
+    multi = isinstance(count_field, (tuple, list))
+    count_fields = tuple(count_field) if multi else (count_field,)
+    counts = [
+        (key, tuple(delta) if multi else (delta,))
+        for key, delta in counts.items()
+        if (any(delta) if multi else delta)
+    ]
+    if not counts:
+        return
+
+    opts = model._meta
+    qn = connection.ops.quote_name
+    key_model_fields = [opts.get_field(f) for f in key_fields]
+    key_columns = [f.column for f in key_model_fields]
+    count_columns = [opts.get_field(f).column for f in count_fields]
+
+    if not create or not connection.features.supports_update_conflicts_with_target:
+        for key, deltas in counts:
+            lookup = {f.attname: v for f, v in zip(key_model_fields, key)}
+            updates = {f: F(f) + d for f, d in zip(count_fields, deltas)}
+            if not model.objects.filter(**lookup).update(**updates) and create:
+                model.objects.create(**lookup, **dict(zip(count_fields, deltas)))
+        return
+
+    table = qn(opts.db_table)
+    columns = ", ".join(qn(c) for c in key_columns + count_columns)
+    conflict = ", ".join(qn(c) for c in key_columns)
+    row = "(" + ", ".join(["%s"] * (len(key_columns) + len(count_columns))) + ")"
+    assignments = ", ".join(
+        f"{qn(c)} = {table}.{qn(c)} + EXCLUDED.{qn(c)}" for c in count_columns
+    )
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(counts), chunk_size):
+            chunk = counts[i:i + chunk_size]
+            params = []
+            for key, deltas in chunk:
+                params.extend(f.get_db_prep_value(v, connection) for f, v in zip(key_model_fields, key))
+                params.extend(deltas)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row] * len(chunk))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {assignments}",
+                params,
+            )
+
+
+class HitCounter(BufferedWriter):
+    """
+    Write-behind counter for a single integer column, e.g. view counts.
+
+    `hit(pk)` only records the primary key. On flush the hits are summed
+    per row and applied with F() expressions, one UPDATE per distinct
+    delta. QuerySet.update() skips auto_now fields, so counting a view
+    never touches the row's updated_at. A lost hit only undercounts, so
+    a batch that keeps failing is dropped.
+    """
+
+    chunk_size = 500
+    max_retries = 3
+
+    def __init__(self, model, field, **kwargs):
+        self.model_label = model
+        self.field = field
+        super().__init__(**kwargs)
+
+    @property
+    def model(self):
+        from django.apps import apps
+
+        return apps.get_model(self.model_label)
+
+    def hit(self, pk):
+        return self.enqueue(pk)
+
+    def write(self, batch):
+        by_delta = defaultdict(list)
+        for pk, delta in Counter(batch).items():
+            by_delta[delta].append(pk)
+
+        manager = self.model._default_manager
+        for delta, pks in by_delta.items():
+            for i in range(0, len(pks), self.chunk_size):
+                manager.filter(pk__in=pks[i:i + self.chunk_size]).update(**{self.field: F(self.field) + delta})
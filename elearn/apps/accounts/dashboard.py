@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+SNAPSHOT_TTL = getattr(settings, "TEACHER_DASHBOARD_TTL", 600)
+
+
+def snapshot_key(teacher_id):
+    return f"dashboard:teacher:{teacher_id}"
+
+
+def invalidate_teacher_dashboard(teacher_id):
+    cache.delete(snapshot_key(teacher_id))
+
+
+def _count_per_classroom(model):
+    """Correlated COUNT(*) of `model` rows for the outer classroom."""
+    counts = (
+        model.objects.filter(classroom=OuterRef("pk"))
+        .order_by().values("classroom").annotate(n=Count("pk")).values("n")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def build_teacher_snapshot(teacher):
+    from apps.classroom.models import AnnouncementBoard, ClassMember
+    from apps.quizes.models import Quiz
+
+    # One subquery per relation: joining both in a single annotate would
+    # count over the members x announcements cross product.
+    classrooms = list(
+        teacher.classrooms_taught
+        .annotate(
+            member_count=_count_per_classroom(ClassMember),
+            announcement_count=_count_per_classroom(AnnouncementBoard),
+        )
+        .values("id", "name", "code", "member_count", "announcement_count")
+    )
+    quizzes = list(Quiz.objects.filter(teacher=teacher).order_by("-created_at").values("id", "title"))
+
+    return {
+        "classrooms": classrooms,
+        "classroom_count": len(classrooms),
+        "total_students": sum(c["member_count"] for c in classrooms),
+        "announcements": sum(c["announcement_count"] for c in classrooms),
+        "quizzes": quizzes,
+        "quiz_count": len(quizzes),
+    }
+
+
+def teacher_snapshot(teacher):
+    """Dashboard statistics for a teacher, served from cache between changes."""
+    key = snapshot_key(teacher.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_teacher_snapshot(teacher)
+        cache.set(key, snapshot, SNAPSHOT_TTL)
+    return snapshot
@@ -0,0 +1,240 @@
+import csv
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .models import UserProfile, GamificationStats, NotificationPreference
+
+
+FIELDS = ("username", "email", "password", "first_name", "last_name", "role", "school_name", "class_name")
+ROLES = {code for code, _ in UserProfile.ROLE_CHOICES}
+
+CHUNK_SIZE = getattr(settings, "STUDENT_IMPORT_CHUNK_SIZE", 500)
+# Below this many passwords a process pool costs more than it saves.
+PARALLEL_MIN_PASSWORDS = getattr(settings, "STUDENT_IMPORT_PARALLEL_MIN", 200)
+# The admin hashes in the request, so larger files go to the import_students command.
+ADMIN_MAX_ROWS = getattr(settings, "STUDENT_IMPORT_ADMIN_MAX_ROWS", 500)
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def __repr__(self):
+        return f"<ImportReport created={self.created} errors={len(self.errors)} rate={self.rate:.0f}/s>"
+
+
+# =========================================================
+# PARSING
+# =========================================================
+
+def read_rows(stream, fmt=None, name=""):
+    """
+    Parse an uploaded file or open text stream into a list of rows.
+    `fmt` is "csv" or "json"; when omitted it is taken from the file name.
+    JSON entries that are not objects are passed through as they are and
+    rejected row by row during the import.
+    """
+    fmt = fmt or ("json" if name.lower().endswith(".json") else "csv")
+    text = stream.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8-sig")
+
+    if fmt == "json":
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get("students", [])
+        if not isinstance(rows, list):
+            raise ValueError("expected a list of students")
+        return [{k: row.get(k) for k in FIELDS} if isinstance(row, dict) else row for row in rows]
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+# =========================================================
+# PASSWORD HASHING
+# =========================================================
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _hash(password):
+    # make_password(None) produces an unusable password
+    return make_password(password or None)
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Hash passwords with the configured hasher. PBKDF2 is deliberately slow,
+    so this is where bulk imports spend their time; with workers > 1 and at
+    least PARALLEL_MIN_PASSWORDS passwords the work is spread over a process
+    pool. Only the import_students command asks for one, never a request.
+    """
+    if workers <= 1 or len(passwords) < PARALLEL_MIN_PASSWORDS:
+        return [_hash(p) for p in passwords]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(_hash, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+# =========================================================
+# IMPORT
+# =========================================================
+
+def _clean(row, default_password=None):
+    if not isinstance(row, dict):
+        raise ValidationError("row must be an object")
+    for k in FIELDS:
+        if row.get(k) is not None and not isinstance(row[k], str):
+            raise ValidationError(f"{k} must be text")
+    # Passwords are taken verbatim; leading and trailing spaces are part of them.
+    password = row.get("password") or default_password or ""
+    row = {k: (row.get(k) or "").strip() for k in FIELDS if k != "password"}
+    row["password"] = password
+    if not row["username"]:
+        raise ValidationError("username is required")
+    if len(row["username"]) > User._meta.get_field("username").max_length:
+        raise ValidationError("username is too long")
+    if row["email"]:
+        validate_email(row["email"])
+    row["role"] = (row["role"] or "student").lower()
+    if row["role"] not in ROLES:
+        raise ValidationError(f"unknown role {row['role']!r}")
+    if password:
+        validate_password(password, user=User(
+            username=row["username"], email=row["email"],
+            first_name=row["first_name"], last_name=row["last_name"],
+        ))
+    return row
+
+
+def _validate(rows, report, default_password=None):
+    """Return the rows that can be created, keyed by their 1-based line number."""
+    valid = {}
+    for line, row in enumerate(rows, start=1):
+        try:
+            valid[line] = _clean(row, default_password)
+        except ValidationError as e:
+            report.error(line, "; ".join(e.messages))
+
+    seen_usernames, seen_emails = {}, {}
+    for line, row in list(valid.items()):
+        username, email = row["username"], row["email"]
+        if username in seen_usernames:
+            report.error(line, f"duplicate username (also on line {seen_usernames[username]})")
+            del valid[line]
+        elif email and email in seen_emails:
+            report.error(line, f"duplicate email (also on line {seen_emails[email]})")
+            del valid[line]
+        else:
+            seen_usernames[username] = line
+            if email:
+                seen_emails[email] = line
+
+    usernames = [row["username"] for row in valid.values()]
+    emails = [row["email"] for row in valid.values() if row["email"]]
+    taken_usernames, taken_emails = set(), set()
+    for i in range(0, len(usernames), CHUNK_SIZE):
+        taken_usernames.update(User.objects.filter(
+            username__in=usernames[i:i + CHUNK_SIZE]).values_list("username", flat=True))
+    for i in range(0, len(emails), CHUNK_SIZE):
+        taken_emails.update(User.objects.filter(
+            email__in=emails[i:i + CHUNK_SIZE]).values_list("email", flat=True))
+
+    for line, row in list(valid.items()):
+        if row["username"] in taken_usernames:
+            report.error(line, "username already exists")
+            del valid[line]
+        elif row["email"] in taken_emails:
+            report.error(line, "email already used")
+            del valid[line]
+    report.errors.sort()
+    return valid
+
+
+def _create_chunk(rows, hashes):
+    """Insert one chunk of users and their related rows; returns the new user ids."""
+    users = User.objects.bulk_create([
+        User(
+            username=row["username"],
+            email=row["email"],
+            password=password,
+            first_name=row["first_name"],
+            last_name=row["last_name"],
+        )
+        for row, password in zip(rows, hashes)
+    ])
+    UserProfile.objects.bulk_create([
+        UserProfile(
+            user=user,
+            role=row["role"],
+            school_name=row["school_name"] or None,
+            class_name=row["class_name"] or None,
+        )
+        for user, row in zip(users, rows)
+    ])
+    GamificationStats.objects.bulk_create([GamificationStats(user=user) for user in users])
+    NotificationPreference.objects.bulk_create([NotificationPreference(user=user) for user in users])
+    return [user.id for user in users]
+
+
+def import_students(rows, default_password=None, workers=1, dry_run=False):
+    """
+    Create accounts for many students at once.
+
+    Rows are validated up front (required fields, roles, the configured
+    password validators, duplicates within the file and against existing
+    accounts) and every problem is recorded in the report with its line
+    number. Rows without a password get `default_password`, or an unusable
+    password when that is not given either; `workers` is passed on to
+    hash_passwords. Accounts are inserted with bulk_create in
+    chunks of CHUNK_SIZE, each chunk in its own transaction. Signals do not
+    fire for bulk inserts, so the search index and leaderboard are updated
+    here directly.
+    """
+    from . import search
+    from .leaderboard import leaderboard_index
+
+    report = ImportReport()
+    started = time.monotonic()
+
+    valid = _validate(rows, report, default_password)
+    if dry_run or not valid:
+        report.elapsed = time.monotonic() - started
+        return report
+
+    lines = list(valid)
+    passwords = [valid[line]["password"] for line in lines]
+    hashes = hash_passwords(passwords, workers=workers)
+
+    for i in range(0, len(lines), CHUNK_SIZE):
+        chunk = [valid[line] for line in lines[i:i + CHUNK_SIZE]]
+        with transaction.atomic():
+            user_ids = _create_chunk(chunk, hashes[i:i + CHUNK_SIZE])
+            search.index_users(user_ids)
+        with leaderboard_index.batch():
+            for user_id in user_ids:
+                leaderboard_index.set_points(user_id, 0)
+        report.created += len(user_ids)
+
+    report.elapsed = time.monotonic() - started
+    return report
@@ -0,0 +1,164 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Bumped on every committed update and by `rebuild_leaderboard` so every
+# other worker drops its copy of the index.
+GENERATION_KEY = "leaderboard:generation"
+
+
+def _bump_generation():
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+        return 1
+
+
+class LeaderboardIndex:
+    """
+    Points-ordered index of every user with gamification stats.
+
+    Entries are kept sorted as (-points, user_id) so the top-N is a slice
+    and a rank is a single bisect. Ties share a rank, matching the old
+    "users with strictly more points + 1" definition.
+
+    Each worker holds its own copy. The worker that makes an update patches
+    its copy in place; once the update commits, the shared generation is
+    bumped so every other worker reloads on its next read.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age if max_age is not None else getattr(
+            settings, "LEADERBOARD_INDEX_MAX_AGE", 300
+        )
+        self._lock = threading.RLock()
+        self._entries = []
+        self._points = {}
+        self._loaded_at = None
+        self._generation = None
+        self._local = threading.local()
+
+    # ------------------
+    # LOADING
+    # ------------------
+    def _is_stale(self):
+        if self._loaded_at is None:
+            return True
+        if self.max_age and time.monotonic() - self._loaded_at > self.max_age:
+            return True
+        return cache.get(GENERATION_KEY, 0) != self._generation
+
+    def _ensure_loaded(self):
+        if self._is_stale():
+            self.load()
+
+    def load(self):
+        from .models import GamificationStats
+
+        rows = GamificationStats.objects.values_list("user_id", "points")
+        with self._lock:
+            self._points = dict(rows)
+            self._entries = sorted((-p, uid) for uid, p in self._points.items())
+            self._loaded_at = time.monotonic()
+            self._generation = cache.get(GENERATION_KEY, 0)
+
+    def rebuild(self):
+        """Reload from the database and invalidate every other worker's copy."""
+        _bump_generation()
+        self.load()
+        return len(self._entries)
+
+    # ------------------
+    # UPDATES
+    # ------------------
+    @contextmanager
+    def batch(self):
+        """Publish several updates with a single generation bump."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.depth = depth
+            if not depth and getattr(self._local, "dirty", False):
+                self._local.dirty = False
+                transaction.on_commit(self._published)
+
+    def _publish(self):
+        """Tell the other workers to reload once the current transaction commits."""
+        if getattr(self._local, "depth", 0):
+            self._local.dirty = True
+        else:
+            transaction.on_commit(self._published)
+
+    def _published(self):
+        seen = self._generation
+        generation = _bump_generation()
+        with self._lock:
+            # Keep this copy only if nobody else bumped since it was loaded.
+            if seen is not None and self._generation == seen and generation == seen + 1:
+                self._generation = generation
+
+    def _remove(self, user_id):
+        old = self._points.pop(user_id, None)
+        if old is not None:
+            i = bisect_left(self._entries, (-old, user_id))
+            if i < len(self._entries) and self._entries[i] == (-old, user_id):
+                del self._entries[i]
+        return old
+
+    def set_points(self, user_id, points):
+        with self._lock:
+            if self._loaded_at is not None:
+                if self._points.get(user_id) == points:
+                    return
+                self._remove(user_id)
+                self._points[user_id] = points
+                insort(self._entries, (-points, user_id))
+        self._publish()
+
+    def adjust(self, user_id, delta):
+        with self._lock:
+            if self._loaded_at is not None:
+                self.set_points(user_id, self._points.get(user_id, 0) + delta)
+                return
+        self._publish()
+
+    def discard(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+        self._publish()
+
+    # ------------------
+    # QUERIES
+    # ------------------
+    def top(self, n=100):
+        self._ensure_loaded()
+        with self._lock:
+            return [(uid, -neg) for neg, uid in self._entries[:n]]
+
+    def rank(self, user_id):
+        self._ensure_loaded()
+        with self._lock:
+            points = self._points.get(user_id)
+            if points is None:
+                return None
+            return bisect_left(self._entries, (-points, 0)) + 1
+
+    def points(self, user_id):
+        self._ensure_loaded()
+        return self._points.get(user_id)
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._entries)
+
+
+leaderboard_index = LeaderboardIndex()
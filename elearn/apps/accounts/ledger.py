@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .badges import evaluate_badges
+from .buffering import BufferedWriter
+from .leaderboard import leaderboard_index
+from . import userinfo
+
+
+UPDATE_CHUNK_SIZE = 500
+
+
+class PointsWriter(BufferedWriter):
+    """
+    Write-behind buffer for point awards.
+
+    Every award becomes one PointsLedger row. On flush the deltas are summed
+    per user and applied to GamificationStats with F() expressions, one
+    UPDATE per distinct delta, so concurrent awards never overwrite each other.
+    Users who gained points are then re-evaluated for the 'points' badges.
+
+    Awards are never dropped: a batch that fails to write stays queued
+    until a later flush succeeds.
+    """
+
+    def award(self, user_id, amount, reason="", source=""):
+        if amount:
+            self.enqueue((user_id, amount, reason, source, timezone.now()))
+
+    def write(self, batch):
+        from .models import GamificationStats, PointsLedger
+
+        deltas = defaultdict(int)
+        for user_id, amount, _, _, _ in batch:
+            deltas[user_id] += amount
+
+        by_delta = defaultdict(list)
+        for user_id, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(user_id)
+
+        now = timezone.now()
+        with transaction.atomic():
+            PointsLedger.objects.bulk_create([
+                PointsLedger(user_id=user_id, amount=amount, reason=reason, source=source, created_at=at)
+                for user_id, amount, reason, source, at in batch
+            ])
+
+            for delta, user_ids in by_delta.items():
+                for i in range(0, len(user_ids), UPDATE_CHUNK_SIZE):
+                    GamificationStats.objects.filter(
+                        user_id__in=user_ids[i:i + UPDATE_CHUNK_SIZE]
+                    ).update(
+                        points=F('points') + delta,
+                        level=Greatest(Value(1), (F('points') + delta) / 1000 + 1),
+                        updated_at=now,
+                    )
+
+        with leaderboard_index.batch():
+            for user_id, delta in deltas.items():
+                leaderboard_index.adjust(user_id, delta)
+        userinfo.invalidate(deltas)
+
+        # Only users who gained points can have moved into the top performers.
+        risers = [user_id for user_id, delta in deltas.items() if delta > 0]
+        if risers:
+            transaction.on_commit(lambda: evaluate_badges(users=risers, events=['points']), robust=True)
+
+
+points_writer = PointsWriter(
+    flush_size=getattr(settings, "POINTS_FLUSH_SIZE", 100),
+    flush_interval=getattr(settings, "POINTS_FLUSH_INTERVAL", 5.0),
+)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.badges import evaluate_badges
+
+
+class Command(BaseCommand):
+    help = "Evaluate every badge rule and award new badges (nightly full sweep)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classroom", type=int, help="Only evaluate active members of this classroom.")
+
+    def handle(self, *args, **options):
+        classroom = None
+        if options["classroom"]:
+            from apps.classroom.models import Classroom
+
+            try:
+                classroom = Classroom.objects.get(id=options["classroom"])
+            except Classroom.DoesNotExist:
+                raise CommandError(f"Classroom {options['classroom']} does not exist.")
+
+        awarded = evaluate_badges(classroom=classroom)
+
+        for badge, count in sorted(awarded.items()):
+            self.stdout.write(f"{badge}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Awarded {sum(awarded.values())} badges."))
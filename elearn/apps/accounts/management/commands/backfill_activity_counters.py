@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from apps.accounts.activity import activity_writer
+from apps.accounts.models import UserActivity, UserActivityCounter, UserActivityDaily
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user activity counters and daily buckets from UserActivity."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        activity_writer.flush()
+
+        user_ids = list(UserActivity.objects.order_by().values_list("user_id", flat=True).distinct())
+
+        for i in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[i:i + chunk_size]
+            activities = UserActivity.objects.filter(user_id__in=chunk).order_by()
+
+            totals = activities.values("user_id", "activity_type").annotate(n=Count("id"))
+            daily = (
+                activities.annotate(day=TruncDate("timestamp"))
+                .values("user_id", "activity_type", "day")
+                .annotate(n=Count("id"))
+            )
+
+            with transaction.atomic():
+                UserActivityCounter.objects.filter(user_id__in=chunk).delete()
+                UserActivityDaily.objects.filter(user_id__in=chunk).delete()
+                UserActivityCounter.objects.bulk_create(
+                    [UserActivityCounter(user_id=r["user_id"], activity_type=r["activity_type"], count=r["n"]) for r in totals],
+                    batch_size=500,
+                )
+                UserActivityDaily.objects.bulk_create(
+                    [UserActivityDaily(user_id=r["user_id"], activity_type=r["activity_type"], day=r["day"], count=r["n"]) for r in daily],
+                    batch_size=500,
+                )
+
+            self.stdout.write(f"Backfilled {min(i + chunk_size, len(user_ids))}/{len(user_ids)} users")
+
+        self.stdout.write(self.style.SUCCESS("Activity counters backfilled."))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts import thumbnails
+from apps.accounts.models import UserProfile
+from apps.classroom.models import Classroom
+
+
+SOURCES = (
+    (UserProfile, "profile_picture", ("avatar", "avatar_lg")),
+    (Classroom, "banner_image", ("banner", "card")),
+)
+
+
+class Command(BaseCommand):
+    help = "Pre-generate thumbnails for profile pictures and classroom banners."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", action="append", help="Only these sizes (repeatable).")
+        parser.add_argument("--force", action="store_true", help="Rebuild variants that already exist.")
+
+    def handle(self, *args, **options):
+        only = set(options["size"] or ())
+        unknown = only - set(thumbnails.SIZES)
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(sorted(unknown))}")
+
+        generated = failed = 0
+        for model, field, sizes in SOURCES:
+            sizes = [s for s in sizes if not only or s in only]
+            if not sizes:
+                continue
+            names = (
+                model.objects.exclude(**{f"{field}__isnull": True}).exclude(**{field: ""})
+                .values_list(field, flat=True).distinct().iterator()
+            )
+            for name in names:
+                for size in sizes:
+                    try:
+                        thumbnails.generate(name, size, force=options["force"])
+                        generated += 1
+                    except thumbnails.ThumbnailError as e:
+                        failed += 1
+                        self.stderr.write(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"Generated {generated} thumbnails; {failed} failed."))
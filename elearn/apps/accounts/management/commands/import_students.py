@@ -0,0 +1,44 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.importer import import_students, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create student accounts in bulk from a CSV or JSON file with fields "
+        "username, email, password, first_name, last_name, role, school_name, class_name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "json"], help="Defaults to the file extension.")
+        parser.add_argument("--default-password", help="Password for rows that do not set one.")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1, help="Hashing processes (default: CPU count).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Validate only.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as f:
+                rows = read_rows(f, fmt=options["format"], name=options["path"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        report = import_students(
+            rows,
+            default_password=options["default_password"],
+            workers=options["workers"],
+            dry_run=options["dry_run"],
+        )
+
+        for line, message in report.errors:
+            self.stderr.write(f"Row {line}: {message}")
+        verb = "Validated" if options["dry_run"] else "Created"
+        count = len(rows) - len(report.errors) if options["dry_run"] else report.created
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {count} accounts in {report.elapsed:.1f}s "
+            f"({report.rate:.0f}/s); {len(report.errors)} rows rejected."
+        ))
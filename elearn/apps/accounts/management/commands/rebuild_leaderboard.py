@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.leaderboard import leaderboard_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the in-memory leaderboard rank index from GamificationStats."
+
+    def handle(self, *args, **options):
+        count = leaderboard_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Leaderboard rebuilt with {count} users."))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from apps.accounts.leaderboard import leaderboard_index
+from apps.accounts.ledger import points_writer
+from apps.accounts.models import GamificationStats, PointsLedger
+
+
+class Command(BaseCommand):
+    help = "Rebuild GamificationStats.points and level from the points ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        points_writer.flush()
+
+        user_ids = list(GamificationStats.objects.order_by("user_id").values_list("user_id", flat=True))
+        fixed = 0
+
+        for i in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[i:i + chunk_size]
+            totals = dict(
+                PointsLedger.objects.filter(user_id__in=chunk)
+                .values_list("user_id")
+                .annotate(total=Sum("amount"))
+            )
+
+            with transaction.atomic():
+                stale = []
+                for stats in GamificationStats.objects.select_for_update().filter(user_id__in=chunk):
+                    points = totals.get(stats.user_id, 0)
+                    level = GamificationStats.level_for(points)
+                    if stats.points != points or stats.level != level:
+                        stats.points, stats.level = points, level
+                        stale.append(stats)
+                GamificationStats.objects.bulk_update(stale, ["points", "level"])
+
+            fixed += len(stale)
+
+        leaderboard_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(user_ids)} users, corrected {fixed}."
+        ))
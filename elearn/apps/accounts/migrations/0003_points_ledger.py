@@ -0,0 +1,46 @@
+# Generated by Django 4.2.27 on 2026-10-16 21:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    GamificationStats = apps.get_model('accounts', 'GamificationStats')
+    PointsLedger = apps.get_model('accounts', 'PointsLedger')
+
+    PointsLedger.objects.bulk_create(
+        (
+            PointsLedger(user_id=user_id, amount=points, reason='Opening balance', source='migration')
+            for user_id, points in GamificationStats.objects.filter(points__gt=0).values_list('user_id', 'points')
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_gamificationstats_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('source', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='accounts_po_user_id_cdb249_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
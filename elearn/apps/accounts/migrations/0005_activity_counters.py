@@ -0,0 +1,43 @@
+# Generated by Django 4.2.27 on 2026-10-16 21:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_useractivity_event_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(choices=[('login', 'Login'), ('quiz_attempt', 'Quiz Attempt'), ('quiz_submission', 'Quiz Submission'), ('discussion_post', 'Discussion Post'), ('attendance', 'Attendance'), ('resource_view', 'Resource View')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'activity_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserActivityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(choices=[('login', 'Login'), ('quiz_attempt', 'Quiz Attempt'), ('quiz_submission', 'Quiz Submission'), ('discussion_post', 'Discussion Post'), ('attendance', 'Attendance'), ('resource_view', 'Resource View')], max_length=50)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_daily', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['user', 'day'], name='accounts_us_user_id_4ce1bf_idx')],
+                'unique_together': {('user', 'activity_type', 'day')},
+            },
+        ),
+    ]
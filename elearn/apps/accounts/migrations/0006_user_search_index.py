@@ -0,0 +1,52 @@
+from django.db import migrations
+
+
+# The index schema as of this migration, spelled out so that later changes
+# to apps.accounts.search cannot alter what replaying it creates.
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS accounts_user_search "
+    "USING fts5(username, first_name, last_name, email, school_name, class_name, "
+    "tokenize='unicode61', prefix='2 3')"
+)
+
+POPULATE_INDEX = (
+    "INSERT INTO accounts_user_search "
+    "(rowid, username, first_name, last_name, email, school_name, class_name) "
+    "SELECT u.id, u.username, u.first_name, u.last_name, u.email, "
+    "COALESCE(p.school_name, ''), COALESCE(p.class_name, '') "
+    "FROM auth_user u LEFT JOIN accounts_userprofile p ON p.user_id = u.id"
+)
+
+OPTIMIZE_INDEX = "INSERT INTO accounts_user_search (accounts_user_search) VALUES ('optimize')"
+
+DROP_INDEX = "DROP TABLE IF EXISTS accounts_user_search"
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        for sql in (CREATE_INDEX, POPULATE_INDEX, OPTIMIZE_INDEX):
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_activity_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.27 on 2026-10-16 21:10
+
+from django.db import migrations, models
+
+
+def backfill_attendance_counters(apps, schema_editor):
+    from django.db.models import Count, Q
+
+    Attendance = apps.get_model('classroom', 'Attendance')
+    GamificationStats = apps.get_model('accounts', 'GamificationStats')
+    ProgressTracking = apps.get_model('classroom', 'ProgressTracking')
+
+    per_student = {
+        row['student_id']: row
+        for row in Attendance.objects.order_by().values('student_id').annotate(
+            present=Count('id', filter=Q(status='present')), total=Count('id'),
+        )
+    }
+    stats = list(GamificationStats.objects.filter(user_id__in=list(per_student)))
+    for s in stats:
+        row = per_student[s.user_id]
+        s.attendance_present, s.attendance_total = row['present'], row['total']
+        s.attendance_rate = round(row['present'] / row['total'] * 100, 2)
+    GamificationStats.objects.bulk_update(
+        stats, ['attendance_present', 'attendance_total', 'attendance_rate'], batch_size=500
+    )
+
+    pairs = Attendance.objects.order_by().values('classroom_id', 'student_id').annotate(
+        present=Count('id', filter=Q(status='present')), total=Count('id'),
+    )
+    for row in pairs:
+        ProgressTracking.objects.update_or_create(
+            classroom_id=row['classroom_id'], student_id=row['student_id'],
+            defaults={'attendance_count': row['present'], 'total_attendance': row['total']},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_user_search_index'),
+        ('classroom', '0002_alter_announcementboard_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamificationstats',
+            name='attendance_present',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gamificationstats',
+            name='attendance_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_attendance_counters, migrations.RunPython.noop),
+    ]
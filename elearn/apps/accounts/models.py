@@ -1,10 +1,74 @@
-from django.db import models
+import copy
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
 
-class UserProfile(models.Model):
+class TrackedFieldsMixin:
+    """
+    Remember the values a row was loaded with so it can be saved only
+    when something actually changed, and then only the changed columns.
+    """
+
+    untracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self):
+        self._loaded_values = {
+            f.attname: copy.deepcopy(self.__dict__[f.attname])
+            for f in self._meta.concrete_fields
+            if f.attname in self.__dict__
+        }
+
+    def dirty_fields(self):
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            f.name for f in self._meta.concrete_fields
+            if f.attname in loaded
+            and f.name not in self.untracked_fields
+            and getattr(self, f.attname) != loaded[f.attname]
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot()
+
+    def save_if_dirty(self):
+        dirty = self.dirty_fields()
+        if not dirty:
+            return False
+        if any(f.name == 'updated_at' for f in self._meta.concrete_fields):
+            dirty.append('updated_at')
+        self.save(update_fields=dirty)
+        return True
+
+
+class DerivedFieldsMixin:
+    """
+    Leave DERIVED_FIELDS (counters maintained with F() updates, buffers or
+    signals) out of plain saves, so a stale in-memory copy never overwrites
+    them. Saves that name their update_fields are left alone.
+    """
+
+    DERIVED_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class UserProfile(TrackedFieldsMixin, models.Model):
     ROLE_CHOICES = (
         ('student', 'Student'),
         ('teacher', 'Teacher'),
@@ -38,7 +102,7 @@ class UserProfile(models.Model):
         return self.user.gamification_stats.points
 
 
-class GamificationStats(models.Model):
+class GamificationStats(TrackedFieldsMixin, DerivedFieldsMixin, models.Model):
     BADGE_CHOICES = (
         ('first_quiz', 'First Quiz Taken'),
         ('perfect_score', 'Perfect Score'),
@@ -58,6 +122,9 @@ class GamificationStats(models.Model):
     total_quizzes_passed = models.IntegerField(default=0)
     total_participation_points = models.IntegerField(default=0)
     attendance_rate = models.FloatField(default=0.0)
+    # Running counters kept in step with Attendance writes (see classroom.attendance)
+    attendance_present = models.IntegerField(default=0)
+    attendance_total = models.IntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -65,30 +132,62 @@ class GamificationStats(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.points} pts"
 
+    # Maintained from PointsLedger and the attendance counters; never written by a plain save().
+    DERIVED_FIELDS = ('points', 'level', 'attendance_present', 'attendance_total')
+    untracked_fields = DERIVED_FIELDS
+
+    @staticmethod
+    def level_for(points):
+        return max(1, (points // 1000) + 1)
+
     # GAMIFICATION ENGINE
-    def add_points(self, amount: int, reason=""):
+    def add_points(self, amount: int, reason="", source=""):
+        from .ledger import points_writer
+
+        points_writer.award(self.user_id, amount, reason=reason, source=source)
         self.points += amount
-        self.level = max(1, (self.points // 1000) + 1)
-        self.save()
+        self.level = self.level_for(self.points)
 
     def add_badge(self, badge: str):
-        if badge not in self.badges:
-            self.badges.append(badge)
-            self.save()
+        from . import userinfo
+
+        if badge in self.badges:
+            return
+
+        with transaction.atomic():
+            row = GamificationStats.objects.select_for_update().filter(pk=self.pk)
+            badges = row.values_list('badges', flat=True).get()
+            if badge not in badges:
+                badges = badges + [badge]
+                row.update(badges=badges, updated_at=timezone.now())
+        self.badges = badges
+        userinfo.invalidate([self.user_id])
+        if hasattr(self, '_loaded_values'):
+            self._loaded_values['badges'] = list(badges)
 
     def recalc_attendance(self):
-        from apps.classroom.models import Attendance
+        from apps.classroom.attendance import recount_attendance
+
+        recount_attendance([self.user_id])
+        self.refresh_from_db(fields=['attendance_present', 'attendance_total', 'attendance_rate'])
+
 
-        total = Attendance.objects.filter(student=self.user).count()
-        if total == 0:
-            self.attendance_rate = 0
-        else:
-            present = Attendance.objects.filter(student=self.user, status='present').count()
-            self.attendance_rate = round((present / total) * 100, 2)
-        self.save()
+class PointsLedger(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_ledger')
+    amount = models.IntegerField()
+    reason = models.CharField(max_length=255, blank=True)
+    source = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', '-created_at'])]
+
+    def __str__(self):
+        return f"{self.user.username} {self.amount:+d} pts"
 
 
-class NotificationPreference(models.Model):
+class NotificationPreference(TrackedFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_preference')
 
     quiz_reminders = models.BooleanField(default=True)
@@ -114,7 +213,8 @@ class UserActivity(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities')
     activity_type = models.CharField(max_length=50, choices=ACTIVITY_TYPES)
     description = models.TextField(blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the buffered row is flushed.
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-timestamp']
@@ -122,3 +222,30 @@ class UserActivity(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.activity_type}"
+
+
+class UserActivityCounter(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_counters')
+    activity_type = models.CharField(max_length=50, choices=UserActivity.ACTIVITY_TYPES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'activity_type')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.activity_type}: {self.count}"
+
+
+class UserActivityDaily(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_daily')
+    activity_type = models.CharField(max_length=50, choices=UserActivity.ACTIVITY_TYPES)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'activity_type', 'day')
+        ordering = ['-day']
+        indexes = [models.Index(fields=['user', 'day'])]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.activity_type} ({self.day}): {self.count}"
@@ -0,0 +1,145 @@
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+
+from .models import UserProfile
+
+
+TABLE = "accounts_user_search"
+
+USER_FIELDS = ("username", "first_name", "last_name", "email")
+PROFILE_FIELDS = ("school_name", "class_name")
+
+# bm25() weights, in column order: names matter more than school/class.
+WEIGHTS = (10.0, 5.0, 5.0, 2.0, 1.0, 1.0)
+
+_fts5_available = {}
+
+
+def fts5_available(conn=connection):
+    if conn.vendor != "sqlite":
+        return False
+    if conn.alias not in _fts5_available:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            _fts5_available[conn.alias] = bool(cursor.fetchone()[0])
+    return _fts5_available[conn.alias]
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 prefix query: every term must match."""
+    terms = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+# =========================================================
+# INDEX MAINTENANCE
+# =========================================================
+
+def create_index(conn=connection):
+    columns = ", ".join(USER_FIELDS + PROFILE_FIELDS)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+            f"USING fts5({columns}, tokenize='unicode61', prefix='2 3')"
+        )
+
+
+def drop_index(conn=connection):
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def _select_documents(where=""):
+    user_cols = ", ".join(f"u.{f}" for f in USER_FIELDS)
+    profile_cols = ", ".join(f"COALESCE(p.{f}, '')" for f in PROFILE_FIELDS)
+    return (
+        f"SELECT u.id, {user_cols}, {profile_cols} "
+        f"FROM {User._meta.db_table} u "
+        f"LEFT JOIN {UserProfile._meta.db_table} p ON p.user_id = u.id {where}"
+    )
+
+
+def index_user(user_id, conn=connection):
+    if not fts5_available(conn):
+        return
+    columns = ", ".join(("rowid",) + USER_FIELDS + PROFILE_FIELDS)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABLE} ({columns}) " + _select_documents("WHERE u.id = %s"),
+            [user_id],
+        )
+
+
+def index_users(user_ids, conn=connection, chunk_size=500):
+    if not fts5_available(conn):
+        return
+    user_ids = list(user_ids)
+    columns = ", ".join(("rowid",) + USER_FIELDS + PROFILE_FIELDS)
+    with conn.cursor() as cursor:
+        for i in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[i:i + chunk_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {TABLE} ({columns}) "
+                + _select_documents(f"WHERE u.id IN ({placeholders})"),
+                chunk,
+            )
+
+
+def unindex_user(user_id, conn=connection):
+    if not fts5_available(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [user_id])
+
+
+def rebuild_index(conn=connection):
+    if not fts5_available(conn):
+        return 0
+    columns = ", ".join(("rowid",) + USER_FIELDS + PROFILE_FIELDS)
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(f"INSERT INTO {TABLE} ({columns}) " + _select_documents())
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+# =========================================================
+# QUERIES
+# =========================================================
+
+def search_users(query, limit=20):
+    """
+    Ranked prefix search over users and their profiles. Each returned User
+    carries a `role` attribute, so callers need no per-row profile query.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    if not fts5_available():
+        users = list(User.objects.filter(
+            Q(username__icontains=query)
+            | Q(first_name__icontains=query)
+            | Q(last_name__icontains=query)
+            | Q(email__icontains=query)
+            | Q(profile__school_name__icontains=query)
+            | Q(profile__class_name__icontains=query)
+        ).select_related("profile")[:limit])
+        for u in users:
+            u.role = u.profile.role if hasattr(u, "profile") else None
+        return users
+
+    weights = ", ".join(str(w) for w in WEIGHTS)
+    return list(User.objects.raw(
+        f"SELECT u.*, p.role AS role, bm25({TABLE}, {weights}) AS rank "
+        f"FROM {TABLE} "
+        f"JOIN {User._meta.db_table} u ON u.id = {TABLE}.rowid "
+        f"LEFT JOIN {UserProfile._meta.db_table} p ON p.user_id = u.id "
+        f"WHERE {TABLE} MATCH %s ORDER BY rank LIMIT %s",
+        [expression, limit],
+    ))
@@ -1,22 +1,215 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile, GamificationStats, NotificationPreference
+from django.utils import timezone
+from .models import UserProfile, GamificationStats
+from .leaderboard import leaderboard_index
+from . import search, thumbnails, userinfo
+from .dashboard import invalidate_teacher_dashboard
+
+
+RELATED_ACCESSORS = ('profile', 'gamification_stats', 'notification_preference')
 
 
 @receiver(post_save, sender=User)
-def create_related(sender, instance, created, **kwargs):
-    if created:
+def create_related(sender, instance, created, raw=False, **kwargs):
+    # Fixtures bring their own related rows. NotificationPreference is
+    # created lazily by notification_preferences() the first time it is needed.
+    if created and not raw:
         UserProfile.objects.create(user=instance)
         GamificationStats.objects.create(user=instance)
-        NotificationPreference.objects.create(user=instance)
 
 
 @receiver(post_save, sender=User)
-def save_related(sender, instance, **kwargs):
-    if hasattr(instance, "profile"):
-        instance.profile.save()
-    if hasattr(instance, "gamification_stats"):
-        instance.gamification_stats.save()
-    if hasattr(instance, "notification_preference"):
-        instance.notification_preference.save()
+def save_related(sender, instance, created, raw=False, **kwargs):
+    # Only persist related objects that were loaded on this instance and
+    # changed since; a plain User.save() (e.g. last_login) costs nothing extra.
+    if created or raw:
+        return
+    for accessor in RELATED_ACCESSORS:
+        related = instance._state.fields_cache.get(accessor)
+        if related is not None and related.pk:
+            related.save_if_dirty()
+
+
+# =========================================================
+# LEADERBOARD INDEX
+# =========================================================
+
+@receiver(post_save, sender=GamificationStats)
+def add_to_leaderboard(sender, instance, created, **kwargs):
+    # Later point changes go through the ledger writer, which adjusts the index.
+    if created:
+        leaderboard_index.set_points(instance.user_id, instance.points)
+
+
+@receiver(post_delete, sender=GamificationStats)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    leaderboard_index.discard(instance.user_id)
+
+
+# =========================================================
+# BADGES (incremental mode)
+# =========================================================
+
+def _evaluate_badges_on_commit(user_id, event):
+    from .badges import evaluate_badges
+
+    transaction.on_commit(lambda: evaluate_badges(users=[user_id], events=[event]))
+
+
+@receiver(post_save, sender='quizes.QuizScore')
+def badges_for_quiz(sender, instance, created, **kwargs):
+    if created:
+        _evaluate_badges_on_commit(instance.student_id, 'quiz')
+
+
+@receiver(post_save, sender='classroom.Attendance')
+def badges_for_attendance(sender, instance, **kwargs):
+    _evaluate_badges_on_commit(instance.student_id, 'attendance')
+
+
+@receiver(post_save, sender='classroom.DiscussionReply')
+def badges_for_discussion(sender, instance, created, **kwargs):
+    if created:
+        _evaluate_badges_on_commit(instance.author_id, 'discussion')
+
+
+# =========================================================
+# USER SEARCH INDEX
+# =========================================================
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+def _search_document(user):
+    # Read __dict__ so deferred fields are never fetched just to compare.
+    return tuple(user.__dict__.get(f) for f in search.USER_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_search_document(sender, instance, **kwargs):
+    instance._search_document = _search_document(instance)
+
+
+@receiver(post_save, sender=User)
+def index_user_for_search(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, search.USER_FIELDS):
+        return
+    document = _search_document(instance)
+    if created or document != getattr(instance, "_search_document", None):
+        search.index_user(instance.pk)
+        instance._search_document = document
+
+
+@receiver(post_save, sender=UserProfile)
+def index_profile_for_search(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, search.PROFILE_FIELDS):
+        return
+    if created and not (instance.school_name or instance.class_name):
+        return
+    search.index_user(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user_for_search(sender, instance, **kwargs):
+    search.unindex_user(instance.pk)
+
+
+# =========================================================
+# USER INFO API CACHE
+# =========================================================
+
+@receiver(post_init, sender=User)
+def remember_user_info_fields(sender, instance, **kwargs):
+    instance._user_info_fields = userinfo.user_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_info(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) - {"last_login"}:
+        userinfo.invalidate([instance.pk])
+    fields = userinfo.user_fields(instance)
+    if not (raw or created) and fields != instance._user_info_fields:
+        # Last-Modified comes from the profile and stats rows; move it so
+        # If-Modified-Since does not answer 304 after a name or email edit.
+        UserProfile.objects.filter(user_id=instance.pk).update(updated_at=timezone.now())
+    instance._user_info_fields = fields
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=GamificationStats)
+def invalidate_related_user_info(sender, instance, **kwargs):
+    userinfo.invalidate([instance.user_id])
+
+
+@receiver(post_delete, sender=User)
+def forget_user_info(sender, instance, **kwargs):
+    userinfo.invalidate([instance.pk])
+
+
+# =========================================================
+# TEACHER DASHBOARD SNAPSHOT
+# =========================================================
+
+@receiver(post_save, sender='classroom.Classroom')
+@receiver(post_delete, sender='classroom.Classroom')
+@receiver(post_save, sender='quizes.Quiz')
+@receiver(post_delete, sender='quizes.Quiz')
+def invalidate_dashboard_for_teacher(sender, instance, **kwargs):
+    invalidate_teacher_dashboard(instance.teacher_id)
+
+
+@receiver(post_save, sender='classroom.ClassMember')
+@receiver(post_delete, sender='classroom.ClassMember')
+@receiver(post_save, sender='classroom.AnnouncementBoard')
+@receiver(post_delete, sender='classroom.AnnouncementBoard')
+def invalidate_dashboard_for_classroom(sender, instance, **kwargs):
+    from apps.classroom.models import Classroom
+
+    teacher_id = Classroom.objects.filter(pk=instance.classroom_id).values_list('teacher_id', flat=True).first()
+    if teacher_id is not None:
+        invalidate_teacher_dashboard(teacher_id)
+
+
+# =========================================================
+# THUMBNAILS
+# =========================================================
+
+IMAGE_FIELDS = {'profile_picture', 'banner_image'}
+
+
+def _image_names(instance):
+    # __dict__ holds a plain name until the field is first accessed.
+    names = {}
+    for field in IMAGE_FIELDS & instance.__dict__.keys():
+        value = instance.__dict__[field]
+        names[field] = getattr(value, 'name', value) or None
+    return names
+
+
+@receiver(post_init, sender=UserProfile)
+@receiver(post_init, sender='classroom.Classroom')
+def remember_image_names(sender, instance, **kwargs):
+    instance._image_names = _image_names(instance) if instance.pk else {}
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender='classroom.Classroom')
+def drop_replaced_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = _image_names(instance)
+    for field, old in getattr(instance, '_image_names', {}).items():
+        if old and current.get(field) != old:
+            thumbnails.delete_thumbnails(old)
+    instance._image_names = current
+
+
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender='classroom.Classroom')
+def drop_deleted_thumbnails(sender, instance, **kwargs):
+    for name in _image_names(instance).values():
+        thumbnails.delete_thumbnails(name)
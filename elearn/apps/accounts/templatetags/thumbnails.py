@@ -0,0 +1,12 @@
+from django import template
+
+from apps.accounts.thumbnails import thumbnail_url
+
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(fieldfile, size):
+    """{{ profile.profile_picture|thumbnail:"avatar" }}"""
+    return thumbnail_url(fieldfile, size)
@@ -1,3 +1,612 @@
-from django.test import TestCase
+import datetime
+import io
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.signals import request_finished
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .activity import activity_writer, log_activity
+from .badges import evaluate_badges
+from .importer import import_students, read_rows
+from .leaderboard import LeaderboardIndex
+from .ledger import points_writer
+from . import buffering, importer, ledger, search, thumbnails
+from .models import (
+    UserProfile, GamificationStats, NotificationPreference, PointsLedger, UserActivity, UserActivityCounter,
+)
+
+
+class RelatedObjectQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("harry", email="harry@hogwarts.edu", password="Nimbus-2000")
+        activity_writer.flush()
+        patcher = mock.patch.object(activity_writer, "flush_interval", 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(activity_writer.flush)
+
+    def test_related_rows_created_once(self):
+        self.assertEqual(UserProfile.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(GamificationStats.objects.filter(user=self.user).count(), 1)
+
+    def test_plain_user_save_does_not_touch_related_rows(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.profile
+        user.gamification_stats
+
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_dirty_related_row_saved_once(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.profile.bio = "The boy who lived"
+
+        with self.assertNumQueries(2):
+            user.save()
+        self.assertEqual(UserProfile.objects.get(user=user).bio, "The boy who lived")
+
+    def test_login_query_count(self):
+        # authenticate, session create + save (with savepoints) and the
+        # last_login update; the activity row is buffered
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse("login"), {
+                "username": "harry",
+                "password": "Nimbus-2000",
+            })
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+
+    def test_register_query_count(self):
+        # two uniqueness checks, user + profile + stats inserts, search index row
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse("register"), {
+                "username": "hermione",
+                "email": "hermione@hogwarts.edu",
+                "password": "Crookshanks-1",
+                "confirm_password": "Crookshanks-1",
+                "role": "student",
+            })
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+        self.assertTrue(UserProfile.objects.filter(user__username="hermione").exists())
+
+    def test_register_teacher_updates_role_only(self):
+        self.client.post(reverse("register"), {
+            "username": "minerva",
+            "email": "minerva@hogwarts.edu",
+            "password": "Transfigure-1",
+            "confirm_password": "Transfigure-1",
+            "role": "teacher",
+        })
+        self.assertEqual(UserProfile.objects.get(user__username="minerva").role, "teacher")
+
+    def test_notification_preference_created_lazily(self):
+        self.assertFalse(NotificationPreference.objects.filter(user=self.user).exists())
+        self.client.force_login(self.user)
+        self.client.get(reverse("notification_preferences"))
+        self.client.get(reverse("notification_preferences"))
+        self.assertEqual(NotificationPreference.objects.filter(user=self.user).count(), 1)
+
+
+class ActivityWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("ron", password="Scabbers-1")
+        activity_writer.flush()
+        self.addCleanup(activity_writer.flush)
+
+    def test_flushes_buffered_events_in_one_insert(self):
+        with mock.patch.object(activity_writer, "flush_interval", 3600):
+            with self.assertNumQueries(0):
+                for _ in range(3):
+                    log_activity(self.user, "login")
+
+        # one insert for the rows, one upsert per counter table, in a savepoint
+        with self.assertNumQueries(5):
+            self.assertEqual(activity_writer.flush(), 3)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 3)
+
+    def test_drop_policy_counts_dropped_events(self):
+        before = activity_writer.stats()
+        with mock.patch.multiple(activity_writer, flush_interval=3600, max_pending=2, overflow="drop"):
+            results = [log_activity(self.user, "login") for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(activity_writer.stats()["dropped"] - before["dropped"], 1)
+
+    def test_failed_write_is_retried_without_breaking_the_caller(self):
+        with mock.patch.object(activity_writer, "write", side_effect=DatabaseError("locked")), \
+                mock.patch.object(activity_writer, "flush_size", 1), \
+                self.assertLogs(buffering.logger, "ERROR"):
+            self.assertTrue(log_activity(self.user, "login"))
+        self.assertEqual(activity_writer.pending(), 1)
+        self.assertFalse(UserActivity.objects.filter(user=self.user).exists())
+
+        self.assertEqual(activity_writer.flush(), 1)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 1)
+
+    def test_failing_batch_is_dropped_after_its_retries(self):
+        before = activity_writer.stats()
+        log_activity(self.user, "login")
+        with mock.patch.object(activity_writer, "write", side_effect=DatabaseError("locked")), \
+                self.assertLogs(buffering.logger, "ERROR"):
+            for _ in range(activity_writer.max_retries + 1):
+                activity_writer.flush()
+        self.assertEqual(activity_writer.pending(), 0)
+        self.assertEqual(activity_writer.stats()["failed"] - before["failed"], 1)
+
+    def test_flush_updates_activity_counters(self):
+        log_activity(self.user, "login")
+        log_activity(self.user, "login")
+        log_activity(self.user, "quiz_attempt")
+        activity_writer.flush()
+        log_activity(self.user, "login")
+        activity_writer.flush()
+
+        counts = dict(UserActivityCounter.objects.filter(user=self.user).values_list("activity_type", "count"))
+        self.assertEqual(counts, {"login": 3, "quiz_attempt": 1})
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("user_stats"))
+        self.assertEqual(response.context["login_count"], 3)
+        self.assertEqual(response.context["total_activities"], 4)
+
+
+class LeaderboardIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {}
+        for name, points in (("hermione", 300), ("harry", 200), ("ron", 200), ("neville", 50)):
+            user = User.objects.create_user(name)
+            GamificationStats.objects.filter(user=user).update(points=points)
+            self.users[name] = user.id
+        self.index = LeaderboardIndex(max_age=0)
+        self.index.load()
+
+    def ranks(self):
+        return {name: self.index.rank(uid) for name, uid in self.users.items()}
+
+    def test_ranks_and_top_slice(self):
+        # Equal points are ordered by user id.
+        first_tied = min(self.users["harry"], self.users["ron"])
+        self.assertEqual(self.index.top(2), [(self.users["hermione"], 300), (first_tied, 200)])
+        self.assertEqual(self.index.rank(self.users["neville"]), 4)
+        self.assertIsNone(self.index.rank(0))
+
+    def test_ties_share_a_rank(self):
+        self.assertEqual(self.ranks(), {"hermione": 1, "harry": 2, "ron": 2, "neville": 4})
+
+    def test_updates_move_users(self):
+        self.index.adjust(self.users["neville"], 300)
+        self.assertEqual(self.ranks(), {"neville": 1, "hermione": 2, "harry": 3, "ron": 3})
+
+        self.index.set_points(self.users["ron"], 10)
+        self.assertEqual(self.ranks(), {"neville": 1, "hermione": 2, "harry": 3, "ron": 4})
+        self.assertEqual(self.index.points(self.users["ron"]), 10)
+
+        self.index.discard(self.users["hermione"])
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.rank(self.users["neville"]), 1)
+
+    def test_rebuild_is_seen_by_other_copies(self):
+        other = LeaderboardIndex(max_age=0)
+        other.load()
+        GamificationStats.objects.filter(user_id=self.users["neville"]).update(points=1000)
+
+        self.index.rebuild()
+        self.assertEqual(other.rank(self.users["neville"]), 1)
+
+    def test_committed_updates_are_seen_by_other_copies(self):
+        other = LeaderboardIndex(max_age=0)
+        other.load()
+        draco = User.objects.create_user("draco")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GamificationStats.objects.filter(user=draco).update(points=500)
+            GamificationStats.objects.filter(user_id=self.users["neville"]).update(points=1050)
+            with self.index.batch():
+                self.index.set_points(draco.id, 500)
+                self.index.adjust(self.users["neville"], 1000)
+        self.assertEqual(other.rank(draco.id), 2)
+        self.assertEqual(other.rank(self.users["neville"]), 1)
+
+        # The copy that made the update keeps its patched entries.
+        with mock.patch.object(self.index, "load") as load:
+            self.assertEqual(self.index.rank(draco.id), 2)
+        load.assert_not_called()
+
+
+class PointsLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.harry = User.objects.create_user("harry")
+        self.ron = User.objects.create_user("ron")
+        points_writer.flush()
+        patcher = mock.patch.object(points_writer, "flush_interval", 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(points_writer.flush)
+
+        self.index = LeaderboardIndex(max_age=0)
+        self.index.load()
+        patcher = mock.patch.object(ledger, "leaderboard_index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def points(self, user):
+        return GamificationStats.objects.get(user=user).points
+
+    def test_awards_are_buffered_and_flushed_together(self):
+        with self.assertNumQueries(0):
+            points_writer.award(self.harry.id, 50, "Quiz passed", "quiz")
+            points_writer.award(self.harry.id, 25, "Attended", "attendance")
+            points_writer.award(self.ron.id, 10, "Quiz passed", "quiz")
+        self.assertEqual(self.points(self.harry), 0)
+
+        self.assertEqual(points_writer.flush(), 3)
+        self.assertEqual(PointsLedger.objects.filter(user=self.harry).count(), 2)
+        self.assertEqual((self.points(self.harry), self.points(self.ron)), (75, 10))
+
+    def test_flush_moves_users_on_the_leaderboard(self):
+        points_writer.award(self.ron.id, 10)
+        points_writer.flush()
+        self.assertEqual((self.index.rank(self.ron.id), self.index.rank(self.harry.id)), (1, 2))
+
+        points_writer.award(self.harry.id, 30)
+        points_writer.flush()
+        self.assertEqual(self.index.top(2), [(self.harry.id, 30), (self.ron.id, 10)])
+        self.assertEqual(self.index.rank(self.ron.id), 2)
+
+    def test_failing_batch_is_kept_until_it_is_written(self):
+        before = points_writer.stats()
+        points_writer.award(self.harry.id, 5)
+        with mock.patch.object(points_writer, "write", side_effect=DatabaseError("disk full")), \
+                self.assertLogs(buffering.logger, "ERROR"):
+            for _ in range(10):
+                self.assertEqual(points_writer.flush(), 0)
+        self.assertEqual(points_writer.pending(), 1)
+        self.assertEqual(points_writer.stats()["failed"], before["failed"])
+        self.assertFalse(PointsLedger.objects.exists())
+
+        points_writer.award(self.harry.id, 7)
+        self.assertEqual(points_writer.flush(), 2)
+        self.assertEqual(PointsLedger.objects.filter(user=self.harry).count(), 2)
+        self.assertEqual(self.points(self.harry), 12)
+
+    def test_request_finished_never_raises(self):
+        points_writer.award(self.harry.id, 5)
+        with mock.patch.object(points_writer, "write", side_effect=DatabaseError("disk full")), \
+                mock.patch.object(points_writer, "flush_interval", 0), \
+                self.assertLogs(buffering.logger, "ERROR"):
+            request_finished.send(sender=self.__class__)
+        self.assertEqual(points_writer.pending(), 1)
+
+
+class BadgeRuleTests(TestCase):
+    def setUp(self):
+        from apps.quizes.models import Question, Quiz
+
+        self.teacher = User.objects.create_user("snape")
+        self.harry = User.objects.create_user("harry")
+        self.quiz = Quiz.objects.create(teacher=self.teacher, title="Potions", password="bezoar")
+        for text in ("Bezoar?", "Aconite?"):
+            Question.objects.create(quiz=self.quiz, text=text, correct_answer="a")
+
+        points_writer.flush()
+        patcher = mock.patch.object(points_writer, "flush_interval", 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(points_writer.flush)
+
+    def badges(self, user):
+        return GamificationStats.objects.get(user=user).badges
+
+    def score(self, user, score):
+        from apps.quizes.models import QuizScore
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return QuizScore.objects.create(student=user, quiz=self.quiz, score=score)
+
+    def test_quiz_event_awards_quiz_badges(self):
+        self.score(self.harry, 2)
+        self.assertEqual(self.badges(self.harry), ["first_quiz", "perfect_score"])
+
+    def test_events_select_rules_and_awards_are_not_repeated(self):
+        from apps.quizes.models import QuizScore
+
+        QuizScore.objects.create(student=self.harry, quiz=self.quiz, score=1)
+        self.assertEqual(dict(evaluate_badges(users=[self.harry], events=["attendance"])), {})
+        self.assertEqual(self.badges(self.harry), [])
+
+        self.assertEqual(dict(evaluate_badges()), {"first_quiz": 1})
+        self.assertEqual(dict(evaluate_badges()), {})
+        self.assertEqual(self.badges(self.harry), ["first_quiz"])
+
+    def test_points_flush_awards_top_performer(self):
+        points_writer.award(self.harry.id, 100, "Quiz passed", "quiz")
+        with self.captureOnCommitCallbacks(execute=True):
+            points_writer.flush()
+        self.assertIn("top_performer", self.badges(self.harry))
+        self.assertNotIn("top_performer", self.badges(self.teacher))
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.harry = User.objects.create_user("hpotter", first_name="Harry", last_name="Potter")
+        User.objects.create_user("hgranger", first_name="Hermione", last_name="Granger")
+        profile = self.harry.profile
+        profile.class_name = "Gryffindor"
+        profile.save()
+
+    def test_prefix_search_returns_roles_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("search_users"), {"q": "gryff"},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+        users = response.json()["users"]
+        self.assertEqual([u["username"] for u in users], ["hpotter"])
+        self.assertEqual(users[0]["role"], "student")
+
+    def test_index_follows_renames(self):
+        self.harry.first_name = "Harold"
+        self.harry.save()
+        self.assertEqual([u.username for u in search.search_users("harold")], ["hpotter"])
+        self.assertEqual(search.search_users("harry"), [])
+
+
+class UserInfoApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(f"student{i}") for i in range(3)]
+
+    def test_conditional_get_returns_not_modified(self):
+        url = reverse("get_user_info", args=[self.users[0].id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()["username"], "student0")
+
+        with self.assertNumQueries(0):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_stats_change_invalidates_cache(self):
+        url = reverse("get_user_info", args=[self.users[0].id])
+        etag = self.client.get(url)["ETag"]
+
+        stats = self.users[0].gamification_stats
+        stats.attendance_rate = 92.5
+        stats.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["attendance_rate"], 92.5)
+
+    def test_name_change_moves_last_modified(self):
+        url = reverse("get_user_info", args=[self.users[0].id])
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        user = User.objects.get(pk=self.users[0].pk)
+        user.first_name = "Neville"
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() + datetime.timedelta(minutes=5)):
+            user.save()
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["full_name"], "Neville")
+
+    def test_batch_loads_misses_in_one_query(self):
+        ids = ",".join(str(u.id) for u in self.users)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("get_users_info"), {"ids": ids})
+        self.assertEqual([u["username"] for u in response.json()["users"]], ["student0", "student1", "student2"])
+
+    def test_unknown_user_is_404(self):
+        self.assertEqual(self.client.get(reverse("get_user_info", args=[9999])).status_code, 404)
+
+
+class TeacherDashboardTests(TestCase):
+    def setUp(self):
+        from apps.classroom.models import Classroom, ClassMember
+
+        cache.clear()
+        self.teacher = User.objects.create_user("snape", password="Always-1")
+        profile = self.teacher.profile
+        profile.role = "teacher"
+        profile.save()
+
+        self.classrooms = [
+            Classroom.objects.create(teacher=self.teacher, name=f"Potions {i}", code=f"POT{i}", subject="Potions")
+            for i in range(5)
+        ]
+        for i, classroom in enumerate(self.classrooms):
+            for j in range(i):
+                ClassMember.objects.create(classroom=classroom, student=User.objects.create_user(f"s{i}-{j}"))
+        self.client.force_login(self.teacher)
+
+    def test_query_count_does_not_grow_with_classrooms(self):
+        self.client.get(reverse("dashboard"))
+        # session, user, profile and stats; the snapshot comes from cache
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["classroom_count"], 5)
+        self.assertEqual(response.context["total_students"], 10)
+
+    def test_counts_members_and_announcements_separately(self):
+        from apps.classroom.models import AnnouncementBoard
+        from .dashboard import build_teacher_snapshot
+
+        for i in range(3):
+            AnnouncementBoard.objects.create(classroom=self.classrooms[4], teacher=self.teacher, title=f"N{i}", content="...")
+        snapshot = build_teacher_snapshot(self.teacher)
+        counts = {c["id"]: (c["member_count"], c["announcement_count"]) for c in snapshot["classrooms"]}
+        self.assertEqual(counts[self.classrooms[4].id], (4, 3))
+        self.assertEqual(counts[self.classrooms[0].id], (0, 0))
+        self.assertEqual((snapshot["total_students"], snapshot["announcements"]), (10, 3))
+
+    def test_membership_change_invalidates_snapshot(self):
+        from apps.classroom.models import ClassMember
+
+        self.client.get(reverse("dashboard"))
+        ClassMember.objects.create(classroom=self.classrooms[0], student=User.objects.create_user("new"))
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["total_students"], 11)
+
+
+class StudentImportTests(TestCase):
+    CSV = (
+        "username,email,password,first_name,role,class_name\n"
+        "nlongbottom,neville@hogwarts.edu,Mimbulus-1,Neville,,Gryffindor\n"
+        "llovegood,luna@hogwarts.edu,,Luna,student,Ravenclaw\n"
+        "nlongbottom,other@hogwarts.edu,,Neville,,\n"
+        "cchang,not-an-email,,Cho,,\n"
+        "dmalfoy,draco@hogwarts.edu,,Draco,death-eater,\n"
+    )
+
+    def setUp(self):
+        User.objects.create_user("hpotter", email="harry@hogwarts.edu")
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        rows = read_rows(io.StringIO(self.CSV))
+        report = import_students(rows, default_password="Welcome-1", workers=1)
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual([line for line, _ in report.errors], [3, 4, 5])
+
+        neville = User.objects.get(username="nlongbottom")
+        self.assertTrue(neville.check_password("Mimbulus-1"))
+        self.assertTrue(User.objects.get(username="llovegood").check_password("Welcome-1"))
+        self.assertEqual(neville.profile.class_name, "Gryffindor")
+        self.assertEqual(neville.profile.role, "student")
+        self.assertEqual(neville.gamification_stats.points, 0)
+        self.assertTrue(NotificationPreference.objects.filter(user=neville).exists())
+        self.assertEqual([u.username for u in search.search_users("gryffindor")], ["nlongbottom"])
+
+    def test_existing_accounts_are_rejected(self):
+        rows = [{"username": "hpotter"}, {"username": "ginny", "email": "harry@hogwarts.edu"}]
+        report = import_students(rows, workers=1)
+        self.assertEqual(report.created, 0)
+        self.assertEqual(report.errors, [(1, "username already exists"), (2, "email already used")])
+
+    def test_passwords_are_kept_verbatim_and_validated(self):
+        rows = [
+            {"username": "fweasley", "password": "  Mischief-Managed "},
+            {"username": "gweasley", "password": "12345"},
+            {"username": "rweasley"},
+        ]
+        report = import_students(rows, default_password="password", workers=1)
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual([line for line, _ in report.errors], [2, 3])
+        self.assertTrue(User.objects.get(username="fweasley").check_password("  Mischief-Managed "))
+
+    def test_malformed_json_rows_are_reported_per_row(self):
+        rows = read_rows(io.StringIO(
+            '[{"username": "hgranger"}, "ron", {"username": 42}, {"username": "ginny", "password": 1234}]'
+        ), fmt="json")
+        report = import_students(rows, workers=1)
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.errors, [
+            (2, "row must be an object"), (3, "username must be text"), (4, "password must be text"),
+        ])
+        with self.assertRaises(ValueError):
+            read_rows(io.StringIO('"students"'), fmt="json")
+
+    def test_admin_sends_large_files_to_the_command(self):
+        self.client.force_login(User.objects.create_superuser("dumbledore"))
+        upload = SimpleUploadedFile("students.csv", b"username\n" + b"".join(b"s%d\n" % i for i in range(3)))
+        with mock.patch("apps.accounts.admin.ADMIN_MAX_ROWS", 2):
+            response = self.client.post(reverse("admin:accounts_userprofile_import"), {"file": upload})
+        self.assertContains(response, "the admin imports at most 2")
+        self.assertFalse(User.objects.filter(username="s0").exists())
+
+    def test_small_imports_hash_in_process(self):
+        with mock.patch.object(importer, "ProcessPoolExecutor") as pool:
+            import_students([{"username": "student", "password": "Gillyweed-7"}], workers=8)
+        pool.assert_not_called()
+
+    def test_insert_queries_do_not_grow_with_rows(self):
+        rows = [{"username": f"student{i}"} for i in range(50)]
+        # username check, four bulk inserts and the search index, in a savepoint
+        with self.assertNumQueries(8):
+            report = import_students(rows, workers=1)
+        self.assertEqual(report.created, 50)
+        self.assertFalse(User.objects.get(username="student0").has_usable_password())
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user("harry")
+        self.profile = self.user.profile
+        self.profile.profile_picture = self.image("harry.jpg", "red")
+        self.profile.save()
+        self.client.force_login(self.user)
+
+    def image(self, name, colour):
+        from PIL import Image
+
+        out = io.BytesIO()
+        Image.new("RGB", (800, 600), colour).save(out, "JPEG")
+        return SimpleUploadedFile(name, out.getvalue(), content_type="image/jpeg")
+
+    def test_first_request_generates_then_url_is_cached(self):
+        url = thumbnails.thumbnail_url(self.profile.profile_picture, "avatar")
+        self.assertEqual(url, reverse("thumbnail", args=["avatar", self.profile.profile_picture.name]))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        hashed = thumbnails.thumbnail_url(self.profile.profile_picture, "avatar")
+        self.assertEqual(response["Location"], hashed)
+        response = self.client.get(hashed)
+        self.assertIn("immutable", response["Cache-Control"])
+
+        from PIL import Image
+        with Image.open(io.BytesIO(b"".join(response.streaming_content))) as thumb:
+            self.assertEqual(thumb.size, (64, 64))
+
+    def test_replacing_the_image_drops_old_variants(self):
+        old = thumbnails.generate(self.profile.profile_picture.name, "avatar")
+        self.assertTrue(default_storage.exists(old))
+
+        profile = UserProfile.objects.get(pk=self.profile.pk)
+        profile.profile_picture = self.image("harry.jpg", "blue")
+        profile.save()
+
+        self.assertFalse(default_storage.exists(old))
+        self.assertIn("thumbnail/avatar/", thumbnails.thumbnail_url(profile.profile_picture, "avatar"))
+        self.assertNotEqual(thumbnails.generate(profile.profile_picture.name, "avatar"), old)
+
+    def test_rejects_paths_outside_upload_dirs(self):
+        response = self.client.get(reverse("thumbnail", args=["avatar", "../settings.py"]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("thumbnail_file", args=["profiles/harry.jpg"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_login(self):
+        self.client.logout()
+        url = thumbnails.thumbnail_url(self.profile.profile_picture, "avatar")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse("login"), response["Location"])
+        self.assertEqual(default_storage.listdir("profiles/")[0], [])
+
+    def test_oversized_image_is_404(self):
+        from PIL import Image
+
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+            response = self.client.get(thumbnails.thumbnail_url(self.profile.profile_picture, "avatar"))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,154 @@
+import hashlib
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+
+# name: (width, height). Variants are cropped to fill the box exactly.
+SIZES = getattr(settings, "THUMBNAIL_SIZES", {
+    "avatar": (64, 64),
+    "avatar_lg": (256, 256),
+    "banner": (1200, 300),
+    "card": (480, 160),
+})
+
+# Only images uploaded to these directories can be thumbnailed.
+SOURCE_DIRS = getattr(settings, "THUMBNAIL_SOURCE_DIRS", ("profiles/", "classrooms/"))
+
+THUMBS_DIR = "thumbs"
+QUALITY = getattr(settings, "THUMBNAIL_QUALITY", 82)
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def cache_key(source, size):
+    return f"thumbnail:{size}:{source}"
+
+
+def is_source(name):
+    return (
+        name.startswith(tuple(SOURCE_DIRS))
+        and ".." not in name.split("/")
+        and f"/{THUMBS_DIR}/" not in name
+    )
+
+
+def is_thumbnail(name):
+    return is_source(name.replace(f"/{THUMBS_DIR}/", "/", 1)) and f"/{THUMBS_DIR}/" in name
+
+
+def _prefix(source, size):
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, THUMBS_DIR, f"{stem}.{size}.")
+
+
+def thumbnail_name(source, size, digest):
+    """<dir>/thumbs/<stem>.<size>.<digest>.<ext>, next to the original."""
+    ext = "png" if source.lower().endswith(".png") else "jpg"
+    return f"{_prefix(source, size)}{digest[:12]}.{ext}"
+
+
+def _digest(fh):
+    h = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(64 * 1024), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def _render(fh, size, fmt):
+    from PIL import Image, ImageOps
+
+    width, height = SIZES[size]
+    with Image.open(fh) as image:
+        image = ImageOps.exif_transpose(image)
+        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if fmt == "JPEG":
+            image.save(out, fmt, quality=QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(out, fmt, optimize=True)
+    return out.getvalue()
+
+
+def generate(source, size, force=False, storage=default_storage):
+    """
+    Make sure the `size` variant of `source` exists and return its name.
+    The variant name carries a hash of the source bytes, so a replaced
+    image never reuses a stale thumbnail.
+    """
+    from PIL import Image
+
+    if size not in SIZES:
+        raise ThumbnailError(f"Unknown thumbnail size {size!r}")
+    if not is_source(source):
+        raise ThumbnailError(f"{source!r} cannot be thumbnailed")
+
+    try:
+        with storage.open(source, "rb") as fh:
+            digest = _digest(fh)
+            name = thumbnail_name(source, size, digest)
+            if force or not storage.exists(name):
+                fh.seek(0)
+                fmt = "PNG" if name.endswith(".png") else "JPEG"
+                data = _render(fh, size, fmt)
+                if storage.exists(name):
+                    storage.delete(name)
+                storage.save(name, ContentFile(data))
+    except FileNotFoundError:
+        raise ThumbnailError(f"{source!r} does not exist")
+    except (OSError, Image.DecompressionBombError) as e:
+        # Pillow raises UnidentifiedImageError (an OSError) for non-images
+        # and DecompressionBombError for images too large to decode safely.
+        raise ThumbnailError(f"{source!r} could not be thumbnailed: {e}")
+
+    cache.set(cache_key(source, size), name, None)
+    return name
+
+
+def delete_thumbnails(source, storage=default_storage):
+    """Remove every variant of `source` (after it was replaced or deleted)."""
+    if not source or not is_source(source):
+        return 0
+    cache.delete_many([cache_key(source, size) for size in SIZES])
+
+    directory = posixpath.join(posixpath.dirname(source), THUMBS_DIR)
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return 0
+
+    prefixes = tuple(posixpath.basename(_prefix(source, size)) for size in SIZES)
+    removed = 0
+    for filename in files:
+        if filename.startswith(prefixes):
+            storage.delete(posixpath.join(directory, filename))
+            removed += 1
+    return removed
+
+
+def thumbnail_url(fieldfile, size):
+    """
+    URL for a variant of an image field value, without touching the image.
+
+    Once a variant has been generated its hashed name is cached and the
+    URL points straight at it. Before that, the URL points at the view that
+    generates it on first request.
+    """
+    if not fieldfile or size not in SIZES:
+        return ""
+    source = fieldfile.name
+    name = cache.get(cache_key(source, size))
+    if name:
+        return reverse("thumbnail_file", args=[name])
+    return reverse("thumbnail", args=[size, source])
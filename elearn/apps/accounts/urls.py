@@ -57,4 +57,12 @@ path('student/feedback/', views.student_feedback, name='student_feedback'),
     # ------------------------------
     path('search/', views.search_users, name='search_users'),
     path('api/user/<int:user_id>/', views.get_user_info, name='get_user_info'),
+    path('api/users/', views.get_users_info, name='get_users_info'),
+    path('api/activity/stats/', views.activity_log_stats, name='activity_log_stats'),
+
+    # ------------------------------
+    # Thumbnails
+    # ------------------------------
+    path('thumbnail/<str:size>/<path:source>', views.thumbnail, name='thumbnail'),
+    path('thumbs/<path:name>', views.thumbnail_file, name='thumbnail_file'),
 ]
@@ -0,0 +1,69 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+
+CACHE_TTL = getattr(settings, "USER_INFO_CACHE_TTL", 30)
+
+# User columns the payload is built from. User has no updated_at, so edits
+# to these move UserProfile.updated_at instead (see accounts.signals).
+USER_FIELDS = ("username", "first_name", "last_name", "email")
+
+
+def cache_key(user_id):
+    return f"user-info:{user_id}"
+
+
+def invalidate(user_ids):
+    cache.delete_many([cache_key(uid) for uid in user_ids])
+
+
+def user_fields(user):
+    # Read __dict__ so deferred fields are never fetched just to compare.
+    return tuple(user.__dict__.get(f) for f in USER_FIELDS)
+
+
+def build_entry(user):
+    """Return (payload, last_modified) for a user loaded with profile and stats."""
+    profile = getattr(user, "profile", None)
+    stats = getattr(user, "gamification_stats", None)
+
+    payload = {
+        "id": user.id,
+        "username": user.username,
+        "full_name": user.get_full_name(),
+        "email": user.email,
+        "role": profile.role if profile else None,
+        "points": stats.points if stats else 0,
+        "level": stats.level if stats else 1,
+        "badges": stats.badges if stats else [],
+        "attendance_rate": stats.attendance_rate if stats else 0.0,
+    }
+    stamps = [obj.updated_at for obj in (profile, stats) if obj is not None]
+    return payload, max(stamps, default=user.date_joined)
+
+
+def get_entries(user_ids):
+    """
+    Cached (payload, last_modified) for each id, in request order. Misses
+    are loaded together in a single query and written back to the cache.
+    """
+    cached = cache.get_many([cache_key(uid) for uid in user_ids])
+    entries = {uid: cached[cache_key(uid)] for uid in user_ids if cache_key(uid) in cached}
+
+    missing = [uid for uid in user_ids if uid not in entries]
+    if missing:
+        users = User.objects.filter(id__in=missing).select_related("profile", "gamification_stats")
+        fresh = {u.id: build_entry(u) for u in users}
+        cache.set_many({cache_key(uid): entry for uid, entry in fresh.items()}, CACHE_TTL)
+        entries.update(fresh)
+
+    return [entries[uid] for uid in user_ids if uid in entries]
+
+
+def etag_for(payloads):
+    digest = hashlib.md5(json.dumps(payloads, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest}"'
@@ -1,12 +1,22 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.db.models import Sum, Q
-from django.http import JsonResponse
+from django.db.models import Sum
+from django.core.files.storage import default_storage
+from django.http import FileResponse, JsonResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils import timezone
+from datetime import timedelta
 
-from .models import UserProfile, GamificationStats, NotificationPreference, UserActivity
+from .models import UserProfile, GamificationStats, NotificationPreference
+from .activity import activity_writer, log_activity
+from .leaderboard import leaderboard_index
+from . import search, thumbnails, userinfo
+from .dashboard import teacher_snapshot
 
 
 # =========================================================
@@ -41,19 +51,12 @@ def register(request):
             last_name=request.POST.get('last_name', '')
         )
 
-        # Update profile role
+        # Related rows are created by accounts.signals; only the role differs
         profile = user.profile
         profile.role = role
-        profile.save()
-
-        GamificationStats.objects.create(user=user)
-        NotificationPreference.objects.create(user=user)
+        profile.save_if_dirty()
 
-        UserActivity.objects.create(
-            user=user,
-            activity_type='login',
-            description="New account created"
-        )
+        log_activity(user, 'login', "New account created")
 
         messages.success(request, "Registration successful. Please log in.")
         return redirect('login')
@@ -73,7 +76,7 @@ def login_view(request):
             return redirect('login')
 
         login(request, user)
-        UserActivity.objects.create(user=user, activity_type='login')
+        log_activity(user, 'login')
         return redirect("dashboard")
 
     return render(request, "accounts/login.html")
@@ -101,24 +104,11 @@ def dashboard(request):
     # TEACHER DASHBOARD
     # ------------------
     if profile.role == "teacher":
-        classrooms = user.classrooms_taught.all()
-
-        total_students = sum(c.members.count() for c in classrooms)
-
-        from apps.quizes.models import Quiz
-        quizzes = Quiz.objects.filter(teacher=user)
-
-        from apps.classroom.models import AnnouncementBoard
-        announcements = sum(c.announcements.count() for c in classrooms)
-
         return render(request, "teacher/dashboard.html", {
             "profile": profile,
             "stats": stats,
             "activities": activities,
-            "classrooms": classrooms,
-            "total_students": total_students,
-            "quizzes": quizzes,
-            "announcements": announcements,
+            **teacher_snapshot(user),
         })
 
     # ------------------
@@ -198,18 +188,19 @@ def student_feedback(request):
 # =========================================================
 
 def leaderboard(request):
-    top_users = (
-        User.objects.filter(gamification_stats__isnull=False)
-        .annotate(total_points=Sum("gamification_stats__points"))
-        .order_by("-total_points")[:100]
-    )
+    top = leaderboard_index.top(100)
+    users = User.objects.in_bulk([uid for uid, _ in top])
+
+    top_users = []
+    for uid, points in top:
+        u = users.get(uid)
+        if u is not None:
+            u.total_points = points
+            top_users.append(u)
 
     rank = None
     if request.user.is_authenticated:
-        my_points = request.user.gamification_stats.points
-        rank = User.objects.filter(
-            gamification_stats__points__gt=my_points
-        ).count() + 1
+        rank = leaderboard_index.rank(request.user.id)
 
     return render(request, "accounts/leaderboard.html", {
         "top_users": top_users,
@@ -230,15 +221,19 @@ def badges_view(request):
 @login_required
 def user_stats(request):
     user = request.user
-    activities = user.activities
+    counts = dict(user.activity_counters.values_list("activity_type", "count"))
+
+    since = timezone.localdate() - timedelta(days=29)
+    daily = user.activity_daily.filter(day__gte=since).values("day").annotate(total=Sum("count")).order_by("day")
 
     return render(request, "accounts/user_stats.html", {
         "profile": user.profile,
         "stats": user.gamification_stats,
-        "total_activities": activities.count(),
-        "login_count": activities.filter(activity_type="login").count(),
-        "quiz_attempts": activities.filter(activity_type="quiz_attempt").count(),
-        "discussion_posts": activities.filter(activity_type="discussion_post").count(),
+        "total_activities": sum(counts.values()),
+        "login_count": counts.get("login", 0),
+        "quiz_attempts": counts.get("quiz_attempt", 0),
+        "discussion_posts": counts.get("discussion_post", 0),
+        "daily_activity": daily,
     })
 
 
@@ -248,7 +243,7 @@ def user_stats(request):
 
 @login_required
 def notification_preferences(request):
-    pref = request.user.notification_preference
+    pref, _ = NotificationPreference.objects.get_or_create(user=request.user)
 
     if request.method == "POST":
         pref.quiz_reminders = "quiz_reminders" in request.POST
@@ -271,15 +266,7 @@ def notification_preferences(request):
 def search_users(request):
     query = request.GET.get("q", "")
 
-    users = (
-        User.objects.filter(
-            Q(username__icontains=query)
-            | Q(first_name__icontains=query)
-            | Q(last_name__icontains=query)
-            | Q(email__icontains=query)
-        )[:20]
-        if len(query) >= 2 else []
-    )
+    users = search.search_users(query, limit=20) if len(query) >= 2 else []
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         data = [{
@@ -287,7 +274,7 @@ def search_users(request):
             "username": u.username,
             "full_name": u.get_full_name(),
             "email": u.email,
-            "role": u.profile.role,
+            "role": u.role,
         } for u in users]
 
         return JsonResponse({"users": data})
@@ -295,18 +282,67 @@ def search_users(request):
     return render(request, "accounts/search_users.html", {"users": users, "query": query})
 
 
+def _user_info_response(request, entries, data):
+    etag = userinfo.etag_for([payload for payload, _ in entries])
+    last_modified = max((ts for _, ts in entries), default=None)
+    last_modified = last_modified and int(last_modified.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(data)
+
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, max_age=userinfo.CACHE_TTL)
+    return response
+
+
 def get_user_info(request, user_id):
-    user = get_object_or_404(User, id=user_id)
-    stats = user.gamification_stats
+    entries = userinfo.get_entries([user_id])
+    if not entries:
+        raise Http404("User not found.")
 
-    return JsonResponse({
-        "id": user.id,
-        "username": user.username,
-        "full_name": user.get_full_name(),
-        "email": user.email,
-        "role": user.profile.role,
-        "points": stats.points,
-        "level": stats.level,
-        "badges": stats.badges,
-        "attendance_rate": stats.attendance_rate,
-    })
+    return _user_info_response(request, entries, entries[0][0])
+
+
+def get_users_info(request):
+    try:
+        ids = [int(i) for i in request.GET.get("ids", "").split(",") if i.strip()]
+    except ValueError:
+        return JsonResponse({"error": "ids must be a comma-separated list of integers."}, status=400)
+
+    ids = list(dict.fromkeys(ids))[:100]
+    entries = userinfo.get_entries(ids)
+
+    return _user_info_response(request, entries, {"users": [payload for payload, _ in entries]})
+
+
+@staff_member_required
+def activity_log_stats(request):
+    return JsonResponse(activity_writer.stats())
+
+
+# =========================================================
+# THUMBNAILS
+# =========================================================
+
+@login_required
+def thumbnail(request, size, source):
+    # First request for a variant: build it, then send the client to its
+    # content-hashed URL, which is cached for good.
+    try:
+        name = thumbnails.generate(source, size)
+    except thumbnails.ThumbnailError:
+        raise Http404("No such image.")
+    response = redirect('thumbnail_file', name=name)
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+def thumbnail_file(request, name):
+    if not thumbnails.is_thumbnail(name) or not default_storage.exists(name):
+        raise Http404("No such image.")
+    response = FileResponse(default_storage.open(name, 'rb'))
+    patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
@@ -1,16 +1,16 @@
 from django.contrib import admin
 from .models import (
-    Classroom, ClassMember, Attendance, Discussion, DiscussionReply,
+    Classroom, ClassMember, Attendance, AttendanceArchive, Discussion, DiscussionReply,
     AnnouncementBoard, LearningResource, ProgressTracking
 )
 
 
 @admin.register(Classroom)
 class ClassroomAdmin(admin.ModelAdmin):
-    list_display = ('name', 'teacher', 'code', 'subject', 'status', 'created_at')
+    list_display = ('name', 'teacher', 'code', 'subject', 'status', 'student_count', 'created_at')
     list_filter = ('status', 'subject', 'created_at')
     search_fields = ('name', 'code', 'teacher__username', 'subject')
-    readonly_fields = ('code', 'created_at', 'updated_at')
+    readonly_fields = ('code', 'student_count', 'created_at', 'updated_at')
     fieldsets = (
         ('Classroom Information', {
             'fields': ('name', 'code', 'teacher', 'status')
@@ -19,7 +19,7 @@ class ClassroomAdmin(admin.ModelAdmin):
             'fields': ('description', 'subject', 'grade_level', 'room_number', 'schedule')
         }),
         ('Settings', {
-            'fields': ('max_students', 'banner_image')
+            'fields': ('max_students', 'student_count', 'banner_image')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -45,6 +45,17 @@ class AttendanceAdmin(admin.ModelAdmin):
     readonly_fields = ('recorded_at',)
 
 
+@admin.register(AttendanceArchive)
+class AttendanceArchiveAdmin(admin.ModelAdmin):
+    list_display = ('classroom', 'student', 'start_date', 'end_date', 'present', 'absent', 'late', 'excused')
+    list_filter = ('start_date', 'classroom')
+    search_fields = ('classroom__name', 'student__username')
+    readonly_fields = (
+        'classroom', 'student', 'start_date', 'end_date', 'statuses', 'recorded',
+        'present', 'absent', 'late', 'excused', 'created_at',
+    )
+
+
 @admin.register(AnnouncementBoard)
 class AnnouncementBoardAdmin(admin.ModelAdmin):
     list_display = ('title', 'classroom', 'teacher', 'is_pinned', 'created_at')
@@ -66,7 +77,7 @@ class DiscussionReplyAdmin(admin.ModelAdmin):
     list_display = ('discussion', 'author', 'is_answer', 'likes', 'created_at')
     list_filter = ('is_answer', 'created_at')
     search_fields = ('content', 'discussion__title', 'author__username')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('likes', 'created_at', 'updated_at')
 
 
 @admin.register(LearningResource)
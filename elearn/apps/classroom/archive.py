@@ -0,0 +1,195 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from .attendance import STATUSES, as_date, counters_paused
+
+
+# Two bits per day: the status is its index in STATUSES.
+CODES = {status: code for code, status in enumerate(STATUSES)}
+CHUNK_SIZE = 500
+
+ARCHIVED_DAY = "This day is already recorded in an archived attendance term."
+
+
+class ArchivedAttendance:
+    """Read-only stand-in for an Attendance row that lives in an archive."""
+
+    remarks = None
+    archived = True
+
+    def __init__(self, classroom, student_id, date, status):
+        self.classroom = classroom
+        self.classroom_id = classroom.id
+        self.student_id = student_id
+        self.date = date
+        self.status = status
+
+    def get_status_display(self):
+        return self.status.title()
+
+
+# =========================================================
+# PACKING
+# =========================================================
+
+def pack(start, end, marks):
+    """
+    Pack {date: status} for start..end (inclusive) into (statuses, recorded):
+    two bits per day, four days to a byte, plus a one-bit-per-day mask of
+    the days that have a mark.
+    """
+    days = (end - start).days + 1
+    statuses = bytearray((days + 3) // 4)
+    recorded = bytearray((days + 7) // 8)
+    for date, status in marks.items():
+        i = (date - start).days
+        if not 0 <= i < days:
+            raise ValueError(f"{date} is outside {start}..{end}")
+        statuses[i // 4] |= CODES[status] << (2 * (i % 4))
+        recorded[i // 8] |= 1 << (i % 8)
+    return bytes(statuses), bytes(recorded)
+
+
+def unpack(start, end, statuses, recorded):
+    """Inverse of pack(): [(date, status), ...] for the recorded days, oldest first."""
+    statuses, recorded = bytes(statuses), bytes(recorded)
+    days = (end - start).days + 1
+    out = []
+    for i in range(days):
+        if recorded[i // 8] >> (i % 8) & 1:
+            code = statuses[i // 4] >> (2 * (i % 4)) & 3
+            out.append((start + datetime.timedelta(days=i), STATUSES[code]))
+    return out
+
+
+def _day_status(archive, date):
+    i = (date - archive.start_date).days
+    if bytes(archive.recorded)[i // 8] >> (i % 8) & 1:
+        return STATUSES[bytes(archive.statuses)[i // 4] >> (2 * (i % 4)) & 3]
+    return None
+
+
+def archived_status(classroom_id, student_id, date):
+    """The status a student's archive records for `date`, or None if no archive records that day."""
+    from .models import AttendanceArchive
+
+    date = as_date(date)
+    archive = AttendanceArchive.objects.filter(
+        classroom_id=classroom_id, student_id=student_id, start_date__lte=date, end_date__gte=date,
+    ).only('start_date', 'statuses', 'recorded').first()
+    return _day_status(archive, date) if archive is not None else None
+
+
+def _counts(marks):
+    counts = dict.fromkeys(STATUSES, 0)
+    for status in marks.values():
+        counts[status] += 1
+    return counts
+
+
+# =========================================================
+# ARCHIVING
+# =========================================================
+
+def archive_term(start, end, classroom_ids=None):
+    """
+    Move every Attendance row dated start..end into AttendanceArchive, one
+    archive per classroom and student. Rows with remarks stay in the live
+    table, since the packed form has nowhere to keep them.
+
+    The running counters and rollups already count these marks and are
+    left alone: rows are deleted with the counters paused.
+    Archiving the same term again merges late additions into the existing
+    archives; a range that overlaps a different archived term is refused.
+
+    Returns (rows archived, archives written).
+    """
+    from .models import Attendance, AttendanceArchive
+
+    if start > end:
+        raise ValueError("start must not be after end")
+
+    rows = Attendance.objects.filter(date__gte=start, date__lte=end).filter(
+        Q(remarks__isnull=True) | Q(remarks='')
+    )
+    archives = AttendanceArchive.objects.filter(start_date__lte=end, end_date__gte=start)
+    if classroom_ids is not None:
+        rows = rows.filter(classroom_id__in=classroom_ids)
+        archives = archives.filter(classroom_id__in=classroom_ids)
+
+    with transaction.atomic():
+        existing = {}
+        for archive in archives.select_for_update():
+            if (archive.start_date, archive.end_date) != (start, end):
+                raise ValueError(
+                    f"{start}..{end} overlaps the archived term "
+                    f"{archive.start_date}..{archive.end_date}"
+                )
+            existing[(archive.classroom_id, archive.student_id)] = archive
+
+        marks = defaultdict(dict)
+        ids = []
+        for pk, classroom_id, student_id, date, status in rows.values_list(
+            'id', 'classroom_id', 'student_id', 'date', 'status'
+        ).iterator():
+            marks[(classroom_id, student_id)][date] = status
+            ids.append(pk)
+
+        created, updated = [], []
+        for (classroom_id, student_id), term in marks.items():
+            archive = existing.get((classroom_id, student_id))
+            if archive is None:
+                archive = AttendanceArchive(
+                    classroom_id=classroom_id, student_id=student_id, start_date=start, end_date=end,
+                )
+                created.append(archive)
+            else:
+                term = {**dict(archive.records()), **term}
+                updated.append(archive)
+            archive.statuses, archive.recorded = pack(start, end, term)
+            for status, n in _counts(term).items():
+                setattr(archive, status, n)
+
+        AttendanceArchive.objects.bulk_create(created, batch_size=CHUNK_SIZE)
+        AttendanceArchive.objects.bulk_update(
+            updated, ['statuses', 'recorded', *STATUSES], batch_size=CHUNK_SIZE
+        )
+        with counters_paused():
+            for i in range(0, len(ids), CHUNK_SIZE):
+                Attendance.objects.filter(pk__in=ids[i:i + CHUNK_SIZE]).delete()
+
+    return len(ids), len(created) + len(updated)
+
+
+# =========================================================
+# READING
+# =========================================================
+
+def archived_records(student_id=None, classroom_id=None, start=None, end=None):
+    """
+    ArchivedAttendance objects matching the filters, newest first, so they
+    can be listed next to live Attendance rows.
+    """
+    from .models import AttendanceArchive
+
+    archives = AttendanceArchive.objects.select_related('classroom')
+    if student_id is not None:
+        archives = archives.filter(student_id=student_id)
+    if classroom_id is not None:
+        archives = archives.filter(classroom_id=classroom_id)
+    if start is not None:
+        archives = archives.filter(end_date__gte=start)
+    if end is not None:
+        archives = archives.filter(start_date__lte=end)
+
+    records = [
+        ArchivedAttendance(archive.classroom, archive.student_id, date, status)
+        for archive in archives
+        for date, status in archive.records()
+        if (start is None or date >= start) and (end is None or date <= end)
+    ]
+    records.sort(key=lambda r: r.date, reverse=True)
+    return records
@@ -0,0 +1,476 @@
+import datetime
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, Round
+
+
+PRESENT = 'present'
+STATUSES = ('present', 'absent', 'late', 'excused')
+
+_local = threading.local()
+
+
+@contextmanager
+def counters_paused():
+    """
+    Attendance saves and deletes inside the block leave the running counters
+    and rollups alone, for callers moving marks that are already counted
+    (see archive.archive_term).
+    """
+    paused = getattr(_local, 'paused', False)
+    _local.paused = True
+    try:
+        yield
+    finally:
+        _local.paused = paused
+
+
+def counting_paused():
+    return getattr(_local, 'paused', False)
+
+
+def attendance_rate(present, total):
+    """SQL expression for round(present / total * 100, 2), or 0 with no records."""
+    return Coalesce(
+        Round(Value(100.0) * present / NullIf(total, 0), 2),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def status_delta(old_status, new_status):
+    """(present, total) change for one row going from old_status to new_status (None = no row)."""
+    present = int(new_status == PRESENT) - int(old_status == PRESENT)
+    total = int(new_status is not None) - int(old_status is not None)
+    return present, total
+
+
+def apply_attendance_deltas(deltas, student_stats=True, progress=True):
+    """
+    Adjust the running attendance counters.
+
+    `deltas` maps (classroom_id, student_id) to (present, total) changes.
+    Per-student totals live on GamificationStats, per-classroom totals on
+    ProgressTracking; both are updated with F() expressions so concurrent
+    writers never lose an increment. Callers run this inside the same
+    transaction as the Attendance writes it describes.
+
+    Only new marks create ProgressTracking rows; other changes adjust rows
+    that already exist. `student_stats` and `progress` switch a table off,
+    for deletes whose counter rows are going away in the same cascade.
+    """
+    from apps.accounts.models import GamificationStats
+    from .models import ProgressTracking
+
+    per_student = defaultdict(lambda: [0, 0])
+    per_classroom = defaultdict(list)
+
+    for (classroom_id, student_id), (present, total) in deltas.items():
+        if not (present or total):
+            continue
+        per_student[student_id][0] += present
+        per_student[student_id][1] += total
+        per_classroom[(classroom_id, present, total)].append(student_id)
+
+    # One UPDATE per distinct delta; a marked day is usually a handful of them.
+    by_delta = defaultdict(list)
+    for student_id, (present, total) in per_student.items():
+        if present or total:
+            by_delta[(present, total)].append(student_id)
+
+    if student_stats:
+        for (present, total), student_ids in by_delta.items():
+            new_present = F('attendance_present') + present
+            new_total = F('attendance_total') + total
+            GamificationStats.objects.filter(user_id__in=student_ids).update(
+                attendance_present=new_present,
+                attendance_total=new_total,
+                attendance_rate=attendance_rate(new_present, new_total),
+            )
+
+    if not progress:
+        return
+    for (classroom_id, present, total), student_ids in per_classroom.items():
+        if total > 0:
+            ProgressTracking.objects.bulk_create(
+                [ProgressTracking(classroom_id=classroom_id, student_id=sid) for sid in student_ids],
+                ignore_conflicts=True,
+            )
+        ProgressTracking.objects.filter(classroom_id=classroom_id, student_id__in=student_ids).update(
+            attendance_count=F('attendance_count') + present,
+            total_attendance=F('total_attendance') + total,
+        )
+
+
+def refresh_classroom_attendance_rates(classroom_id):
+    """Recompute attendance_rate from the counters for every member of a classroom, in one UPDATE."""
+    from apps.accounts.models import GamificationStats
+    from .models import ClassMember
+
+    return GamificationStats.objects.filter(
+        user_id__in=ClassMember.objects.filter(classroom_id=classroom_id).values('student_id')
+    ).update(attendance_rate=attendance_rate(F('attendance_present'), F('attendance_total')))
+
+
+def recount_attendance(student_ids=None):
+    """
+    Rebuild the running counters from the Attendance table and the archived
+    terms (drift repair). Returns the number of students whose counters
+    were rewritten.
+    """
+    from apps.accounts.models import GamificationStats
+    from .models import Attendance, AttendanceArchive, ProgressTracking
+
+    records = Attendance.objects.all()
+    archives = AttendanceArchive.objects.all()
+    stats = GamificationStats.objects.all()
+    if student_ids is not None:
+        records = records.filter(student_id__in=student_ids)
+        archives = archives.filter(student_id__in=student_ids)
+        stats = stats.filter(user_id__in=student_ids)
+
+    per_student = records.filter(student_id=OuterRef('user_id')).order_by().values('student_id')
+    present = per_student.annotate(n=Count('id', filter=Q(status=PRESENT))).values('n')
+    total = per_student.annotate(n=Count('id')).values('n')
+
+    archived = archives.filter(student_id=OuterRef('user_id')).order_by().values('student_id')
+    archived_present = archived.annotate(n=Sum('present')).values('n')
+    archived_total = archived.annotate(n=Sum(F('present') + F('absent') + F('late') + F('excused'))).values('n')
+
+    count = stats.update(
+        attendance_present=Coalesce(Subquery(present), 0) + Coalesce(Subquery(archived_present), 0),
+        attendance_total=Coalesce(Subquery(total), 0) + Coalesce(Subquery(archived_total), 0),
+    )
+    stats.update(attendance_rate=attendance_rate(F('attendance_present'), F('attendance_total')))
+
+    progress = ProgressTracking.objects.all()
+    if student_ids is not None:
+        progress = progress.filter(student_id__in=student_ids)
+    progress.update(attendance_count=0, total_attendance=0)
+
+    pairs = defaultdict(lambda: [0, 0])
+    for row in records.order_by().values('classroom_id', 'student_id').annotate(
+        present=Count('id', filter=Q(status=PRESENT)),
+        total=Count('id'),
+    ):
+        pairs[(row['classroom_id'], row['student_id'])][0] += row['present']
+        pairs[(row['classroom_id'], row['student_id'])][1] += row['total']
+    for row in archives.values('classroom_id', 'student_id', *STATUSES):
+        pairs[(row['classroom_id'], row['student_id'])][0] += row[PRESENT]
+        pairs[(row['classroom_id'], row['student_id'])][1] += sum(row[s] for s in STATUSES)
+
+    for (classroom_id, student_id), (present, total) in pairs.items():
+        ProgressTracking.objects.update_or_create(
+            classroom_id=classroom_id,
+            student_id=student_id,
+            defaults={'attendance_count': present, 'total_attendance': total},
+        )
+    return count
+
+
+# =========================================================
+# ROLLUPS
+# =========================================================
+
+def as_date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _status_vector(status, sign):
+    return tuple(sign if s == status else 0 for s in STATUSES)
+
+
+def apply_rollup_changes(changes, daily_rollup=True, monthly_rollup=True):
+    """
+    Keep AttendanceDaily and AttendanceMonthly in step with Attendance.
+
+    `changes` is an iterable of (classroom_id, student_id, date, old_status,
+    new_status), with None for a row that did not exist before or no longer
+    exists. Each table gets one upsert that adds the per-status deltas; pure
+    removals only update rollup rows that still exist. `daily_rollup` and
+    `monthly_rollup` switch a table off, for deletes whose rollup rows are
+    going away with their classroom or student.
+    """
+    from apps.accounts.buffering import increment_counters
+    from .models import AttendanceDaily, AttendanceMonthly
+
+    daily = defaultdict(lambda: [0] * len(STATUSES))
+    monthly = defaultdict(lambda: [0] * len(STATUSES))
+
+    for classroom_id, student_id, date, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        date = as_date(date)
+        for status, sign in ((old_status, -1), (new_status, 1)):
+            if status is None:
+                continue
+            vector = _status_vector(status, sign)
+            for totals, key in (
+                (daily, (classroom_id, date)),
+                (monthly, (classroom_id, student_id, month_start(date))),
+            ):
+                totals[key] = [a + b for a, b in zip(totals[key], vector)]
+
+    tables = []
+    if daily_rollup:
+        tables.append((AttendanceDaily, ('classroom', 'date'), daily))
+    if monthly_rollup:
+        tables.append((AttendanceMonthly, ('classroom', 'student', 'month'), monthly))
+    for model, key_fields, totals in tables:
+        additions = {key: vector for key, vector in totals.items() if max(vector) > 0}
+        removals = {key: vector for key, vector in totals.items() if max(vector) <= 0}
+        increment_counters(model, key_fields, additions, count_field=STATUSES)
+        increment_counters(model, key_fields, removals, count_field=STATUSES, create=False)
+
+
+def rebuild_rollups(classroom_ids=None):
+    """Recompute both rollup tables from Attendance and the archived terms (drift repair)."""
+    from django.db.models.functions import TruncMonth
+    from .models import Attendance, AttendanceArchive, AttendanceDaily, AttendanceMonthly
+
+    records = Attendance.objects.order_by()
+    daily_rows = AttendanceDaily.objects.all()
+    monthly_rows = AttendanceMonthly.objects.all()
+    if classroom_ids is not None:
+        records = records.filter(classroom_id__in=classroom_ids)
+        daily_rows = daily_rows.filter(classroom_id__in=classroom_ids)
+        monthly_rows = monthly_rows.filter(classroom_id__in=classroom_ids)
+
+    counts = {s: Count('id', filter=Q(status=s)) for s in STATUSES}
+    daily_rows.delete()
+    monthly_rows.delete()
+
+    AttendanceDaily.objects.bulk_create(
+        (AttendanceDaily(**row) for row in records.values('classroom_id', 'date').annotate(**counts).iterator()),
+        batch_size=500,
+    )
+    monthly = records.annotate(month=TruncMonth('date')).values('classroom_id', 'student_id', 'month')
+    AttendanceMonthly.objects.bulk_create(
+        (AttendanceMonthly(**row) for row in monthly.annotate(**counts).iterator()),
+        batch_size=500,
+    )
+
+    archives = AttendanceArchive.objects.all()
+    if classroom_ids is not None:
+        archives = archives.filter(classroom_id__in=classroom_ids)
+    for archive in archives.iterator():
+        apply_rollup_changes(
+            (archive.classroom_id, archive.student_id, date, None, status)
+            for date, status in archive.records()
+        )
+    return monthly_rows.count()
+
+
+def _next_month(day):
+    return month_start(month_start(day) + datetime.timedelta(days=32))
+
+
+def _split_range(start, end):
+    """
+    Split [start, end] into the whole months the monthly rollup can answer
+    and the partial-month edges that have to come from Attendance rows.
+    Returns ((first_month, last_month) or None, [(edge_start, edge_end), ...]);
+    a None bound means open-ended.
+    """
+    first = start if start is None or start.day == 1 else _next_month(start)
+    if end is None or (end + datetime.timedelta(days=1)).day == 1:
+        last = end and month_start(end)
+    else:
+        last = month_start(month_start(end) - datetime.timedelta(days=1))
+
+    if first is not None and last is not None and first > last:
+        return None, [(start, end)]
+
+    edges = []
+    if start is not None and start != first:
+        edges.append((start, first - datetime.timedelta(days=1)))
+    if end is not None and last != month_start(end):
+        edges.append((month_start(end), end))
+    return (first, last), edges
+
+
+def attendance_summary(classroom_id, start=None, end=None):
+    """
+    Per-student status counts for a classroom between two dates (inclusive,
+    either may be None). Whole months are read from AttendanceMonthly, so
+    the cost depends on the number of months rather than the number of
+    marks; only the partial months at either end read individual marks,
+    live or archived.
+
+    Returns {student_id: {'present': n, 'absent': n, 'late': n, 'excused': n, 'total': n}}.
+    """
+    from .models import Attendance, AttendanceMonthly
+
+    summary = defaultdict(lambda: dict.fromkeys(STATUSES + ('total',), 0))
+
+    def add(rows):
+        for row in rows:
+            entry = summary[row['student_id']]
+            for s in STATUSES:
+                entry[s] += row[s]
+                entry['total'] += row[s]
+
+    months, edges = _split_range(start, end)
+    if months is not None:
+        monthly = AttendanceMonthly.objects.filter(classroom_id=classroom_id)
+        if months[0] is not None:
+            monthly = monthly.filter(month__gte=months[0])
+        if months[1] is not None:
+            monthly = monthly.filter(month__lte=months[1])
+        add(monthly.order_by().values('student_id').annotate(**{s: Sum(s) for s in STATUSES}))
+
+    if edges:
+        from .archive import archived_records
+
+        edge_filter = Q()
+        for edge_start, edge_end in edges:
+            edge_filter |= Q(date__gte=edge_start, date__lte=edge_end)
+        add(
+            Attendance.objects.filter(edge_filter, classroom_id=classroom_id)
+            .order_by().values('student_id')
+            .annotate(**{s: Count('id', filter=Q(status=s)) for s in STATUSES})
+        )
+        for edge_start, edge_end in edges:
+            add(
+                {'student_id': r.student_id, **{s: int(r.status == s) for s in STATUSES}}
+                for r in archived_records(classroom_id=classroom_id, start=edge_start, end=edge_end)
+            )
+
+    return dict(summary)
+
+
+def daily_totals(classroom_id, start=None, end=None):
+    """Class-wide status counts per day from AttendanceDaily, oldest first."""
+    from .models import AttendanceDaily
+
+    days = AttendanceDaily.objects.filter(classroom_id=classroom_id)
+    if start is not None:
+        days = days.filter(date__gte=start)
+    if end is not None:
+        days = days.filter(date__lte=end)
+    return days.order_by('date').values('date', *STATUSES)
+
+
+# =========================================================
+# BULK MARKING
+# =========================================================
+
+class BulkAttendanceResult:
+    def __init__(self):
+        self.marked = 0
+        self.rejected = []
+
+    def __repr__(self):
+        return f"<BulkAttendanceResult marked={self.marked} rejected={len(self.rejected)}>"
+
+
+def mark_attendance_bulk(entries, recorded_by=None):
+    """
+    Upsert many attendance marks at once.
+
+    `entries` is an iterable of (classroom_id, student_id, date, status),
+    possibly spanning several classrooms and dates. Students are checked
+    against the active roster in one query; unknown students, invalid
+    statuses and days in an archived term are returned in
+    `result.rejected` as (entry, reason). All
+    accepted rows are written with a single bulk upsert on the
+    (classroom, student, date) key, and the attendance counters are
+    adjusted in the same transaction.
+    """
+    from django.db import transaction
+    from apps.accounts.badges import evaluate_badges
+    from .models import Attendance, AttendanceArchive, ClassMember
+
+    valid_statuses = {code for code, _ in Attendance.STATUS_CHOICES}
+    result = BulkAttendanceResult()
+
+    marks = {}
+    for entry in entries:
+        classroom_id, student_id, date, status = entry
+        if status not in valid_statuses:
+            result.rejected.append((entry, "invalid status"))
+            continue
+        try:
+            key = (int(classroom_id), int(student_id), as_date(date))
+        except (TypeError, ValueError):
+            result.rejected.append((entry, "invalid classroom, student or date"))
+            continue
+        marks[key] = status
+
+    if not marks:
+        return result
+
+    classroom_ids = {c for c, _, _ in marks}
+    student_ids = {s for _, s, _ in marks}
+    dates = {d for _, _, d in marks}
+
+    with transaction.atomic():
+        # Locking the roster rows serialises concurrent markings of the same
+        # students, so `previous` below cannot change before the upsert. A
+        # lock on Attendance alone would miss days that are not marked yet.
+        roster = set(
+            ClassMember.objects.select_for_update().filter(
+                classroom_id__in=classroom_ids, student_id__in=student_ids, status='active'
+            ).order_by('pk').values_list('classroom_id', 'student_id')
+        )
+        for key in list(marks):
+            if key[:2] not in roster:
+                result.rejected.append(((*key, marks.pop(key)), "not an active member"))
+
+        if not marks:
+            return result
+
+        closed = AttendanceArchive.objects.filter(
+            classroom_id__in=classroom_ids, start_date__lte=max(dates), end_date__gte=min(dates),
+        ).values_list('classroom_id', 'start_date', 'end_date').distinct()
+        for classroom_id, term_start, term_end in closed:
+            for key in list(marks):
+                if key[0] == classroom_id and term_start <= key[2] <= term_end:
+                    result.rejected.append(((*key, marks.pop(key)), "term is archived"))
+
+        if not marks:
+            return result
+
+        previous = {
+            (c, s, d): status
+            for c, s, d, status in Attendance.objects.select_for_update().filter(
+                classroom_id__in=classroom_ids, student_id__in=student_ids, date__in=dates
+            ).values_list('classroom_id', 'student_id', 'date', 'status')
+        }
+
+        Attendance.objects.bulk_create(
+            [
+                Attendance(classroom_id=c, student_id=s, date=d, status=status, recorded_by=recorded_by)
+                for (c, s, d), status in marks.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['classroom', 'student', 'date'],
+            update_fields=['status', 'recorded_by'],
+            batch_size=500,
+        )
+
+        deltas = defaultdict(lambda: (0, 0))
+        for (c, s, d), status in marks.items():
+            present, total = status_delta(previous.get((c, s, d)), status)
+            old = deltas[(c, s)]
+            deltas[(c, s)] = (old[0] + present, old[1] + total)
+        apply_attendance_deltas(deltas)
+        apply_rollup_changes(
+            (c, s, d, previous.get((c, s, d)), status) for (c, s, d), status in marks.items()
+        )
+
+        for classroom_id in {c for c, _, _ in marks}:
+            refresh_classroom_attendance_rates(classroom_id)
+
+        marked_students = sorted({s for _, s, _ in marks})
+        transaction.on_commit(lambda: evaluate_badges(users=marked_students, events=['attendance']))
+
+    result.marked = len(marks)
+    return result
@@ -0,0 +1,88 @@
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH  # 2,176,782,336 codes
+
+_HALF_BITS = 16
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+def normalize_code(code):
+    """Classroom codes are matched case-insensitively: stored and looked up upper-cased."""
+    return (code or "").strip().upper()
+
+
+def _round_keys():
+    digest = hashlib.blake2b(settings.SECRET_KEY.encode(), digest_size=8 * _ROUNDS, person=b"classroom-code").digest()
+    return [digest[i * 8:(i + 1) * 8] for i in range(_ROUNDS)]
+
+
+def _feistel(value, keys):
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for key in keys:
+        f = int.from_bytes(hashlib.blake2b(right.to_bytes(2, "big"), key=key, digest_size=2).digest(), "big")
+        left, right = right, left ^ f
+    return (left << _HALF_BITS) | right
+
+
+def permute(n, keys=None):
+    """
+    Keyed bijection on range(CODE_SPACE): a Feistel network over 32 bits,
+    cycle-walked until the result falls back inside the code space.
+    Distinct counter values therefore always give distinct codes.
+    """
+    keys = keys or _round_keys()
+    n = _feistel(n, keys)
+    while n >= CODE_SPACE:
+        n = _feistel(n, keys)
+    return n
+
+
+def encode(n):
+    chars = []
+    for _ in range(CODE_LENGTH):
+        n, digit = divmod(n, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def _reserve(count):
+    """Claim `count` consecutive counter values with one UPDATE; returns the first."""
+    from .models import ClassroomCodeSequence
+
+    with transaction.atomic():
+        ClassroomCodeSequence.objects.get_or_create(pk=1)
+        ClassroomCodeSequence.objects.filter(pk=1).update(last=F("last") + count)
+        last = ClassroomCodeSequence.objects.values_list("last", flat=True).get(pk=1)
+    return last - count
+
+
+def allocate_codes(count):
+    """
+    `count` fresh classroom codes. Each comes from a counter value nobody
+    else can hold, so no insert retries are needed. Codes handed out by
+    the old random generator are skipped with one lookup per batch.
+    """
+    from .models import Classroom
+
+    keys = _round_keys()
+    codes = []
+    while len(codes) < count:
+        wanted = count - len(codes)
+        first = _reserve(wanted)
+        batch = [encode(permute(n % CODE_SPACE, keys)) for n in range(first, first + wanted)]
+        taken = set(Classroom.objects.filter(code__in=batch).values_list("code", flat=True))
+        codes.extend(code for code in batch if code not in taken)
+    return codes
+
+
+def allocate_code():
+    return allocate_codes(1)[0]
+
@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+
+def record_reply(discussion_id, author_id, created_at):
+    """
+    Count a new reply on its discussion in one UPDATE. The last-reply
+    fields only move forward, so replies committed out of order cannot
+    roll them back.
+    """
+    from .models import Discussion
+
+    newer = Q(last_reply_at__isnull=True) | Q(last_reply_at__lte=created_at)
+    Discussion.objects.filter(pk=discussion_id).update(
+        reply_count=F('reply_count') + 1,
+        last_reply_at=Case(When(newer, then=Value(created_at)), default=F('last_reply_at')),
+        last_reply_author=Case(
+            When(newer, then=Value(author_id)), default=F('last_reply_author'), output_field=IntegerField(),
+        ),
+        last_activity_at=Greatest(F('last_activity_at'), Value(created_at)),
+    )
+
+
+def _latest_reply():
+    from .models import DiscussionReply
+
+    return DiscussionReply.objects.filter(discussion_id=OuterRef('pk')).order_by('-created_at', '-id')
+
+
+def _recomputed_last_reply():
+    latest = _latest_reply()
+    return {
+        'last_reply_at': Subquery(latest.values('created_at')[:1]),
+        'last_reply_author': Subquery(latest.values('author_id')[:1]),
+        'last_activity_at': Coalesce(Subquery(latest.values('created_at')[:1]), F('created_at')),
+    }
+
+
+def forget_reply(discussion_id):
+    """Uncount a deleted reply and fall back to the newest remaining one."""
+    from .models import Discussion
+
+    Discussion.objects.filter(pk=discussion_id).update(
+        reply_count=F('reply_count') - 1, **_recomputed_last_reply(),
+    )
+
+
+def reconcile_discussions(discussion_ids=None):
+    """
+    Rewrite reply_count and the last-reply fields from DiscussionReply
+    (drift repair). Returns the number of discussions rewritten.
+    """
+    from django.db.models import Count
+    from .models import Discussion, DiscussionReply
+
+    discussions = Discussion.objects.all()
+    if discussion_ids is not None:
+        discussions = discussions.filter(pk__in=discussion_ids)
+
+    counts = (
+        DiscussionReply.objects.filter(discussion_id=OuterRef('pk'))
+        .order_by().values('discussion_id').annotate(n=Count('id')).values('n')
+    )
+    return discussions.update(reply_count=Coalesce(Subquery(counts), 0), **_recomputed_last_reply())
+
+
+def like_reply(reply_id, user_id):
+    """
+    Record that `user_id` likes the reply; returns True if this was a new
+    like. The (reply, user) unique constraint makes repeated and concurrent
+    likes no-ops, and the counter moves in the same transaction.
+    """
+    from .models import DiscussionReply, ReplyLike
+
+    with transaction.atomic():
+        _, created = ReplyLike.objects.get_or_create(reply_id=reply_id, user_id=user_id)
+        if created:
+            DiscussionReply.objects.filter(pk=reply_id).update(likes=F('likes') + 1)
+    return created
+
+
+def unlike_reply(reply_id, user_id):
+    """Withdraw a like; returns True if there was one to withdraw."""
+    from .models import DiscussionReply, ReplyLike
+
+    with transaction.atomic():
+        deleted, _ = ReplyLike.objects.filter(reply_id=reply_id, user_id=user_id).delete()
+        if deleted:
+            DiscussionReply.objects.filter(pk=reply_id).update(likes=F('likes') - 1)
+    return bool(deleted)
+
+
+def liked_reply_ids(user_id, replies):
+    """Ids among `replies` that `user_id` has liked, in one query."""
+    from .models import ReplyLike
+
+    return set(
+        ReplyLike.objects.filter(user_id=user_id, reply_id__in=[r.pk for r in replies])
+        .values_list('reply_id', flat=True)
+    )
@@ -0,0 +1,133 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+CHUNK_SIZE = 64 * 1024
+
+# None serves the bytes from Django; "x-accel-redirect" (nginx) or
+# "x-sendfile" (Apache, lighttpd) hand the transfer to the front server.
+SENDFILE = getattr(settings, "RESOURCE_SENDFILE", None)
+# Internal location nginx maps onto MEDIA_ROOT for X-Accel-Redirect.
+ACCEL_PREFIX = getattr(settings, "RESOURCE_ACCEL_PREFIX", "/protected/")
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class Unsatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, inclusive, or None when the
+    header is absent or not one we serve partially (multiple ranges, other
+    units); the whole file is then sent. Raises Unsatisfiable for ranges
+    that start past the end.
+    """
+    match = _RANGE.match((header or "").strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final `last` bytes.
+        length = int(last)
+        if not length:
+            raise Unsatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise Unsatisfiable
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    # If-Range: serve the range only if the client's copy is still current.
+    validator = request.headers.get("If-Range")
+    if validator is None:
+        return True
+    if validator.startswith(('"', 'W/')):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+def _read(f, start, end):
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def _modified_time(fieldfile):
+    try:
+        return int(fieldfile.storage.get_modified_time(fieldfile.name).timestamp())
+    except (NotImplementedError, OSError):
+        return None
+
+
+def serve(request, fieldfile, filename=None):
+    """
+    Response for downloading `fieldfile`: conditional (ETag/Last-Modified),
+    resumable (single HTTP Range) and, with RESOURCE_SENDFILE set, handed
+    off to the front server. Returns (response, started) where `started`
+    says whether the response begins a fresh download, i.e. it sends the
+    first byte and is not a 304, 412, 416 or resumed range.
+    """
+    filename = filename or os.path.basename(fieldfile.name)
+    size = fieldfile.size
+    last_modified = _modified_time(fieldfile)
+    etag = f'"{size:x}-{last_modified or 0:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response, False
+
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    byte_range = None
+    if request.method == "GET" and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except Unsatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response, False
+
+    if SENDFILE == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        # nginx decodes the URI, so names with spaces, %, ?, # or non-ASCII survive.
+        response["X-Accel-Redirect"] = ACCEL_PREFIX + quote(fieldfile.name)
+    elif SENDFILE == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = fieldfile.path
+    elif byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read(fieldfile.open("rb"), start, end), status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        response = FileResponse(fieldfile.open("rb"), content_type=content_type)
+
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # With sendfile the front server answers the Range itself.
+    started = request.method == "GET" and (byte_range is None or byte_range[0] == 0)
+    return response, started
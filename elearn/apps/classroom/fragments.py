@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Panels of classroom_detail that are cached as rendered fragments.
+SECTIONS = ("announcements", "discussions", "resources", "members")
+
+FRAGMENT_TTL = getattr(settings, "CLASSROOM_FRAGMENT_TTL", 3600)
+
+
+def version_key(classroom_id, section):
+    return f"classroom:{classroom_id}:{section}:version"
+
+
+def _fresh_version():
+    # Never reuse a number an evicted key may have handed out before.
+    return time.time_ns()
+
+
+def section_versions(classroom_id):
+    """
+    Current version of every panel of a classroom. Fragment cache keys
+    include the version, so bumping it orphans the old fragment.
+    """
+    keys = {version_key(classroom_id, s): s for s in SECTIONS}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, section in keys.items():
+        if key not in found:
+            cache.add(key, _fresh_version(), None)
+            found[key] = cache.get(key)
+        versions[section] = found[key]
+    return versions
+
+
+def bump_section(classroom_id, section):
+    key = version_key(classroom_id, section)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), None)
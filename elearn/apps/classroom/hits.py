@@ -0,0 +1,16 @@
+from django.conf import settings
+
+from apps.accounts.buffering import HitCounter
+
+
+discussion_views = HitCounter(
+    'classroom.Discussion', 'views_count',
+    flush_size=getattr(settings, "HIT_COUNTER_FLUSH_SIZE", 200),
+    flush_interval=getattr(settings, "HIT_COUNTER_FLUSH_INTERVAL", 10.0),
+)
+
+resource_downloads = HitCounter(
+    'classroom.LearningResource', 'downloads',
+    flush_size=getattr(settings, "HIT_COUNTER_FLUSH_SIZE", 200),
+    flush_interval=getattr(settings, "HIT_COUNTER_FLUSH_INTERVAL", 10.0),
+)
@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.classroom.archive import archive_term
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"{value!r} is not a YYYY-MM-DD date.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a closed term's attendance marks out of the Attendance table "
+        "into packed per-student archives (two bits per day)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="First day of the term (YYYY-MM-DD).")
+        parser.add_argument("--end", required=True, help="Last day of the term (YYYY-MM-DD).")
+        parser.add_argument("--classroom", type=int, action="append", help="Limit to these classroom ids.")
+
+    def handle(self, *args, **options):
+        start, end = _date(options["start"]), _date(options["end"])
+        if end >= datetime.date.today():
+            raise CommandError("Only terms that have already ended can be archived.")
+
+        try:
+            rows, archives = archive_term(start, end, options["classroom"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Archived {rows} attendance rows into {archives} archives."))
@@ -0,0 +1,55 @@
+import csv
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.classroom.attendance import mark_attendance_bulk
+from apps.classroom.codes import normalize_code
+from apps.classroom.models import Classroom
+
+
+class Command(BaseCommand):
+    help = (
+        "Import attendance from a register CSV with columns "
+        "classroom_code, username, date (YYYY-MM-DD) and status."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--recorded-by", help="Username to record as the marker.")
+
+    def handle(self, *args, **options):
+        recorded_by = None
+        if options["recorded_by"]:
+            recorded_by = User.objects.filter(username=options["recorded_by"]).first()
+            if recorded_by is None:
+                raise CommandError(f"Unknown user {options['recorded_by']!r}.")
+
+        with open(options["path"], newline="") as f:
+            rows = list(csv.DictReader(f))
+
+        classrooms = dict(
+            Classroom.objects.filter(code__in={normalize_code(r["classroom_code"]) for r in rows})
+            .values_list("code", "id")
+        )
+        students = dict(
+            User.objects.filter(username__in={r["username"].strip() for r in rows})
+            .values_list("username", "id")
+        )
+
+        entries, unknown = [], 0
+        for row in rows:
+            classroom_id = classrooms.get(normalize_code(row["classroom_code"]))
+            student_id = students.get(row["username"].strip())
+            if classroom_id is None or student_id is None:
+                unknown += 1
+                continue
+            entries.append((classroom_id, student_id, row["date"].strip(), row["status"].strip().lower()))
+
+        result = mark_attendance_bulk(entries, recorded_by=recorded_by)
+
+        for entry, reason in result.rejected:
+            self.stderr.write(f"Skipped {entry}: {reason}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {result.marked} rows; {len(result.rejected) + unknown} skipped."
+        ))
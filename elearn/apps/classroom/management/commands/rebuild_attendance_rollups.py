@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.classroom.attendance import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily and monthly attendance rollups from the Attendance table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classroom", type=int, action="append", help="Limit to these classroom ids.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_rollups(options["classroom"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} monthly attendance rollups."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.classroom import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text index over discussions, replies, announcements and resources."
+
+    def handle(self, *args, **options):
+        if not search.fts5_available():
+            self.stdout.write(self.style.WARNING("FTS5 is not available; search falls back to LIKE queries."))
+            return
+
+        search.create_index()
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.classroom.discussions import reconcile_discussions
+
+
+class Command(BaseCommand):
+    help = "Rebuild reply_count and the last-reply fields of discussions from their replies."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--discussion", type=int, action="append", help="Limit to these discussion ids.")
+
+    def handle(self, *args, **options):
+        count = reconcile_discussions(options["discussion"])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {count} discussions."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.classroom.membership import reconcile_student_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild each classroom's student_count from its active student memberships."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--classroom", type=int, action="append", help="Limit to these classroom ids.")
+
+    def handle(self, *args, **options):
+        fixed = reconcile_student_counts(options["classroom"])
+        self.stdout.write(self.style.SUCCESS(f"Corrected student_count on {fixed} classrooms."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.classroom.attendance import recount_attendance
+
+
+class Command(BaseCommand):
+    help = "Rebuild the running attendance counters and rates from the Attendance table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--student", type=int, action="append", help="Limit to these student ids.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = recount_attendance(options["student"])
+        self.stdout.write(self.style.SUCCESS(f"Recounted attendance for {count} students."))
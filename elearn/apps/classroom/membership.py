@@ -0,0 +1,70 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class ClassroomFull(Exception):
+    pass
+
+
+def takes_seat(role, status):
+    """Whether a membership counts towards Classroom.student_count (and max_students)."""
+    return role == 'student' and status == 'active'
+
+
+def adjust_student_count(classroom_id, delta):
+    from .models import Classroom
+
+    if delta:
+        Classroom.objects.filter(pk=classroom_id).update(student_count=F('student_count') + delta)
+
+
+def join(classroom, student):
+    """
+    Enrol `student` as an active student, returning (member, created).
+
+    The capacity check and the seat increment are one conditional UPDATE,
+    so concurrent joins can never push student_count past max_students.
+    Existing memberships are returned unchanged. Raises ClassroomFull.
+    """
+    from .models import Classroom, ClassMember
+
+    member = ClassMember.objects.filter(classroom=classroom, student=student).first()
+    if member is not None:
+        return member, False
+
+    try:
+        with transaction.atomic():
+            reserved = Classroom.objects.filter(
+                pk=classroom.pk, student_count__lt=F('max_students'),
+            ).update(student_count=F('student_count') + 1)
+            if not reserved:
+                raise ClassroomFull(classroom.pk)
+
+            member = ClassMember(classroom=classroom, student=student, role='student')
+            # The seat is already counted; the post_save counter must not add it again.
+            member._seat_reserved = True
+            member.save()
+    except IntegrityError:
+        # A concurrent request enrolled the same student; its seat stands, ours rolled back.
+        return ClassMember.objects.get(classroom=classroom, student=student), False
+    return member, True
+
+
+def reconcile_student_counts(classroom_ids=None):
+    """
+    Rewrite student_count from the ClassMember table (drift repair).
+    Returns the number of classrooms whose counter was wrong.
+    """
+    from .models import Classroom, ClassMember
+
+    classrooms = Classroom.objects.all()
+    if classroom_ids is not None:
+        classrooms = classrooms.filter(pk__in=classroom_ids)
+
+    seats = (
+        ClassMember.objects.filter(classroom_id=OuterRef('pk'), role='student', status='active')
+        .order_by().values('classroom_id').annotate(n=Count('id')).values('n')
+    )
+    actual = Coalesce(Subquery(seats), 0)
+    return classrooms.exclude(student_count=actual).update(student_count=actual)
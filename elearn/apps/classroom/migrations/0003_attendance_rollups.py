@@ -0,0 +1,77 @@
+# Generated by Django 4.2.27 on 2026-10-16 21:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    from django.db.models import Count, Q
+    from django.db.models.functions import TruncMonth
+
+    Attendance = apps.get_model('classroom', 'Attendance')
+    AttendanceDaily = apps.get_model('classroom', 'AttendanceDaily')
+    AttendanceMonthly = apps.get_model('classroom', 'AttendanceMonthly')
+
+    statuses = ('present', 'absent', 'late', 'excused')
+    counts = {s: Count('id', filter=Q(status=s)) for s in statuses}
+    records = Attendance.objects.order_by()
+
+    AttendanceDaily.objects.bulk_create(
+        [AttendanceDaily(**row) for row in records.values('classroom_id', 'date').annotate(**counts)],
+        batch_size=500,
+    )
+    AttendanceMonthly.objects.bulk_create(
+        [
+            AttendanceMonthly(**row)
+            for row in records.annotate(month=TruncMonth('date'))
+            .values('classroom_id', 'student_id', 'month').annotate(**counts)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0002_alter_announcementboard_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('excused', models.IntegerField(default=0)),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_daily', to='classroom.classroom')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('classroom', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('excused', models.IntegerField(default=0)),
+                ('classroom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_monthly', to='classroom.classroom')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_monthly', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['classroom', 'month'], name='classroom_a_classro_3efc2b_idx')],
+                'unique_together': {('classroom', 'student', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.27 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+def backfill_student_count(apps, schema_editor):
+    from django.db.models import Count, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+
+    Classroom = apps.get_model('classroom', 'Classroom')
+    ClassMember = apps.get_model('classroom', 'ClassMember')
+
+    seats = (
+        ClassMember.objects.filter(classroom_id=OuterRef('pk'), role='student', status='active')
+        .order_by().values('classroom_id').annotate(n=Count('id')).values('n')
+    )
+    Classroom.objects.update(student_count=Coalesce(Subquery(seats), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0004_attendance_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroom',
+            name='student_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_student_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-16 21:50
+
+from django.db import migrations, models
+
+
+def normalize_codes(apps, schema_editor):
+    Classroom = apps.get_model('classroom', 'Classroom')
+
+    classrooms = [c for c in Classroom.objects.only('id', 'code') if c.code != c.code.strip().upper()]
+    for c in classrooms:
+        c.code = c.code.strip().upper()
+    Classroom.objects.bulk_update(classrooms, ['code'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0005_classroom_student_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassroomCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='classroom',
+            name='classroom_c_code_93d089_idx',
+        ),
+        migrations.RunPython(normalize_codes, migrations.RunPython.noop),
+    ]
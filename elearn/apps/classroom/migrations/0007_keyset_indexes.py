@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-16 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0006_classroom_code_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['classroom', '-is_pinned', '-created_at', '-id'], name='discussion_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussionreply',
+            index=models.Index(fields=['discussion', '-is_answer', '-created_at', '-id'], name='discussion_reply_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learningresource',
+            index=models.Index(fields=['classroom', '-created_at', '-id'], name='resource_feed_idx'),
+        ),
+    ]
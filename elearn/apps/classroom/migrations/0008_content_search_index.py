@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+# The index schema as of this migration, spelled out so that later changes
+# to apps.classroom.search cannot alter what replaying it creates.
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS classroom_content_search USING fts5("
+    "title, body, classroom_id UNINDEXED, kind UNINDEXED, object_id UNINDEXED, discussion_id UNINDEXED, "
+    "tokenize='unicode61', prefix='2 3')"
+)
+
+# rowid = object id * 4 + kind code (discussion, reply, announcement, resource).
+POPULATE_INDEX = [
+    "INSERT INTO classroom_content_search "
+    "(rowid, title, body, classroom_id, kind, object_id, discussion_id) " + select
+    for select in (
+        "SELECT x.id * 4 + 0, x.title, x.content, x.classroom_id, 'discussion', x.id, x.id "
+        "FROM classroom_discussion x",
+        "SELECT x.id * 4 + 1, '', x.content, d.classroom_id, 'reply', x.id, x.discussion_id "
+        "FROM classroom_discussionreply x JOIN classroom_discussion d ON d.id = x.discussion_id",
+        "SELECT x.id * 4 + 2, x.title, x.content, x.classroom_id, 'announcement', x.id, NULL "
+        "FROM classroom_announcementboard x",
+        "SELECT x.id * 4 + 3, x.title, COALESCE(x.description, ''), x.classroom_id, 'resource', x.id, NULL "
+        "FROM classroom_learningresource x",
+    )
+]
+
+OPTIMIZE_INDEX = "INSERT INTO classroom_content_search (classroom_content_search) VALUES ('optimize')"
+
+DROP_INDEX = "DROP TABLE IF EXISTS classroom_content_search"
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        for sql in [CREATE_INDEX, *POPULATE_INDEX, OPTIMIZE_INDEX]:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.27 on 2026-10-16 22:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_reply_stats(apps, schema_editor):
+    from django.db.models import Count, F, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+
+    Discussion = apps.get_model('classroom', 'Discussion')
+    DiscussionReply = apps.get_model('classroom', 'DiscussionReply')
+
+    replies = DiscussionReply.objects.filter(discussion_id=OuterRef('pk'))
+    counts = replies.order_by().values('discussion_id').annotate(n=Count('id')).values('n')
+    latest = replies.order_by('-created_at', '-id')
+    Discussion.objects.update(
+        reply_count=Coalesce(Subquery(counts), 0),
+        last_reply_at=Subquery(latest.values('created_at')[:1]),
+        last_reply_author=Subquery(latest.values('author_id')[:1]),
+        last_activity_at=Coalesce(Subquery(latest.values('created_at')[:1]), F('created_at')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0008_content_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='reply_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='last_reply_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='last_reply_author',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_reply_stats, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['classroom', '-last_activity_at', '-id'], name='discussion_activity_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-16 22:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0009_discussion_reply_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplyLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reply', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_records', to='classroom.discussionreply')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reply_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('reply', 'user')},
+            },
+        ),
+    ]
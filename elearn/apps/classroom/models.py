@@ -1,9 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from apps.accounts.models import DerivedFieldsMixin
 
-class Classroom(models.Model):
+
+class Classroom(DerivedFieldsMixin, models.Model):
     STATUS_CHOICES = (
         ('active', 'Active'),
         ('archived', 'Archived'),
@@ -22,6 +25,8 @@ class Classroom(models.Model):
     schedule = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     max_students = models.IntegerField(default=50)
+    # Active student members, kept in step by signals and membership.join.
+    student_count = models.IntegerField(default=0)
     banner_image = models.ImageField(upload_to='classrooms/', blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -31,17 +36,30 @@ class Classroom(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['teacher', '-created_at']),
-            models.Index(fields=['code']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.code})"
 
+    # Maintained by the membership counter; never written by a plain save().
+    DERIVED_FIELDS = ('student_count',)
+
+    def save(self, *args, **kwargs):
+        from .codes import allocate_code, normalize_code
+
+        self.code = normalize_code(self.code) if self.code else allocate_code()
+        super().save(*args, **kwargs)
+
     def get_student_count(self):
-        return self.members.filter(role='student', status='active').count()
+        return self.student_count
 
     def is_full(self):
-        return self.get_student_count() >= self.max_students
+        return self.student_count >= self.max_students
+
+
+class ClassroomCodeSequence(models.Model):
+    """Single-row counter behind classroom code allocation (see classroom.codes)."""
+    last = models.BigIntegerField(default=0)
 
 
 class ClassMember(models.Model):
@@ -100,6 +118,101 @@ class Attendance(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.classroom.name} ({self.date})"
 
+    def lands_on_archived_day(self):
+        """Whether saving would add a live mark for a day the student's archive already records."""
+        from .archive import archived_status
+        from .attendance import as_date
+
+        if not self._state.adding and getattr(self, '_saved_date', None) == as_date(self.date):
+            return False
+        return archived_status(self.classroom_id, self.student_id, self.date) is not None
+
+    def clean(self):
+        from .archive import ARCHIVED_DAY
+
+        if self.classroom_id and self.student_id and self.date and self.lands_on_archived_day():
+            raise ValidationError({'date': ARCHIVED_DAY})
+
+
+class AttendanceDaily(models.Model):
+    """Per-classroom status counts for one day, kept in step with Attendance."""
+    classroom = models.ForeignKey(
+        Classroom, on_delete=models.CASCADE, related_name='attendance_daily'
+    )
+    date = models.DateField()
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    excused = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('classroom', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.classroom.name} ({self.date})"
+
+
+class AttendanceMonthly(models.Model):
+    """Per-student status counts for one calendar month (month = its first day)."""
+    classroom = models.ForeignKey(
+        Classroom, on_delete=models.CASCADE, related_name='attendance_monthly'
+    )
+    student = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='attendance_monthly'
+    )
+    month = models.DateField()
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    excused = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('classroom', 'student', 'month')
+        ordering = ['-month']
+        indexes = [models.Index(fields=['classroom', 'month'])]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.classroom.name} ({self.month:%Y-%m})"
+
+
+class AttendanceArchive(models.Model):
+    """
+    One student's attendance in one classroom over a closed term, packed
+    two bits per day (see classroom.archive). `recorded` has one bit per day
+    marking which days have a status at all. The per-status counts are
+    stored alongside so recounts never need to unpack.
+    """
+    classroom = models.ForeignKey(
+        Classroom, on_delete=models.CASCADE, related_name='attendance_archives'
+    )
+    student = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='attendance_archives'
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+    statuses = models.BinaryField()
+    recorded = models.BinaryField()
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    excused = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('classroom', 'student', 'start_date')
+        ordering = ['-start_date']
+        indexes = [models.Index(fields=['student', 'start_date'])]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.classroom.name} ({self.start_date} to {self.end_date})"
+
+    def records(self):
+        """(date, status) for every recorded day, oldest first."""
+        from .archive import unpack
+        return unpack(self.start_date, self.end_date, self.statuses, self.recorded)
+
 
 class AnnouncementBoard(models.Model):
     classroom = models.ForeignKey(
@@ -121,7 +234,7 @@ class AnnouncementBoard(models.Model):
         return f"{self.title} - {self.classroom.name}"
 
 
-class Discussion(models.Model):
+class Discussion(DerivedFieldsMixin, models.Model):
     TOPICS = (
         ('general', 'General'),
         ('doubt', 'Doubt'),
@@ -143,20 +256,38 @@ class Discussion(models.Model):
     is_closed = models.BooleanField(default=False)
     views_count = models.IntegerField(default=0)
 
+    # Kept in step with DiscussionReply writes (see classroom.discussions).
+    reply_count = models.IntegerField(default=0)
+    last_reply_at = models.DateTimeField(blank=True, null=True)
+    last_reply_author = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+'
+    )
+    last_activity_at = models.DateTimeField(default=timezone.now)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-is_pinned', '-created_at']
+        indexes = [
+            # Keyset pagination order (see classroom.pagination).
+            models.Index(fields=['classroom', '-is_pinned', '-created_at', '-id'], name='discussion_feed_idx'),
+            models.Index(fields=['classroom', '-last_activity_at', '-id'], name='discussion_activity_idx'),
+        ]
+
+    ACTIVITY_ORDERING = ('-last_activity_at', '-id')
 
     def __str__(self):
         return f"{self.title} - {self.classroom.name}"
 
+    # Maintained by counters and signals; never written by a plain save().
+    DERIVED_FIELDS = ('views_count', 'reply_count', 'last_reply_at', 'last_reply_author', 'last_activity_at')
+
     def get_reply_count(self):
-        return self.replies.count()
+        return self.reply_count
 
 
-class DiscussionReply(models.Model):
+class DiscussionReply(DerivedFieldsMixin, models.Model):
     discussion = models.ForeignKey(
         Discussion, on_delete=models.CASCADE, related_name='replies'
     )
@@ -171,12 +302,34 @@ class DiscussionReply(models.Model):
 
     class Meta:
         ordering = ['-is_answer', '-created_at']
+        indexes = [
+            models.Index(fields=['discussion', '-is_answer', '-created_at', '-id'], name='discussion_reply_feed_idx'),
+        ]
 
     def __str__(self):
         return f"Reply by {self.author.username} on {self.discussion.title}"
 
+    # Maintained from ReplyLike (see classroom.discussions); never written by a plain save().
+    DERIVED_FIELDS = ('likes',)
+
+
+class ReplyLike(models.Model):
+    reply = models.ForeignKey(
+        DiscussionReply, on_delete=models.CASCADE, related_name='like_records'
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='reply_likes'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('reply', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} likes reply {self.reply_id}"
+
 
-class LearningResource(models.Model):
+class LearningResource(DerivedFieldsMixin, models.Model):
     RESOURCE_TYPES = (
         ('document', 'Document'),
         ('video', 'Video'),
@@ -201,10 +354,16 @@ class LearningResource(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['classroom', '-created_at', '-id'], name='resource_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.classroom.name}"
 
+    # Fed by the resource_downloads hit counter; never written by a plain save().
+    DERIVED_FIELDS = ('downloads',)
+
 
 class ProgressTracking(models.Model):
     student = models.ForeignKey(
@@ -0,0 +1,95 @@
+import operator
+from functools import reduce
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+PER_PAGE = 20
+CURSOR_SALT = "keyset-cursor"
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def keyset_ordering(model):
+    """The model's Meta.ordering with the primary key appended as a tie-breaker."""
+    ordering = tuple(model._meta.ordering)
+    if not ordering or ordering[-1].lstrip("-") not in ("id", "pk"):
+        ordering += ("-id",)
+    return ordering
+
+
+def _fields(model, ordering):
+    return [(key.lstrip("-"), key.startswith("-"), model._meta.get_field(key.lstrip("-"))) for key in ordering]
+
+
+def encode_cursor(model, ordering, obj):
+    values = [field.value_to_string(obj) for _, _, field in _fields(model, ordering)]
+    return signing.dumps(values, salt=CURSOR_SALT)
+
+
+def decode_cursor(model, ordering, token):
+    try:
+        values = signing.loads(token, salt=CURSOR_SALT)
+        fields = _fields(model, ordering)
+        if len(values) != len(fields):
+            raise ValueError
+        return [(name, desc, field.to_python(value)) for (name, desc, field), value in zip(fields, values)]
+    except (signing.BadSignature, ValidationError, ValueError, TypeError) as e:
+        raise Http404("Invalid page cursor.") from e
+
+
+def after(keys):
+    """
+    Rows strictly after the cursor in (k1, k2, ...) order, as
+    k1 > v1 OR (k1 = v1 AND k2 > v2) OR ..., with < for descending keys.
+    """
+    conditions = []
+    equal = Q()
+    for name, desc, value in keys:
+        conditions.append(equal & Q(**{f"{name}__{'lt' if desc else 'gt'}": value}))
+        equal &= Q(**{name: value})
+    return reduce(operator.or_, conditions)
+
+
+def paginate(queryset, cursor=None, per_page=PER_PAGE, ordering=None):
+    """
+    Keyset (seek) pagination: return the page of `queryset` following
+    `cursor`, ordered by `ordering` (default: keyset_ordering), which must
+    end in a unique field.
+
+    Instead of OFFSET, each page filters on the last row's sort key, so with
+    an index matching `ordering` page N costs the same as page 1. Cursors
+    are signed, opaque tokens usable in both query strings and JSON.
+    """
+    model = queryset.model
+    ordering = ordering or keyset_ordering(model)
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(after(decode_cursor(model, ordering, cursor)))
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(model, ordering, items[-1])
+    return KeysetPage(items, next_cursor)
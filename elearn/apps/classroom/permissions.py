@@ -0,0 +1,84 @@
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.shortcuts import redirect
+
+
+ACCESS_TTL = getattr(settings, "CLASSROOM_ACCESS_TTL", 3600)
+
+
+class Access(namedtuple("Access", ["role", "teaching", "member"])):
+    """A user's role and the ids of the classrooms they teach or belong to."""
+
+    @property
+    def is_teacher(self):
+        return self.role == "teacher"
+
+    def teaches(self, classroom_id):
+        return int(classroom_id) in self.teaching
+
+    def can_view(self, classroom_id):
+        classroom_id = int(classroom_id)
+        return classroom_id in self.teaching or classroom_id in self.member
+
+
+def access_key(user_id):
+    return f"classroom-access:{user_id}"
+
+
+def invalidate_access(user_ids):
+    cache.delete_many([access_key(uid) for uid in user_ids if uid is not None])
+
+
+def load_access(user_id):
+    from apps.accounts.models import UserProfile
+    from .models import Classroom, ClassMember
+
+    return Access(
+        role=UserProfile.objects.filter(user_id=user_id).values_list("role", flat=True).first(),
+        teaching=frozenset(Classroom.objects.filter(teacher_id=user_id).values_list("id", flat=True)),
+        member=frozenset(ClassMember.objects.filter(student_id=user_id).values_list("classroom_id", flat=True)),
+    )
+
+
+def access_for(request):
+    """
+    The requesting user's Access, read once per request and cached across
+    requests until a Classroom, ClassMember or profile change drops it.
+    """
+    access = getattr(request, "_classroom_access", None)
+    if access is None:
+        key = access_key(request.user.pk)
+        access = cache.get(key)
+        if access is None:
+            access = load_access(request.user.pk)
+            cache.set(key, access, ACCESS_TTL)
+        request._classroom_access = access
+    return access
+
+
+def classroom_access_required(level, message, redirect_to="classroom_detail"):
+    """
+    Guard a view taking ``classroom_id``: ``level`` is "teacher" for the
+    classroom's teacher only, or "member" for its teacher and members.
+    Refused users get ``message`` and a redirect to ``redirect_to``, which
+    is reversed with the classroom id unless it is "classroom_list".
+    """
+    def decorator(view):
+        @login_required
+        @wraps(view)
+        def wrapper(request, classroom_id, *args, **kwargs):
+            access = access_for(request)
+            allowed = access.teaches(classroom_id) if level == "teacher" else access.can_view(classroom_id)
+            if not allowed:
+                messages.error(request, message)
+                if redirect_to == "classroom_list":
+                    return redirect(redirect_to)
+                return redirect(redirect_to, classroom_id=classroom_id)
+            return view(request, classroom_id, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,198 @@
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from apps.accounts.search import fts5_available, match_expression
+
+
+TABLE = "classroom_content_search"
+
+# Kind codes; rowid = object id * len(KINDS) + code keeps rowids unique across models.
+KINDS = ("discussion", "reply", "announcement", "resource")
+
+INDEXED_FIELDS = {
+    "discussion": ("title", "content"),
+    "reply": ("content",),
+    "announcement": ("title", "content"),
+    "resource": ("title", "description"),
+}
+
+# bm25() weights for the title and body columns.
+WEIGHTS = (5.0, 1.0)
+
+SNIPPET_TOKENS = 16
+# Control characters mark the match in snippets until the text is escaped.
+_HIT_START, _HIT_END = "\x02", "\x03"
+
+SearchHit = namedtuple("SearchHit", ["kind", "object_id", "discussion_id", "classroom_id", "title", "snippet"])
+
+
+def _rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS.index(kind)
+
+
+def _tables():
+    from .models import AnnouncementBoard, Discussion, DiscussionReply, LearningResource
+
+    return {
+        "discussion": Discussion._meta.db_table,
+        "reply": DiscussionReply._meta.db_table,
+        "announcement": AnnouncementBoard._meta.db_table,
+        "resource": LearningResource._meta.db_table,
+    }
+
+
+def _select_documents(kind, where=""):
+    """SELECT producing (rowid, title, body, classroom_id, kind, object_id, discussion_id) rows for `kind`."""
+    t = _tables()
+    n, code = len(KINDS), KINDS.index(kind)
+    if kind == "discussion":
+        return (
+            f"SELECT x.id * {n} + {code}, x.title, x.content, x.classroom_id, '{kind}', x.id, x.id "
+            f"FROM {t['discussion']} x {where}"
+        )
+    if kind == "reply":
+        return (
+            f"SELECT x.id * {n} + {code}, '', x.content, d.classroom_id, '{kind}', x.id, x.discussion_id "
+            f"FROM {t['reply']} x JOIN {t['discussion']} d ON d.id = x.discussion_id {where}"
+        )
+    if kind == "announcement":
+        return (
+            f"SELECT x.id * {n} + {code}, x.title, x.content, x.classroom_id, '{kind}', x.id, NULL "
+            f"FROM {t['announcement']} x {where}"
+        )
+    return (
+        f"SELECT x.id * {n} + {code}, x.title, COALESCE(x.description, ''), x.classroom_id, '{kind}', x.id, NULL "
+        f"FROM {t['resource']} x {where}"
+    )
+
+
+COLUMNS = "rowid, title, body, classroom_id, kind, object_id, discussion_id"
+
+
+# =========================================================
+# INDEX MAINTENANCE
+# =========================================================
+
+def create_index(conn=connection):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"title, body, classroom_id UNINDEXED, kind UNINDEXED, object_id UNINDEXED, discussion_id UNINDEXED, "
+            f"tokenize='unicode61', prefix='2 3')"
+        )
+
+
+def drop_index(conn=connection):
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def index_document(kind, object_id, conn=connection):
+    if not fts5_available(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind, object_id)])
+        cursor.execute(f"INSERT INTO {TABLE} ({COLUMNS}) " + _select_documents(kind, "WHERE x.id = %s"), [object_id])
+
+
+def unindex_document(kind, object_id, conn=connection):
+    if not fts5_available(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind, object_id)])
+
+
+def rebuild_index(conn=connection):
+    if not fts5_available(conn):
+        return 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        for kind in KINDS:
+            cursor.execute(f"INSERT INTO {TABLE} ({COLUMNS}) " + _select_documents(kind))
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+# =========================================================
+# QUERIES
+# =========================================================
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet).replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>"))
+
+
+def _with_discussion_titles(hits):
+    """Replies have no title of their own; show the title of their discussion."""
+    from .models import Discussion
+
+    ids = {h.discussion_id for h in hits if h.kind == "reply"}
+    titles = dict(Discussion.objects.filter(id__in=ids).values_list("id", "title")) if ids else {}
+    return [h._replace(title=titles.get(h.discussion_id, "")) if h.kind == "reply" else h for h in hits]
+
+
+def _fallback_search(query, classroom_ids, limit):
+    from .models import AnnouncementBoard, Discussion, DiscussionReply, LearningResource
+
+    def hit(kind, obj, title, body, classroom_id, discussion_id=None):
+        return SearchHit(kind, obj.id, discussion_id, classroom_id, title, Truncator(body or "").words(SNIPPET_TOKENS))
+
+    hits = [
+        hit("discussion", d, d.title, d.content, d.classroom_id, d.id)
+        for d in Discussion.objects.filter(
+            Q(title__icontains=query) | Q(content__icontains=query), classroom_id__in=classroom_ids,
+        )[:limit]
+    ]
+    hits += [
+        hit("reply", r, "", r.content, r.discussion.classroom_id, r.discussion_id)
+        for r in DiscussionReply.objects.filter(
+            content__icontains=query, discussion__classroom_id__in=classroom_ids,
+        ).select_related("discussion")[:limit]
+    ]
+    hits += [
+        hit("announcement", a, a.title, a.content, a.classroom_id)
+        for a in AnnouncementBoard.objects.filter(
+            Q(title__icontains=query) | Q(content__icontains=query), classroom_id__in=classroom_ids,
+        )[:limit]
+    ]
+    hits += [
+        hit("resource", r, r.title, r.description, r.classroom_id)
+        for r in LearningResource.objects.filter(
+            Q(title__icontains=query) | Q(description__icontains=query), classroom_id__in=classroom_ids,
+        )[:limit]
+    ]
+    return _with_discussion_titles(hits[:limit])
+
+
+def search_content(query, classroom_ids, limit=20):
+    """
+    Ranked prefix search over discussions, replies, announcements and
+    resources in `classroom_ids` (the classrooms the searcher may view).
+    Each SearchHit carries an HTML snippet with the matches in <mark>.
+    """
+    expression = match_expression(query)
+    classroom_ids = list(classroom_ids)
+    if not expression or not classroom_ids:
+        return []
+
+    if not fts5_available():
+        return _fallback_search(query, classroom_ids, limit)
+
+    placeholders = ", ".join(["%s"] * len(classroom_ids))
+    weights = ", ".join(str(w) for w in WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT kind, object_id, discussion_id, classroom_id, title, "
+            f"snippet({TABLE}, -1, %s, %s, '…', {SNIPPET_TOKENS}) "
+            f"FROM {TABLE} "
+            f"WHERE {TABLE} MATCH %s AND classroom_id IN ({placeholders}) "
+            f"ORDER BY bm25({TABLE}, {weights}) LIMIT %s",
+            [_HIT_START, _HIT_END, expression, *classroom_ids, limit],
+        )
+        hits = [SearchHit(*row[:5], _highlight(row[5])) for row in cursor.fetchall()]
+    return _with_discussion_titles(hits)
@@ -0,0 +1,236 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Attendance, AnnouncementBoard, Classroom, ClassMember, Discussion, DiscussionReply, LearningResource
+from .fragments import bump_section
+from .permissions import invalidate_access
+from .membership import adjust_student_count, takes_seat
+from . import search
+from .discussions import forget_reply, record_reply
+from .archive import ARCHIVED_DAY
+from .attendance import apply_attendance_deltas, apply_rollup_changes, as_date, counting_paused, status_delta
+
+
+# =========================================================
+# ATTENDANCE COUNTERS
+# =========================================================
+
+@receiver(post_init, sender=Attendance)
+def remember_attendance_status(sender, instance, **kwargs):
+    instance._saved_status = instance.__dict__.get('status') if instance.pk else None
+    instance._saved_date = as_date(instance.__dict__.get('date')) if instance.pk else None
+
+
+@receiver(pre_save, sender=Attendance)
+def refuse_archived_day(sender, instance, raw=False, **kwargs):
+    # The archive already counts the day; a live mark would count it twice.
+    if not raw and instance.lands_on_archived_day():
+        raise ValidationError(ARCHIVED_DAY)
+
+
+@receiver(post_save, sender=Attendance)
+def count_attendance_write(sender, instance, created, raw=False, **kwargs):
+    if raw or counting_paused():
+        instance._saved_status = instance.status
+        instance._saved_date = as_date(instance.date)
+        return
+    old_status = None if created else instance._saved_status
+    delta = status_delta(old_status, instance.status)
+    if any(delta):
+        apply_attendance_deltas({(instance.classroom_id, instance.student_id): delta})
+
+    changes = []
+    if old_status is not None and instance._saved_date != as_date(instance.date):
+        # Moved to another day: take it off the old day, add it to the new one.
+        changes.append((instance.classroom_id, instance.student_id, instance._saved_date, old_status, None))
+        old_status = None
+    changes.append((instance.classroom_id, instance.student_id, instance.date, old_status, instance.status))
+    apply_rollup_changes(changes)
+
+    instance._saved_status = instance.status
+    instance._saved_date = as_date(instance.date)
+
+
+def _deleted_parents(instance, origin):
+    """
+    (classroom_gone, student_gone) for an Attendance delete: whether it is a
+    cascade from deleting its own Classroom or student User, whose counter
+    and rollup rows are deleted in the same cascade.
+    """
+    classroom_gone = isinstance(origin, Classroom) and origin.pk == instance.classroom_id
+    student_gone = isinstance(origin, User) and origin.pk == instance.student_id
+    return classroom_gone, student_gone
+
+
+@receiver(post_delete, sender=Attendance)
+def count_attendance_delete(sender, instance, origin=None, **kwargs):
+    if counting_paused():
+        return
+    classroom_gone, student_gone = _deleted_parents(instance, origin)
+    delta = status_delta(instance._saved_status, None)
+    apply_attendance_deltas(
+        {(instance.classroom_id, instance.student_id): delta},
+        student_stats=not student_gone,
+        progress=not (classroom_gone or student_gone),
+    )
+    apply_rollup_changes(
+        [(instance.classroom_id, instance.student_id, instance._saved_date, instance._saved_status, None)],
+        daily_rollup=not classroom_gone,
+        monthly_rollup=not (classroom_gone or student_gone),
+    )
+
+
+# =========================================================
+# CLASSROOM DETAIL FRAGMENTS
+# =========================================================
+
+SECTION_SENDERS = {
+    AnnouncementBoard: 'announcements',
+    Discussion: 'discussions',
+    LearningResource: 'resources',
+    ClassMember: 'members',
+}
+
+
+@receiver(post_save, sender=AnnouncementBoard)
+@receiver(post_delete, sender=AnnouncementBoard)
+@receiver(post_save, sender=Discussion)
+@receiver(post_delete, sender=Discussion)
+@receiver(post_save, sender=LearningResource)
+@receiver(post_delete, sender=LearningResource)
+@receiver(post_save, sender=ClassMember)
+@receiver(post_delete, sender=ClassMember)
+def bump_classroom_section(sender, instance, **kwargs):
+    bump_section(instance.classroom_id, SECTION_SENDERS[sender])
+
+
+def _bump_discussions_for_reply(reply):
+    classroom_id = Discussion.objects.filter(pk=reply.discussion_id).values_list('classroom_id', flat=True).first()
+    if classroom_id is not None:
+        bump_section(classroom_id, 'discussions')
+
+
+@receiver(post_save, sender=DiscussionReply)
+def bump_discussions_for_new_reply(sender, instance, created, **kwargs):
+    # The panel shows reply counts, which edits to a reply do not change.
+    if created:
+        _bump_discussions_for_reply(instance)
+
+
+@receiver(post_delete, sender=DiscussionReply)
+def bump_discussions_for_deleted_reply(sender, instance, **kwargs):
+    _bump_discussions_for_reply(instance)
+
+
+# =========================================================
+# PERMISSION INDEX
+# =========================================================
+
+@receiver(post_init, sender=Classroom)
+def remember_classroom_teacher(sender, instance, **kwargs):
+    instance._saved_teacher_id = instance.__dict__.get('teacher_id') if instance.pk else None
+
+
+@receiver(post_save, sender=Classroom)
+def invalidate_access_for_classroom(sender, instance, created, **kwargs):
+    if created or instance._saved_teacher_id != instance.teacher_id:
+        invalidate_access([instance.teacher_id, instance._saved_teacher_id])
+    instance._saved_teacher_id = instance.teacher_id
+
+
+@receiver(post_delete, sender=Classroom)
+def forget_access_for_classroom(sender, instance, **kwargs):
+    invalidate_access([instance.teacher_id])
+
+
+@receiver(post_save, sender=ClassMember)
+@receiver(post_delete, sender=ClassMember)
+def invalidate_access_for_member(sender, instance, **kwargs):
+    invalidate_access([instance.student_id])
+
+
+@receiver(post_save, sender='accounts.UserProfile')
+def invalidate_access_for_role(sender, instance, **kwargs):
+    invalidate_access([instance.user_id])
+
+
+# =========================================================
+# STUDENT COUNT
+# =========================================================
+
+@receiver(post_init, sender=ClassMember)
+def remember_member_seat(sender, instance, **kwargs):
+    instance._saved_seat = (
+        instance.__dict__.get('classroom_id'),
+        takes_seat(instance.__dict__.get('role'), instance.__dict__.get('status')),
+    ) if instance.pk else (None, False)
+
+
+@receiver(post_save, sender=ClassMember)
+def count_member_seat(sender, instance, raw=False, **kwargs):
+    seat = (instance.classroom_id, takes_seat(instance.role, instance.status))
+    old_classroom_id, had_seat = instance._saved_seat
+    if instance.__dict__.pop('_seat_reserved', False):
+        had_seat, old_classroom_id = True, instance.classroom_id
+    if not raw and seat != (old_classroom_id, had_seat):
+        if had_seat:
+            adjust_student_count(old_classroom_id, -1)
+        if seat[1]:
+            adjust_student_count(instance.classroom_id, 1)
+    instance._saved_seat = seat
+
+
+@receiver(post_delete, sender=ClassMember)
+def release_member_seat(sender, instance, **kwargs):
+    classroom_id, had_seat = instance._saved_seat
+    if had_seat:
+        adjust_student_count(classroom_id, -1)
+
+
+# =========================================================
+# CONTENT SEARCH
+# =========================================================
+
+SEARCH_KINDS = {
+    Discussion: 'discussion',
+    DiscussionReply: 'reply',
+    AnnouncementBoard: 'announcement',
+    LearningResource: 'resource',
+}
+
+
+@receiver(post_save, sender=Discussion)
+@receiver(post_save, sender=DiscussionReply)
+@receiver(post_save, sender=AnnouncementBoard)
+@receiver(post_save, sender=LearningResource)
+def index_content_for_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    kind = SEARCH_KINDS[sender]
+    fields = search.INDEXED_FIELDS[kind]
+    if raw or not (update_fields is None or set(update_fields) & set(fields)):
+        return
+    search.index_document(kind, instance.pk)
+
+
+@receiver(post_delete, sender=Discussion)
+@receiver(post_delete, sender=DiscussionReply)
+@receiver(post_delete, sender=AnnouncementBoard)
+@receiver(post_delete, sender=LearningResource)
+def unindex_content_for_search(sender, instance, **kwargs):
+    search.unindex_document(SEARCH_KINDS[sender], instance.pk)
+
+
+# =========================================================
+# DISCUSSION REPLY STATS
+# =========================================================
+
+@receiver(post_save, sender=DiscussionReply)
+def count_new_reply(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_reply(instance.discussion_id, instance.author_id, instance.created_at)
+
+
+@receiver(post_delete, sender=DiscussionReply)
+def uncount_deleted_reply(sender, instance, **kwargs):
+    forget_reply(instance.discussion_id)
@@ -1,3 +1,767 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .archive import archive_term, pack, unpack
+from .attendance import attendance_summary, mark_attendance_bulk, month_start, rebuild_rollups, recount_attendance
+from .models import (
+    Classroom, ClassMember, Attendance, AttendanceArchive, AttendanceDaily, AttendanceMonthly, ProgressTracking,
+    AnnouncementBoard, Discussion, DiscussionReply, LearningResource, ReplyLike,
+)
+from .hits import discussion_views, resource_downloads
+from .discussions import like_reply, liked_reply_ids, reconcile_discussions, unlike_reply
+from .downloads import Unsatisfiable, parse_range
+from .codes import CODE_SPACE, allocate_codes, encode, permute
+from .membership import reconcile_student_counts
+from .pagination import keyset_ordering, paginate
+from . import downloads, search
+from .permissions import access_key
+
+
+class ClassroomTestCase(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user("mcgonagall", password="Tabby-cat-1")
+        self.student = User.objects.create_user("neville", password="Trevor-toad-1")
+        self.classroom = Classroom.objects.create(
+            teacher=self.teacher, name="Transfiguration", code="TRANS1", subject="Transfiguration",
+        )
+        ClassMember.objects.create(classroom=self.classroom, student=self.student)
+
+    def stats(self, user=None):
+        user = user or self.student
+        return User.objects.get(pk=user.pk).gamification_stats
+
+
+class AttendanceCounterTests(ClassroomTestCase):
+    def test_counters_follow_inserts_status_changes_and_deletes(self):
+        day = datetime.date(2025, 9, 1)
+        att = Attendance.objects.create(classroom=self.classroom, student=self.student, date=day, status="present")
+        Attendance.objects.create(classroom=self.classroom, student=self.student, date=day + datetime.timedelta(days=1), status="absent")
+
+        stats = self.stats()
+        self.assertEqual((stats.attendance_present, stats.attendance_total, stats.attendance_rate), (1, 2, 50.0))
+
+        att = Attendance.objects.get(pk=att.pk)
+        att.status = "late"
+        att.save()
+        stats = self.stats()
+        self.assertEqual((stats.attendance_present, stats.attendance_total, stats.attendance_rate), (0, 2, 0.0))
+
+        att.delete()
+        stats = self.stats()
+        self.assertEqual((stats.attendance_present, stats.attendance_total), (0, 1))
+
+        progress = ProgressTracking.objects.get(classroom=self.classroom, student=self.student)
+        self.assertEqual((progress.attendance_count, progress.total_attendance), (0, 1))
+
+    def test_deleting_a_classroom_or_student_with_attendance(self):
+        day = datetime.date(2025, 9, 1)
+        other = Classroom.objects.create(teacher=self.teacher, name="Charms", code="CHARM1", subject="Charms")
+        ClassMember.objects.create(classroom=other, student=self.student)
+        Attendance.objects.create(classroom=self.classroom, student=self.student, date=day, status="present")
+        Attendance.objects.create(classroom=other, student=self.student, date=day, status="absent")
+
+        classroom_id, student_id = self.classroom.pk, self.student.pk
+        self.classroom.delete()
+        self.assertFalse(ProgressTracking.objects.filter(classroom_id=classroom_id).exists())
+        self.assertFalse(AttendanceDaily.objects.filter(classroom_id=classroom_id).exists())
+        self.assertFalse(AttendanceMonthly.objects.filter(classroom_id=classroom_id).exists())
+        stats = self.stats()
+        self.assertEqual((stats.attendance_present, stats.attendance_total), (0, 1))
+
+        self.student.delete()
+        self.assertFalse(ProgressTracking.objects.filter(student_id=student_id).exists())
+        self.assertFalse(AttendanceMonthly.objects.filter(student_id=student_id).exists())
+        daily = AttendanceDaily.objects.get(classroom=other, date=day)
+        self.assertEqual(daily.absent, 0)
+
+    def test_recalc_attendance_repairs_drift(self):
+        Attendance.objects.create(classroom=self.classroom, student=self.student, date=datetime.date(2025, 9, 1), status="present")
+        type(self.stats()).objects.filter(user=self.student).update(attendance_present=7, attendance_total=9)
+
+        stats = self.stats()
+        stats.recalc_attendance()
+        self.assertEqual((stats.attendance_present, stats.attendance_total, stats.attendance_rate), (1, 1, 100.0))
+
+
+class BulkAttendanceTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = [self.student] + [User.objects.create_user(f"student{i}") for i in range(9)]
+        ClassMember.objects.bulk_create(
+            [ClassMember(classroom=self.classroom, student=s) for s in self.students[1:]]
+        )
+        self.outsider = User.objects.create_user("malfoy")
+
+    def test_marks_a_class_in_constant_queries(self):
+        day = datetime.date(2025, 9, 1)
+        entries = [(self.classroom.id, s.id, day, "present") for s in self.students]
+
+        # roster, archived terms, existing rows, upsert, stats update, progress
+        # insert + update, daily + monthly rollups, rate refresh, in a savepoint
+        with self.assertNumQueries(12):
+            result = mark_attendance_bulk(entries, recorded_by=self.teacher)
+
+        self.assertEqual(result.marked, 10)
+        self.assertEqual(Attendance.objects.filter(classroom=self.classroom, date=day).count(), 10)
+        self.assertEqual(self.stats().attendance_rate, 100.0)
+
+    def test_remarking_changes_status_without_duplicating_rows(self):
+        day = datetime.date(2025, 9, 1)
+        mark_attendance_bulk([(self.classroom.id, self.student.id, day, "present")])
+        mark_attendance_bulk([(self.classroom.id, self.student.id, day.isoformat(), "absent")])
+
+        self.assertEqual(Attendance.objects.get(student=self.student, date=day).status, "absent")
+        stats = self.stats()
+        self.assertEqual((stats.attendance_present, stats.attendance_total), (0, 1))
+
+    def test_rejects_non_members_and_bad_statuses(self):
+        day = datetime.date(2025, 9, 1)
+        result = mark_attendance_bulk([
+            (self.classroom.id, self.outsider.id, day, "present"),
+            (self.classroom.id, self.student.id, day, "asleep"),
+            (self.classroom.id, self.student.id, day, "late"),
+        ])
+        self.assertEqual(result.marked, 1)
+        self.assertEqual(len(result.rejected), 2)
+        self.assertFalse(Attendance.objects.filter(student=self.outsider).exists())
+
+    def post_marks(self, marks):
+        self.client.force_login(self.teacher)
+        response = self.client.post(reverse("mark_attendance", args=[self.classroom.id]), {
+            "date": "2025-09-01", **{f"attendance_{user.id}": status for user, status in marks},
+        })
+        return [str(m) for m in get_messages(response.wsgi_request)]
+
+    def test_view_does_not_report_success_when_every_mark_is_rejected(self):
+        self.assertEqual(
+            self.post_marks([(self.outsider, "present")]),
+            ["1 attendance marks were skipped (not an active member)."],
+        )
+
+    def test_view_reports_success_and_the_skipped_marks(self):
+        self.assertEqual(
+            self.post_marks([(self.student, "present"), (self.outsider, "present")]),
+            ["Attendance updated.", "1 attendance marks were skipped (not an active member)."],
+        )
+
+class MarkedTermTestCase(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        # Every weekday from mid-January to mid-April: present, except Fridays.
+        day, self.days = datetime.date(2025, 1, 15), []
+        while day <= datetime.date(2025, 4, 15):
+            if day.weekday() < 5:
+                self.days.append(day)
+            day += datetime.timedelta(days=1)
+        mark_attendance_bulk(
+            (self.classroom.id, self.student.id, d, "absent" if d.weekday() == 4 else "present")
+            for d in self.days
+        )
+
+    def expected(self, start, end):
+        days = [d for d in self.days if start <= d <= end]
+        present = sum(1 for d in days if d.weekday() != 4)
+        return present, len(days)
+
+
+class AttendanceRollupTests(MarkedTermTestCase):
+    def test_ranges_match_raw_counts(self):
+        for start, end in [
+            (datetime.date(2025, 1, 1), datetime.date(2025, 12, 31)),
+            (datetime.date(2025, 1, 20), datetime.date(2025, 3, 31)),
+            (datetime.date(2025, 2, 1), datetime.date(2025, 2, 28)),
+            (datetime.date(2025, 2, 10), datetime.date(2025, 4, 2)),
+            (datetime.date(2025, 3, 3), datetime.date(2025, 3, 7)),
+        ]:
+            with self.subTest(start=start, end=end):
+                counts = attendance_summary(self.classroom.id, start, end)[self.student.id]
+                self.assertEqual((counts["present"], counts["total"]), self.expected(start, end))
+
+    def test_whole_months_are_read_from_rollups_only(self):
+        Attendance.objects.filter(date__month=2).delete()
+        AttendanceMonthly.objects.filter(month=datetime.date(2025, 2, 1)).update(present=99)
+        counts = attendance_summary(self.classroom.id, datetime.date(2025, 2, 1), datetime.date(2025, 2, 28))
+        self.assertEqual(counts[self.student.id]["present"], 99)
+
+    def test_single_writes_update_rollups(self):
+        day = self.days[0]
+        att = Attendance.objects.get(student=self.student, date=day)
+        att.status = "late"
+        att.save()
+        daily = AttendanceDaily.objects.get(classroom=self.classroom, date=day)
+        self.assertEqual((daily.present, daily.late), (0, 1))
+
+        att.delete()
+        daily.refresh_from_db()
+        self.assertEqual(daily.late, 0)
+        counts = attendance_summary(self.classroom.id)[self.student.id]
+        self.assertEqual(counts["total"], len(self.days) - 1)
+
+    def test_removals_never_create_rollup_rows(self):
+        day = self.days[0]
+        AttendanceDaily.objects.filter(classroom=self.classroom, date=day).delete()
+        AttendanceMonthly.objects.filter(classroom=self.classroom, month=month_start(day)).delete()
+
+        Attendance.objects.get(student=self.student, date=day).delete()
+        self.assertFalse(AttendanceDaily.objects.filter(classroom=self.classroom, date=day).exists())
+        self.assertFalse(AttendanceMonthly.objects.filter(classroom=self.classroom, month=month_start(day)).exists())
+
+    def test_rebuild_matches_maintained_rollups(self):
+        maintained = sorted(AttendanceMonthly.objects.values_list("month", "present", "absent"))
+        rebuild_rollups([self.classroom.id])
+        self.assertEqual(sorted(AttendanceMonthly.objects.values_list("month", "present", "absent")), maintained)
+
+    def test_report_view_filters_by_date(self):
+        self.client.force_login(self.teacher)
+        response = self.client.get(
+            reverse("attendance_report", args=[self.classroom.id]),
+            {"start": "2025-03-01", "end": "2025-03-31"},
+        )
+        row = response.context["report"][0]
+        self.assertEqual((row["present"], row["total"]), self.expected(datetime.date(2025, 3, 1), datetime.date(2025, 3, 31)))
+
+
+class AttendanceArchiveTests(MarkedTermTestCase):
+    term = (datetime.date(2025, 1, 1), datetime.date(2025, 3, 31))
+
+    def test_pack_round_trips_in_two_bits_per_day(self):
+        start, end = self.term
+        marks = {start: "present", start + datetime.timedelta(days=5): "excused", end: "late"}
+        statuses, recorded = pack(start, end, marks)
+        self.assertEqual(len(statuses), 23)  # 90 days, four to a byte
+        self.assertEqual(dict(unpack(start, end, statuses, recorded)), marks)
+
+    def test_archiving_is_invisible_to_readers(self):
+        ranges = [(None, None), (datetime.date(2025, 1, 20), datetime.date(2025, 4, 2))]
+        before = [attendance_summary(self.classroom.id, *r) for r in ranges]
+        stats = self.stats()
+
+        rows, archives = archive_term(*self.term)
+
+        self.assertEqual(archives, 1)
+        self.assertEqual(rows, sum(1 for d in self.days if d <= self.term[1]))
+        self.assertFalse(Attendance.objects.filter(date__lte=self.term[1]).exists())
+        self.assertEqual([attendance_summary(self.classroom.id, *r) for r in ranges], before)
+        self.assertEqual(self.stats().attendance_total, stats.attendance_total)
+
+        recount_attendance([self.student.id])
+        self.assertEqual(self.stats().attendance_present, stats.attendance_present)
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("student_attendance"))
+        self.assertEqual(len(response.context["attendance_records"]), len(self.days))
+
+    def test_archived_days_cannot_be_remarked(self):
+        archive_term(*self.term)
+        result = mark_attendance_bulk([(self.classroom.id, self.student.id, self.days[0], "absent")])
+        self.assertEqual(result.rejected[0][1], "term is archived")
+
+    def test_live_marks_on_archived_days_are_refused(self):
+        archive_term(*self.term)
+        with self.assertRaises(ValidationError):
+            Attendance.objects.create(classroom=self.classroom, student=self.student, date=self.days[0], status="late")
+        with self.assertRaises(ValidationError):
+            Attendance(classroom=self.classroom, student=self.student, date=self.days[0], status="late").full_clean()
+
+        counts = attendance_summary(self.classroom.id, *self.term)[self.student.id]
+        self.assertEqual((counts["present"], counts["total"]), self.expected(*self.term))
+
+    def test_rearchiving_merges_and_overlaps_are_refused(self):
+        archive_term(*self.term)
+        Attendance.objects.create(
+            classroom=self.classroom, student=self.student, date=datetime.date(2025, 1, 4), status="late",
+        )
+        archive_term(*self.term)
+        archive = AttendanceArchive.objects.get()
+        self.assertEqual(archive.late, 1)
+
+        with self.assertRaises(ValueError):
+            archive_term(datetime.date(2025, 3, 1), datetime.date(2025, 4, 30))
+
+
+class ClassroomDetailFragmentTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for i in range(3):
+            student = User.objects.create_user(f"student{i}")
+            ClassMember.objects.create(classroom=self.classroom, student=student)
+            AnnouncementBoard.objects.create(classroom=self.classroom, teacher=self.teacher, title=f"Notice {i}", content="...")
+            discussion = Discussion.objects.create(classroom=self.classroom, author=student, title=f"Topic {i}", content="...")
+            DiscussionReply.objects.create(discussion=discussion, author=self.student, content="...")
+            LearningResource.objects.create(
+                classroom=self.classroom, uploaded_by=self.teacher, title=f"Notes {i}", resource_type="link",
+                url="https://example.com/",
+            )
+        self.client.force_login(self.student)
+        self.url = reverse("classroom_detail", args=[self.classroom.id])
+
+    def test_panels_are_served_from_cache(self):
+        # session, user, role + taught + joined classrooms, classroom, one query per panel
+        with self.assertNumQueries(10):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Topic 2")
+        self.assertContains(response, "1 reply")
+
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    def test_writes_bump_only_their_panel(self):
+        self.client.get(self.url)
+        AnnouncementBoard.objects.create(classroom=self.classroom, teacher=self.teacher, title="Quidditch", content="...")
+
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Quidditch")
+
+        discussion = Discussion.objects.first()
+        DiscussionReply.objects.create(discussion=discussion, author=self.student, content="...")
+        self.assertContains(self.client.get(self.url), "2 replies")
+
+
+class ClassroomPermissionTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.outsider = User.objects.create_user("malfoy")
+
+    def test_teacher_only_views_refuse_members(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("edit_classroom", args=[self.classroom.id]))
+        self.assertRedirects(response, reverse("classroom_detail", args=[self.classroom.id]))
+
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(reverse("edit_classroom", args=[self.classroom.id])).status_code, 200)
+
+    def test_access_is_cached_and_dropped_on_membership_changes(self):
+        self.client.force_login(self.outsider)
+        url = reverse("classroom_detail", args=[self.classroom.id])
+        self.assertRedirects(self.client.get(url), reverse("classroom_list"), fetch_redirect_response=False)
+        self.assertIsNotNone(cache.get(access_key(self.outsider.pk)))
+
+        ClassMember.objects.create(classroom=self.classroom, student=self.outsider)
+        self.assertIsNone(cache.get(access_key(self.outsider.pk)))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_new_classroom_is_visible_to_its_teacher(self):
+        self.client.force_login(self.teacher)
+        self.client.get(reverse("classroom_detail", args=[self.classroom.id]))
+
+        potions = Classroom.objects.create(teacher=self.teacher, name="Potions", code="POTS01", subject="Potions")
+        self.assertEqual(self.client.get(reverse("edit_classroom", args=[potions.id])).status_code, 200)
+
+
+class StudentCountTests(ClassroomTestCase):
+    def count(self):
+        self.classroom.refresh_from_db(fields=["student_count"])
+        return self.classroom.student_count
+
+    def test_counter_follows_membership_status(self):
+        self.assertEqual(self.count(), 1)
+
+        member = ClassMember.objects.get(classroom=self.classroom, student=self.student)
+        member.status = "suspended"
+        member.save()
+        self.assertEqual(self.count(), 0)
+
+        member.status = "active"
+        member.save()
+        self.assertEqual(self.count(), 1)
+
+        member.delete()
+        self.assertEqual(self.count(), 0)
+
+    def test_join_refuses_students_past_capacity(self):
+        Classroom.objects.filter(pk=self.classroom.pk).update(max_students=2)
+        url = reverse("join_classroom")
+
+        for name in ("luna", "ginny"):
+            self.client.force_login(User.objects.create_user(name))
+            self.client.post(url, {"code": "trans1"})
+
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(self.classroom.members.count(), 2)
+        self.assertFalse(ClassMember.objects.filter(student__username="ginny").exists())
+
+    def test_plain_save_does_not_overwrite_counter(self):
+        stale = Classroom.objects.get(pk=self.classroom.pk)
+        ClassMember.objects.create(classroom=self.classroom, student=User.objects.create_user("dean"))
+        stale.name = "Advanced Transfiguration"
+        stale.save()
+        self.assertEqual(self.count(), 2)
+
+    def test_reconcile_repairs_drift(self):
+        Classroom.objects.filter(pk=self.classroom.pk).update(student_count=7)
+        self.assertEqual(reconcile_student_counts(), 1)
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(reconcile_student_counts(), 0)
+
+
+class ClassroomCodeTests(ClassroomTestCase):
+    def test_permutation_is_collision_free(self):
+        values = [permute(n) for n in range(5000)] + [permute(CODE_SPACE - 1 - n) for n in range(5000)]
+        self.assertEqual(len(set(values)), len(values))
+        self.assertTrue(all(0 <= v < CODE_SPACE for v in values))
+
+    def test_classrooms_get_normalized_unique_codes(self):
+        made = [
+            Classroom.objects.create(teacher=self.teacher, name=f"Charms {i}", subject="Charms")
+            for i in range(20)
+        ]
+        codes = {c.code for c in made}
+        self.assertEqual(len(codes), 20)
+        self.assertTrue(all(len(c) == 6 and c == c.upper() for c in codes))
+
+        lower = Classroom.objects.create(teacher=self.teacher, name="Herbology", code=" herb01 ", subject="Herbology")
+        self.assertEqual(lower.code, "HERB01")
+
+    def test_codes_already_in_use_are_skipped(self):
+        legacy = encode(permute(0))
+        Classroom.objects.create(teacher=self.teacher, name="Old", code=legacy, subject="Astronomy")
+
+        codes = allocate_codes(3)
+        self.assertEqual(len(set(codes)), 3)
+        self.assertNotIn(legacy, codes)
+
+
+class HitCounterTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        for counter in (discussion_views, resource_downloads):
+            counter.flush()
+            patcher = mock.patch.object(counter, "flush_interval", 3600)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+            self.addCleanup(counter.flush)
+        self.discussion = Discussion.objects.create(classroom=self.classroom, author=self.student, title="Boggarts", content="...")
+        self.client.force_login(self.student)
+
+    def test_views_are_counted_in_one_update_without_touching_updated_at(self):
+        url = reverse("discussion_detail", args=[self.classroom.id, self.discussion.id])
+        for _ in range(3):
+            self.client.get(url)
+        self.assertEqual(Discussion.objects.get(pk=self.discussion.pk).views_count, 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(discussion_views.flush(), 3)
+
+        discussion = Discussion.objects.get(pk=self.discussion.pk)
+        self.assertEqual(discussion.views_count, 3)
+        self.assertEqual(discussion.updated_at, self.discussion.updated_at)
+
+    def test_opening_a_resource_counts_a_download(self):
+        resource = LearningResource.objects.create(
+            classroom=self.classroom, uploaded_by=self.teacher, title="Syllabus", resource_type="link",
+            url="https://example.com/syllabus",
+        )
+        response = self.client.get(reverse("open_resource", args=[self.classroom.id, resource.id]))
+        self.assertRedirects(response, "https://example.com/syllabus", fetch_redirect_response=False)
+
+        resource_downloads.flush()
+        self.assertEqual(LearningResource.objects.get(pk=resource.pk).downloads, 1)
+
+    def test_plain_save_does_not_overwrite_flushed_hits(self):
+        resource = LearningResource.objects.create(
+            classroom=self.classroom, uploaded_by=self.teacher, title="Syllabus", resource_type="link",
+            url="https://example.com/syllabus",
+        )
+        resource_downloads.hit(resource.pk)
+        resource_downloads.flush()
+
+        resource.title = "Syllabus 2025"
+        resource.save()
+        resource = LearningResource.objects.get(pk=resource.pk)
+        self.assertEqual((resource.title, resource.downloads), ("Syllabus 2025", 1))
+
+
+class KeysetPaginationTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.discussions = [
+            Discussion.objects.create(
+                classroom=self.classroom, author=self.student, title=f"Topic {i}", content="...", is_pinned=i % 7 == 0,
+            )
+            for i in range(25)
+        ]
+
+    def test_pages_walk_the_model_ordering_without_gaps(self):
+        expected = list(self.classroom.discussions.order_by(*keyset_ordering(Discussion)))
+
+        seen, cursor = [], None
+        while True:
+            page = paginate(self.classroom.discussions.all(), cursor, per_page=10)
+            seen.extend(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(seen[0].is_pinned, True)
+
+    def test_later_pages_cost_one_query(self):
+        first = paginate(self.classroom.discussions.all(), per_page=5)
+        with self.assertNumQueries(1):
+            paginate(self.classroom.discussions.all(), first.next_cursor, per_page=5)
+
+    def test_reply_cursor_in_json_and_tampered_cursors_404(self):
+        discussion = self.discussions[0]
+        for i in range(25):
+            DiscussionReply.objects.create(discussion=discussion, author=self.student, content=f"Reply {i}")
+
+        self.client.force_login(self.student)
+        url = reverse("discussion_detail", args=[self.classroom.id, discussion.id])
+        data = self.client.get(url, headers={"X-Requested-With": "XMLHttpRequest"}).json()
+        self.assertEqual(len(data["replies"]), 20)
+
+        rest = self.client.get(url, {"cursor": data["next_cursor"]}, headers={"X-Requested-With": "XMLHttpRequest"}).json()
+        self.assertEqual(len(rest["replies"]), 5)
+        self.assertIsNone(rest["next_cursor"])
+        self.assertFalse({r["id"] for r in data["replies"]} & {r["id"] for r in rest["replies"]})
+
+        self.assertEqual(self.client.get(url, {"cursor": data["next_cursor"] + "x"}).status_code, 404)
+
+
+class ContentSearchTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.discussion = Discussion.objects.create(
+            classroom=self.classroom, author=self.student, title="Boggart homework", content="Riddikulus practice",
+        )
+        DiscussionReply.objects.create(discussion=self.discussion, author=self.teacher, content="Think of something <funny>")
+        AnnouncementBoard.objects.create(classroom=self.classroom, teacher=self.teacher, title="Exams", content="Boggart test on Friday")
+
+        other = Classroom.objects.create(teacher=User.objects.create_user("snape"), name="Potions", code="POTS01", subject="Potions")
+        Discussion.objects.create(classroom=other, author=other.teacher, title="Boggart antidote", content="...")
+
+    def test_results_are_scoped_to_the_searchers_classrooms(self):
+        hits = search.search_content("boggart", [self.classroom.id])
+        self.assertEqual({(h.kind, h.classroom_id) for h in hits}, {("discussion", self.classroom.id), ("announcement", self.classroom.id)})
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("search_content"), {"q": "boggart"}, headers={"X-Requested-With": "XMLHttpRequest"})
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_replies_carry_their_discussion_and_escaped_snippets(self):
+        [hit] = search.search_content("funny", [self.classroom.id])
+        self.assertEqual((hit.kind, hit.discussion_id, hit.title), ("reply", self.discussion.id, "Boggart homework"))
+        self.assertNotIn("<funny>", hit.snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.discussion.title = "Dementor homework"
+        self.discussion.save()
+        self.assertEqual([h.kind for h in search.search_content("dementor", [self.classroom.id])], ["discussion"])
+
+        self.discussion.delete()
+        self.assertEqual(search.search_content("dementor", [self.classroom.id]), [])
+        self.assertEqual(search.search_content("funny", [self.classroom.id]), [])
+
+
+class DiscussionReplyStatsTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        self.discussion = Discussion.objects.create(classroom=self.classroom, author=self.student, title="Animagi", content="...")
+
+    def fresh(self):
+        return Discussion.objects.get(pk=self.discussion.pk)
+
+    def test_replies_maintain_count_and_last_reply(self):
+        first = DiscussionReply.objects.create(discussion=self.discussion, author=self.student, content="...")
+        last = DiscussionReply.objects.create(discussion=self.discussion, author=self.teacher, content="...")
+
+        discussion = self.fresh()
+        self.assertEqual(discussion.reply_count, 2)
+        self.assertEqual((discussion.last_reply_at, discussion.last_reply_author_id), (last.created_at, self.teacher.id))
+        self.assertEqual(discussion.last_activity_at, last.created_at)
+
+        last.delete()
+        discussion = self.fresh()
+        self.assertEqual(discussion.reply_count, 1)
+        self.assertEqual((discussion.last_reply_at, discussion.last_reply_author_id), (first.created_at, self.student.id))
+
+        first.delete()
+        discussion = self.fresh()
+        self.assertEqual((discussion.reply_count, discussion.last_reply_at), (0, None))
+        self.assertEqual(discussion.last_activity_at, discussion.created_at)
+
+    def test_plain_save_keeps_counters_and_reconcile_repairs_drift(self):
+        stale = self.fresh()
+        DiscussionReply.objects.create(discussion=self.discussion, author=self.teacher, content="...")
+        stale.title = "Animagi registry"
+        stale.save()
+        self.assertEqual(self.fresh().reply_count, 1)
+
+        Discussion.objects.filter(pk=self.discussion.pk).update(reply_count=9, last_reply_at=None)
+        reconcile_discussions()
+        discussion = self.fresh()
+        self.assertEqual(discussion.reply_count, 1)
+        self.assertEqual(discussion.last_reply_author_id, self.teacher.id)
+
+    def test_activity_sort_puts_recent_replies_first(self):
+        newer = Discussion.objects.create(classroom=self.classroom, author=self.student, title="Patronus", content="...")
+        DiscussionReply.objects.create(discussion=self.discussion, author=self.teacher, content="...")
+
+        self.client.force_login(self.student)
+        url = reverse("discussion_list", args=[self.classroom.id])
+        xhr = {"X-Requested-With": "XMLHttpRequest"}
+        self.assertEqual([d["id"] for d in self.client.get(url, headers=xhr).json()["discussions"]], [newer.id, self.discussion.id])
+        self.assertEqual(
+            [d["id"] for d in self.client.get(url, {"sort": "activity"}, headers=xhr).json()["discussions"]],
+            [self.discussion.id, newer.id],
+        )
+
+
+class ReplyLikeTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        discussion = Discussion.objects.create(classroom=self.classroom, author=self.student, title="Mandrakes", content="...")
+        self.replies = [
+            DiscussionReply.objects.create(discussion=discussion, author=self.teacher, content=f"Earmuffs {i}")
+            for i in range(3)
+        ]
+        self.reply = self.replies[0]
+
+    def likes(self):
+        return DiscussionReply.objects.get(pk=self.reply.pk).likes
+
+    def test_likes_are_deduplicated(self):
+        self.assertTrue(like_reply(self.reply.id, self.student.id))
+        self.assertFalse(like_reply(self.reply.id, self.student.id))
+        self.assertEqual(self.likes(), 1)
+        self.assertEqual(ReplyLike.objects.count(), 1)
+
+        self.assertTrue(unlike_reply(self.reply.id, self.student.id))
+        self.assertFalse(unlike_reply(self.reply.id, self.student.id))
+        self.assertEqual(self.likes(), 0)
+
+    def test_liked_set_for_a_page_is_one_query(self):
+        like_reply(self.replies[0].id, self.student.id)
+        like_reply(self.replies[2].id, self.student.id)
+        like_reply(self.replies[1].id, self.teacher.id)
+
+        with self.assertNumQueries(1):
+            liked = liked_reply_ids(self.student.id, self.replies)
+        self.assertEqual(liked, {self.replies[0].id, self.replies[2].id})
+
+    def test_like_endpoint_is_idempotent(self):
+        self.client.force_login(self.student)
+        args = [self.classroom.id, self.reply.discussion_id, self.reply.id]
+        xhr = {"X-Requested-With": "XMLHttpRequest"}
+
+        for _ in range(2):
+            data = self.client.post(reverse("like_reply", args=args), headers=xhr).json()
+        self.assertEqual((data["liked"], data["likes"]), (True, 1))
+
+        data = self.client.post(reverse("unlike_reply", args=args), headers=xhr).json()
+        self.assertEqual((data["liked"], data["likes"]), (False, 0))
+        self.assertEqual(self.client.get(reverse("like_reply", args=args)).status_code, 405)
+
+
+class ResourceDownloadTests(ClassroomTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        resource_downloads.flush()
+        patcher = mock.patch.object(resource_downloads, "flush_interval", 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(resource_downloads.flush)
+
+        self.resource = LearningResource.objects.create(
+            classroom=self.classroom, uploaded_by=self.teacher, title="Spell list", resource_type="file",
+            file=SimpleUploadedFile("spells.txt", b"0123456789"),
+        )
+        self.url = reverse("download_resource", args=[self.classroom.id, self.resource.id])
+        self.client.force_login(self.student)
+
+    def downloads(self):
+        resource_downloads.flush()
+        return LearningResource.objects.get(pk=self.resource.pk).downloads
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=2-5", 10), (2, 5))
+        self.assertEqual(parse_range("bytes=7-", 10), (7, 9))
+        self.assertEqual(parse_range("bytes=-3", 10), (7, 9))
+        self.assertEqual(parse_range("bytes=4-99", 10), (4, 9))
+        self.assertIsNone(parse_range(None, 10))
+        self.assertIsNone(parse_range("bytes=0-1,4-5", 10))
+        self.assertIsNone(parse_range("items=0-1", 10))
+        with self.assertRaises(Unsatisfiable):
+            parse_range("bytes=10-", 10)
+
+    def test_full_download_streams_the_file_and_counts_once(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertEqual(self.downloads(), 1)
+
+    def test_range_request_resumes_without_counting(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=2-5"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(self.downloads(), 0)
+
+    def test_stale_if_range_sends_the_whole_file(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=2-5", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=20-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+        self.assertEqual(self.downloads(), 0)
+
+    def test_revalidation_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.downloads(), 1)
+
+    def test_sendfile_hands_off_to_the_front_server(self):
+        with mock.patch.object(downloads, "SENDFILE", "x-accel-redirect"):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected/" + self.resource.file.name)
+        self.assertEqual(self.downloads(), 1)
+
+    def test_sendfile_quotes_awkward_file_names(self):
+        self.resource.file.name = default_storage.save("resources/Potions 100% #2?ñ.txt", ContentFile(b"x"))
+        self.resource.save()
+        with mock.patch.object(downloads, "SENDFILE", "x-accel-redirect"):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/protected/resources/Potions%20100%25%20%232%3F%C3%B1.txt",
+        )
+
+    def test_non_members_cannot_download(self):
+        outsider = User.objects.create_user("draco")
+        self.client.force_login(outsider)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.downloads(), 0)
+
+    def test_opening_a_file_resource_goes_through_the_download(self):
+        response = self.client.get(reverse("open_resource", args=[self.classroom.id, self.resource.id]))
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(self.downloads(), 0)
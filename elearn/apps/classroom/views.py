@@ -1,27 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models import Q, Count, Avg
-import random
-import string
+import datetime
 
 from .models import (
     Classroom, ClassMember, Attendance, Discussion, DiscussionReply,
     AnnouncementBoard, LearningResource, ProgressTracking
 )
+from . import membership
+from .archive import archived_records
+from .codes import normalize_code
+from .hits import discussion_views, resource_downloads
+from .pagination import PER_PAGE, paginate
+from . import discussions, downloads, search
+from .discussions import liked_reply_ids
+from .fragments import FRAGMENT_TTL, section_versions
+from .permissions import access_for, classroom_access_required
+from .attendance import STATUSES, attendance_summary, daily_totals, mark_attendance_bulk
 
 # ---------------------------------------------------------
 # UTILS
 # ---------------------------------------------------------
 
-def generate_code(length=6):
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
-
-
-def user_is_teacher(user):
-    return hasattr(user, "profile") and user.profile.role == "teacher"
+def user_is_teacher(request):
+    return access_for(request).is_teacher
 
 
 # ---------------------------------------------------------
@@ -30,7 +36,7 @@ def user_is_teacher(user):
 
 @login_required
 def create_classroom(request):
-    if not user_is_teacher(request.user):
+    if not user_is_teacher(request):
         messages.error(request, "Only teachers can create classrooms.")
         return redirect("classroom_list")
 
@@ -51,7 +57,6 @@ def create_classroom(request):
             room_number=request.POST.get('room_number'),
             schedule=request.POST.get('schedule'),
             max_students=int(request.POST.get('max_students', 50)),
-            code=generate_code(),
         )
 
         if 'banner_image' in request.FILES:
@@ -66,46 +71,40 @@ def create_classroom(request):
 
 @login_required
 def classroom_list(request):
-    if user_is_teacher(request.user):
+    if user_is_teacher(request):
         classrooms = request.user.classrooms_taught.filter(status="active")
     else:
-        classrooms = request.user.enrolled_classrooms.filter(status="active")
+        classrooms = Classroom.objects.filter(
+            status="active", members__student=request.user, members__status="active",
+        )
 
-    return render(request, "classroom/classroom_list.html", {"classrooms": classrooms})
+    page = paginate(classrooms, request.GET.get("cursor"))
+    return render(request, "classroom/classroom_list.html", {"classrooms": page, "page": page})
 
 
-@login_required
+@classroom_access_required("member", "You are not part of this classroom.", redirect_to="classroom_list")
 def classroom_detail(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
-    user = request.user
-
-    is_teacher = classroom.teacher == user
-    is_member = ClassMember.objects.filter(classroom=classroom, student=user).exists()
-
-    if not (is_teacher or is_member):
-        messages.error(request, "You are not part of this classroom.")
-        return redirect("classroom_list")
 
+    # The querysets are lazy: a panel whose fragment is cached never runs its query.
     context = {
         "classroom": classroom,
-        "is_teacher": is_teacher,
-        "announcements": classroom.announcements.all()[:5],
-        "discussions": classroom.discussions.all()[:5],
-        "resources": classroom.resources.all(),
-        "members": classroom.members.filter(status="active"),
+        "is_teacher": access_for(request).teaches(classroom.id),
+        "versions": section_versions(classroom.id),
+        "fragment_ttl": FRAGMENT_TTL,
+        "announcements": classroom.announcements.select_related("teacher")[:5],
+        "discussions": classroom.discussions.select_related("author")[:5],
+        "resources": classroom.resources.select_related("uploaded_by")[:PER_PAGE],
+        "members": classroom.members.filter(status="active").select_related("student"),
     }
 
     return render(request, "classroom/classroom_detail.html", context)
 
 
-@login_required
+@classroom_access_required("teacher", "Only the teacher can edit this classroom.")
 def edit_classroom(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user:
-        messages.error(request, "Only the teacher can edit this classroom.")
-        return redirect("classroom_detail", classroom_id=classroom_id)
-
     if request.method == "POST":
         fields = ["name", "description", "subject", "grade_level", "room_number", "schedule"]
         for f in fields:
@@ -125,14 +124,10 @@ def edit_classroom(request, classroom_id):
     return render(request, "classroom/edit_classroom.html", {"classroom": classroom})
 
 
-@login_required
+@classroom_access_required("teacher", "Only the teacher can delete this classroom.")
 def delete_classroom(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user:
-        messages.error(request, "Only the teacher can delete this classroom.")
-        return redirect("classroom_detail", classroom_id=classroom_id)
-
     if request.method == "POST":
         classroom.delete()
         messages.success(request, "Classroom deleted.")
@@ -148,7 +143,7 @@ def delete_classroom(request, classroom_id):
 @login_required
 def join_classroom(request):
     if request.method == "POST":
-        code = request.POST.get("code", "").upper().strip()
+        code = normalize_code(request.POST.get("code"))
 
         try:
             classroom = Classroom.objects.get(code=code)
@@ -156,16 +151,12 @@ def join_classroom(request):
             messages.error(request, "Invalid classroom code.")
             return redirect("join_classroom")
 
-        if classroom.is_full():
+        try:
+            membership.join(classroom, request.user)
+        except membership.ClassroomFull:
             messages.error(request, "Classroom is full.")
             return redirect("join_classroom")
 
-        ClassMember.objects.get_or_create(
-            classroom=classroom,
-            student=request.user,
-            defaults={"role": "student"}
-        )
-
         ProgressTracking.objects.get_or_create(
             student=request.user,
             classroom=classroom
@@ -177,14 +168,10 @@ def join_classroom(request):
     return render(request, "classroom/join_classroom.html")
 
 
-@login_required
+@classroom_access_required("member", "Not allowed to view members.", redirect_to="classroom_list")
 def classroom_members(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user and not ClassMember.objects.filter(student=request.user, classroom=classroom).exists():
-        messages.error(request, "Not allowed to view members.")
-        return redirect("classroom_list")
-
     members = classroom.members.filter(status="active")
     return render(request, "classroom/classroom_members.html", {
         "classroom": classroom,
@@ -192,14 +179,10 @@ def classroom_members(request, classroom_id):
     })
 
 
-@login_required
+@classroom_access_required("teacher", "Only the teacher can remove members.", redirect_to="classroom_members")
 def remove_member(request, classroom_id, member_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user:
-        messages.error(request, "Only the teacher can remove members.")
-        return redirect("classroom_members", classroom_id=classroom_id)
-
     member = get_object_or_404(ClassMember, id=member_id, classroom=classroom)
     member.status = "dropped"
     member.save()
@@ -212,35 +195,29 @@ def remove_member(request, classroom_id, member_id):
 # ATTENDANCE
 # ---------------------------------------------------------
 
-@login_required
+@classroom_access_required("teacher", "Only teachers can mark attendance.")
 def mark_attendance(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user:
-        messages.error(request, "Only teachers can mark attendance.")
-        return redirect("classroom_detail", classroom_id=classroom_id)
-
     if request.method == "POST":
         date = request.POST.get("date")
 
-        for key, value in request.POST.items():
-            if key.startswith("attendance_"):
-                student_id = key.split("_")[1]
-                student = User.objects.get(id=student_id)
-
-                att, created = Attendance.objects.get_or_create(
-                    classroom=classroom,
-                    student=student,
-                    date=date,
-                    defaults={"status": value, "recorded_by": request.user}
-                )
-
-                if not created:
-                    att.status = value
-                    att.recorded_by = request.user
-                    att.save()
+        result = mark_attendance_bulk(
+            (
+                (classroom.id, key.split("_")[1], date, value)
+                for key, value in request.POST.items()
+                if key.startswith("attendance_")
+            ),
+            recorded_by=request.user,
+        )
 
-        messages.success(request, "Attendance updated.")
+        if result.marked:
+            messages.success(request, "Attendance updated.")
+        if result.rejected:
+            reasons = ", ".join(sorted({reason for _, reason in result.rejected}))
+            messages.warning(request, f"{len(result.rejected)} attendance marks were skipped ({reasons}).")
+        elif not result.marked:
+            messages.warning(request, "No attendance marks were submitted.")
         return redirect("classroom_detail", classroom_id=classroom_id)
 
     return render(request, "classroom/mark_attendance.html", {
@@ -250,23 +227,46 @@ def mark_attendance(request, classroom_id):
     })
 
 
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
 @login_required
 def attendance_report(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    records = Attendance.objects.filter(classroom=classroom).values(
-        "student__username"
-    ).annotate(
-        present=Count("id", filter=Q(status="present")),
-        absent=Count("id", filter=Q(status="absent")),
-        late=Count("id", filter=Q(status="late")),
-        excused=Count("id", filter=Q(status="excused")),
-        total=Count("id"),
-    )
+    start = _parse_date(request.GET.get("start"))
+    end = _parse_date(request.GET.get("end"))
+    if start and end and start > end:
+        start, end = end, start
+
+    summary = attendance_summary(classroom.id, start, end)
+    students = User.objects.in_bulk(summary.keys())
+
+    report = []
+    for student_id, counts in summary.items():
+        if student_id not in students or not counts["total"]:
+            continue
+        report.append({
+            "student": students[student_id],
+            **counts,
+            "percent": round(counts["present"] / counts["total"] * 100, 1),
+        })
+    report.sort(key=lambda r: r["student"].username)
+
+    days = list(daily_totals(classroom.id, start, end))
+    class_totals = {status: sum(d[status] for d in days) for status in STATUSES}
 
     return render(request, "classroom/attendance_report.html", {
         "classroom": classroom,
-        "records": records,
+        "report": report,
+        "start": start,
+        "end": end,
+        "days_recorded": sum(1 for d in days if any(d[s] for s in STATUSES)),
+        "class_totals": class_totals,
     })
 
 
@@ -274,6 +274,42 @@ def attendance_report(request, classroom_id):
 # DISCUSSIONS
 # ---------------------------------------------------------
 
+@classroom_access_required("member", "You are not part of this classroom.", redirect_to="classroom_list")
+def discussion_list(request, classroom_id):
+    classroom = get_object_or_404(Classroom, id=classroom_id)
+
+    # "?sort=activity" lists by latest reply, newest discussions first otherwise.
+    sort = "activity" if request.GET.get("sort") == "activity" else None
+    page = paginate(
+        classroom.discussions.select_related("author", "last_reply_author"),
+        request.GET.get("cursor"),
+        ordering=Discussion.ACTIVITY_ORDERING if sort else None,
+    )
+
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse({
+            "discussions": [{
+                "id": d.id,
+                "title": d.title,
+                "author": d.author.username,
+                "topic": d.topic,
+                "is_pinned": d.is_pinned,
+                "reply_count": d.reply_count,
+                "last_reply_at": d.last_reply_at,
+                "last_reply_author": d.last_reply_author.username if d.last_reply_author else None,
+                "created_at": d.created_at,
+            } for d in page],
+            "next_cursor": page.next_cursor,
+        })
+
+    return render(request, "classroom/discussion_list.html", {
+        "classroom": classroom,
+        "discussions": page,
+        "page": page,
+        "sort": sort,
+    })
+
+
 @login_required
 def create_discussion(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
@@ -297,16 +333,55 @@ def create_discussion(request, classroom_id):
 def discussion_detail(request, classroom_id, discussion_id):
     discussion = get_object_or_404(Discussion, id=discussion_id, classroom_id=classroom_id)
 
-    discussion.views_count += 1
-    discussion.save()
+    page = paginate(discussion.replies.select_related("author"), request.GET.get("cursor"))
+    liked = liked_reply_ids(request.user.id, page)
+
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse({
+            "replies": [{
+                "id": r.id,
+                "author": r.author.username,
+                "content": r.content,
+                "is_answer": r.is_answer,
+                "likes": r.likes,
+                "liked": r.id in liked,
+                "created_at": r.created_at,
+            } for r in page],
+            "next_cursor": page.next_cursor,
+        })
+
+    discussion_views.hit(discussion.pk)
 
     return render(request, "classroom/discussion_detail.html", {
         "classroom_id": classroom_id,
         "discussion": discussion,
-        "replies": discussion.replies.all()
+        "replies": page,
+        "page": page,
+        "liked": liked,
     })
 
 
+@classroom_access_required("member", "You are not part of this classroom.", redirect_to="classroom_list")
+def like_reply(request, classroom_id, discussion_id, reply_id, action):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    reply = get_object_or_404(
+        DiscussionReply, id=reply_id, discussion_id=discussion_id, discussion__classroom_id=classroom_id,
+    )
+
+    if action == "like":
+        discussions.like_reply(reply.id, request.user.id)
+    else:
+        discussions.unlike_reply(reply.id, request.user.id)
+
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        likes = DiscussionReply.objects.values_list("likes", flat=True).get(pk=reply.id)
+        return JsonResponse({"id": reply.id, "liked": action == "like", "likes": likes})
+
+    return redirect("discussion_detail", classroom_id=classroom_id, discussion_id=discussion_id)
+
+
 @login_required
 def reply_discussion(request, classroom_id, discussion_id):
     discussion = get_object_or_404(Discussion, id=discussion_id, classroom_id=classroom_id)
@@ -328,14 +403,10 @@ def reply_discussion(request, classroom_id, discussion_id):
 # ANNOUNCEMENTS
 # ---------------------------------------------------------
 
-@login_required
+@classroom_access_required("teacher", "Only teachers can make announcements.")
 def create_announcement(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user:
-        messages.error(request, "Only teachers can make announcements.")
-        return redirect("classroom_detail", classroom_id=classroom_id)
-
     if request.method == "POST":
         AnnouncementBoard.objects.create(
             classroom=classroom,
@@ -355,14 +426,10 @@ def create_announcement(request, classroom_id):
 # LEARNING RESOURCES
 # ---------------------------------------------------------
 
-@login_required
+@classroom_access_required("teacher", "Not allowed.")
 def upload_resource(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user:
-        messages.error(request, "Not allowed.")
-        return redirect("classroom_detail", classroom_id=classroom_id)
-
     if request.method == "POST":
         resource = LearningResource.objects.create(
             classroom=classroom,
@@ -383,18 +450,89 @@ def upload_resource(request, classroom_id):
     return render(request, "classroom/upload_resource.html", {"classroom": classroom})
 
 
+@classroom_access_required("member", "You are not part of this classroom.", redirect_to="classroom_list")
+def resource_list(request, classroom_id):
+    classroom = get_object_or_404(Classroom, id=classroom_id)
+
+    page = paginate(classroom.resources.select_related("uploaded_by"), request.GET.get("cursor"))
+
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse({
+            "resources": [{
+                "id": r.id,
+                "title": r.title,
+                "resource_type": r.resource_type,
+                "uploaded_by": r.uploaded_by.username,
+                "downloads": r.downloads,
+                "created_at": r.created_at,
+            } for r in page],
+            "next_cursor": page.next_cursor,
+        })
+
+    return render(request, "classroom/resource_list.html", {
+        "classroom": classroom,
+        "resources": page,
+        "page": page,
+    })
+
+
+@classroom_access_required("member", "You are not part of this classroom.", redirect_to="classroom_list")
+def open_resource(request, classroom_id, resource_id):
+    resource = get_object_or_404(LearningResource, id=resource_id, classroom_id=classroom_id)
+
+    if resource.file:
+        return redirect("download_resource", classroom_id=classroom_id, resource_id=resource.id)
+    if not resource.url:
+        raise Http404("This resource has nothing to open.")
+
+    resource_downloads.hit(resource.pk)
+    return redirect(resource.url)
+
+
+@classroom_access_required("member", "You are not part of this classroom.", redirect_to="classroom_list")
+def download_resource(request, classroom_id, resource_id):
+    resource = get_object_or_404(LearningResource, id=resource_id, classroom_id=classroom_id)
+
+    if not resource.file or not resource.file.storage.exists(resource.file.name):
+        raise Http404("This resource has no file.")
+
+    response, started = downloads.serve(request, resource.file)
+    # Resumed ranges and revalidations are not new downloads.
+    if started:
+        resource_downloads.hit(resource.pk)
+    return response
+
+
 # ---------------------------------------------------------
-# PROGRESS
+# SEARCH
 # ---------------------------------------------------------
 
 @login_required
+def search_content(request):
+    query = request.GET.get("q", "")
+    access = access_for(request)
+    classroom_ids = access.teaching | access.member
+
+    scope = request.GET.get("classroom")
+    if scope and scope.isdigit():
+        classroom_ids = classroom_ids & {int(scope)}
+
+    hits = search.search_content(query, classroom_ids) if len(query) >= 2 else []
+
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse({"results": [hit._asdict() for hit in hits]})
+
+    return render(request, "classroom/search.html", {"hits": hits, "query": query, "scope": scope})
+
+
+# ---------------------------------------------------------
+# PROGRESS
+# ---------------------------------------------------------
+
+@classroom_access_required("teacher", "Only teachers can view analytics.")
 def class_progress(request, classroom_id):
     classroom = get_object_or_404(Classroom, id=classroom_id)
 
-    if classroom.teacher != request.user:
-        messages.error(request, "Only teachers can view analytics.")
-        return redirect("classroom_detail", classroom_id=classroom_id)
-
     progress_records = ProgressTracking.objects.filter(classroom=classroom)
 
     return render(request, "classroom/class_progress.html", {
@@ -428,16 +566,18 @@ def student_attendance(request):
     Show attendance history for the logged-in student across all classrooms.
     Used by the 'student_attendance' link in the student dashboard.
     """
-    records = (
+    live = list(
         Attendance.objects
         .filter(student=request.user)
         .select_related("classroom")
         .order_by("-date")
     )
+    # Closed terms are kept packed in AttendanceArchive; list them alongside.
+    records = sorted(live + archived_records(student_id=request.user.id), key=lambda r: r.date, reverse=True)
 
-    total = records.count()
-    present = records.filter(status="present").count()
-    absences = records.filter(status="absent").count()
+    total = len(records)
+    present = sum(1 for r in records if r.status == "present")
+    absences = sum(1 for r in records if r.status == "absent")
 
     if total > 0:
         attendance_rate = round((present / total) * 100, 1)
@@ -13,6 +13,11 @@ class Quiz(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='quiz_feed_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
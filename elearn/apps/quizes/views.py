@@ -2,6 +2,10 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from .models import Quiz, Question, StudentResponse, QuizScore
+from apps.classroom.pagination import paginate
+
+
+QUIZ_ORDERING = ('-created_at', '-id')
 
 
 # ============================================================
@@ -9,8 +13,8 @@ from .models import Quiz, Question, StudentResponse, QuizScore
 # ============================================================
 @login_required
 def quiz_list(request):
-    quizzes = Quiz.objects.all().order_by('-created_at')
-    return render(request, "quiz_list.html", {"quizzes": quizzes})
+    page = paginate(Quiz.objects.select_related('teacher'), request.GET.get("cursor"), ordering=QUIZ_ORDERING)
+    return render(request, "quiz_list.html", {"quizzes": page, "page": page})
 
 
 # ============================================================
@@ -177,8 +181,8 @@ def teacher_view_responses(request, quiz_id):
 # ============================================================
 @login_required
 def student_quiz_list(request):
-    quizzes = Quiz.objects.all().order_by('-created_at')
-    return render(request, "student/student_quiz_list.html", {"quizzes": quizzes})
+    page = paginate(Quiz.objects.all(), request.GET.get("cursor"), ordering=QUIZ_ORDERING)
+    return render(request, "student/student_quiz_list.html", {"quizzes": page, "page": page})
 
 
 # ============================================================